@@ -0,0 +1,210 @@
+"""
+Offline benchmark for Discord remote-control latency.
+離線量測 Discord 遠端控制的延遲。
+
+Drives the real command path without a Discord connection: interactions are
+injected into the callbacks built by discord_manager.make_command_handler,
+running on a private event loop that stands in for the bot loop. Hooks are
+registered with discord_manager.register_command_hooks, as run_script does.
+
+Measured paths:
+  wait-resume  interaction -> handler -> hook -> DiscordWaitNode returns
+  slash-start  interaction -> handler -> hook -> graph execution starts
+               (execute_graph is replaced by a recorder, so no device is needed)
+
+Usage (from the repository root):
+    python benchmarks/discord_latency.py [-n 200] [--json] [--max-p95-ms 50]
+
+Exits with status 1 if a --max-p95-ms budget is exceeded, for regression checks.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import shared  # noqa: E402
+import discord_manager  # noqa: E402
+from context import RuntimeContext  # noqa: E402
+from nodes.discord_nodes import DiscordWaitNode  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self):
+        self.messages = []
+
+    async def send_message(self, content=None, **kwargs):
+        self.messages.append(content)
+
+
+class FakeInteraction:
+    """The part of discord.Interaction the command callbacks use."""
+
+    def __init__(self, command_name):
+        self.command_name = command_name
+        self.response = FakeResponse()
+
+
+class FakeDiscord:
+    """Event loop on its own thread, standing in for the bot's gateway loop."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.handlers = {}
+
+    def start(self, command_names):
+        self.thread.start()
+        shared.discord_loop = self.loop
+        self.handlers = {name: discord_manager.make_command_handler(name) for name in command_names}
+
+    def inject(self, command_name):
+        """Deliver an interaction as the gateway would; returns a concurrent Future."""
+        handler = self.handlers[command_name]
+        return asyncio.run_coroutine_threadsafe(handler(FakeInteraction(command_name)), self.loop)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+        self.loop.close()
+        shared.discord_loop = None
+
+
+def summarize(samples, elapsed):
+    ms = sorted(s * 1000.0 for s in samples)
+
+    def pct(p):
+        return ms[min(len(ms) - 1, int(round(p / 100.0 * (len(ms) - 1))))]
+
+    return {
+        "count": len(ms),
+        "mean_ms": statistics.fmean(ms),
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "max_ms": ms[-1],
+        "throughput_per_s": len(ms) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def bench_wait_resume(fake, iterations):
+    """A DiscordWaitNode waits; each injected /continue must make it return."""
+    node = {"id": "wait", "type": "discord_wait", "properties": {"command_name": "continue"}, "next": "after"}
+    discord_manager.register_command_hooks([node], [], [node])
+    context = RuntimeContext(bot=None, wait_events=shared.wait_events)
+    handler = DiscordWaitNode()
+
+    resumed = []
+    done = threading.Event()
+
+    def waiter():
+        for _ in range(iterations):
+            handler.execute(node, context)
+            resumed.append(time.perf_counter())
+        done.set()
+
+    threading.Thread(target=waiter, daemon=True).start()
+    injected = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        # Inject only once the node is actually waiting, as a user would
+        while shared.wait_events.get("wait") is None or len(resumed) < i:
+            time.sleep(0)
+        injected.append(time.perf_counter())
+        fake.inject("continue").result(timeout=5)
+        while len(resumed) <= i:
+            time.sleep(0)
+    done.wait(timeout=5)
+    elapsed = time.perf_counter() - started
+    return summarize([r - s for s, r in zip(injected, resumed)], elapsed)
+
+
+def bench_slash_start(fake, iterations):
+    """Each injected /start must begin a graph execution from the Slash node."""
+    node = {"id": "slash", "type": "discord_slash", "properties": {"command_name": "start"}, "next": None}
+    started_at = []
+    lock = threading.Lock()
+
+    def recorder(actions, recursion_depth=0, start_node_id=None):
+        with lock:
+            started_at.append(time.perf_counter())
+        return True
+
+    original = discord_manager.execute_graph
+    discord_manager.execute_graph = recorder
+    try:
+        discord_manager.register_command_hooks([node], [node], [])
+
+        # Latency: one command at a time
+        latencies = []
+        started = time.perf_counter()
+        for i in range(iterations):
+            t0 = time.perf_counter()
+            fake.inject("start").result(timeout=5)
+            while len(started_at) <= i:
+                time.sleep(0)
+            latencies.append(started_at[i] - t0)
+        result = summarize(latencies, time.perf_counter() - started)
+
+        # Throughput: a burst of commands injected back to back
+        started_at.clear()
+        t0 = time.perf_counter()
+        futures = [fake.inject("start") for _ in range(iterations)]
+        for f in futures:
+            f.result(timeout=30)
+        while len(started_at) < iterations:
+            time.sleep(0)
+        result["burst_throughput_per_s"] = iterations / (time.perf_counter() - t0)
+        return result
+    finally:
+        discord_manager.execute_graph = original
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline Discord command latency benchmark")
+    parser.add_argument("-n", "--iterations", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--max-p95-ms", type=float, default=None, help="Fail if any path's p95 exceeds this")
+    args = parser.parse_args()
+
+    shared.set_log_level('warn')  # Keep per-command log lines out of the measurement
+    shared.is_running = True
+    shared.command_hooks.clear()
+    fake = FakeDiscord()
+    fake.start(["continue", "start"])
+    try:
+        results = {
+            "wait_resume": bench_wait_resume(fake, args.iterations),
+            "slash_start": bench_slash_start(fake, args.iterations),
+        }
+    finally:
+        shared.is_running = False
+        shared.command_hooks.clear()
+        fake.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for path, r in results.items():
+            line = (f"{path:12s} n={r['count']:<5d} mean={r['mean_ms']:.3f}ms p50={r['p50_ms']:.3f}ms "
+                    f"p95={r['p95_ms']:.3f}ms p99={r['p99_ms']:.3f}ms max={r['max_ms']:.3f}ms "
+                    f"{r['throughput_per_s']:.0f}/s")
+            if 'burst_throughput_per_s' in r:
+                line += f" burst={r['burst_throughput_per_s']:.0f}/s"
+            print(line)
+
+    if args.max_p95_ms is not None:
+        slow = [p for p, r in results.items() if r["p95_ms"] > args.max_p95_ms]
+        if slow:
+            print(f"p95 budget of {args.max_p95_ms}ms exceeded: {', '.join(slow)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
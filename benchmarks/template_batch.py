@@ -0,0 +1,135 @@
+"""
+Benchmark: batched frequency-domain matching vs one matchTemplate per template.
+批次頻域比對 vs 逐一 matchTemplate 的效能比較。
+
+Both sides score every template at a single scale with TM_CCOEFF_NORMED on the
+same grayscale screen, so results are directly comparable:
+  loop        cv2.matchTemplate + minMaxLoc per template
+  batch-cold  BatchMatcher with an empty spectrum cache (first frame)
+  batch-warm  BatchMatcher with cached template spectra (every later frame)
+
+By default a synthetic 1280x720 screen is generated and icons are cut from it.
+Pass --screen and --templates to use a real screenshot and icon folder.
+
+Usage (from the repository root):
+    python benchmarks/template_batch.py [--counts 10,25,50] [--same-size] [--json]
+    python benchmarks/template_batch.py --screen shot.png --templates images/icons
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from services.batch_matcher import BatchMatcher  # noqa: E402
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def synthetic_set(count, same_size, seed=0):
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, (720, 1280), dtype=np.uint8)
+    screen = cv2.GaussianBlur(noise, (5, 5), 0)
+    templates = []
+    for _ in range(count):
+        th, tw = (48, 48) if same_size else (int(v) for v in rng.integers(24, 72, 2))
+        y, x = int(rng.integers(0, 720 - th)), int(rng.integers(0, 1280 - tw))
+        templates.append(screen[y:y + th, x:x + tw].copy())
+    return screen, templates
+
+
+def folder_set(screen_path, folder, count):
+    screen = cv2.imread(screen_path, cv2.IMREAD_GRAYSCALE)
+    if screen is None:
+        raise SystemExit(f"Cannot read screen: {screen_path}")
+    names = sorted(n for n in os.listdir(folder) if n.lower().endswith(IMAGE_EXTENSIONS))[:count]
+    templates = [cv2.imread(os.path.join(folder, n), cv2.IMREAD_GRAYSCALE) for n in names]
+    return screen, [t for t in templates if t is not None]
+
+
+def per_template(screen, templates):
+    results = []
+    for template in templates:
+        if template.shape[0] > screen.shape[0] or template.shape[1] > screen.shape[1]:
+            results.append(None)
+            continue
+        res = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
+        _, best, _, loc = cv2.minMaxLoc(res)
+        results.append((best, loc))
+    return results
+
+
+def timed(fn, repeat):
+    samples, result = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), result
+
+
+def run(screen, templates, repeat):
+    keys = list(range(len(templates)))
+    loop_ms, expected = timed(lambda: per_template(screen, templates), repeat)
+
+    cold_samples = []
+    for _ in range(repeat):
+        matcher = BatchMatcher()
+        t0 = time.perf_counter()
+        matcher.match(screen, templates, keys)
+        cold_samples.append((time.perf_counter() - t0) * 1000)
+    warm_ms, got = timed(lambda: matcher.match(screen, templates, keys), repeat)
+
+    agree = sum(1 for e, g in zip(expected, got)
+                if e is None and g is None or e and g and tuple(e[1]) == g[1])
+    max_diff = max((abs(e[0] - g[0]) for e, g in zip(expected, got) if e and g), default=0.0)
+    return {
+        "templates": len(templates),
+        "sizes": len({t.shape for t in templates}),
+        "loop_ms": round(loop_ms, 2),
+        "batch_cold_ms": round(statistics.median(cold_samples), 2),
+        "batch_warm_ms": round(warm_ms, 2),
+        "speedup_warm": round(loop_ms / warm_ms, 2) if warm_ms else None,
+        "same_location": agree,
+        "max_score_diff": round(max_diff, 6),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched vs per-template matching benchmark")
+    parser.add_argument("--counts", default="10,25,50", help="Template counts to test")
+    parser.add_argument("--same-size", action="store_true", help="Synthetic icons all 48x48")
+    parser.add_argument("--screen", help="Screenshot to search (with --templates)")
+    parser.add_argument("--templates", help="Folder of template images")
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    cv2.setNumThreads(1)  # Compare algorithms, not thread pools
+    results = []
+    for count in (int(c) for c in args.counts.split(',') if c.strip()):
+        if args.screen and args.templates:
+            screen, templates = folder_set(args.screen, args.templates, count)
+        else:
+            screen, templates = synthetic_set(count, args.same_size)
+        results.append(run(screen, templates, args.repeat))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in results:
+            print(f"n={r['templates']:<3d} sizes={r['sizes']:<3d} loop={r['loop_ms']:.1f}ms "
+                  f"batch cold={r['batch_cold_ms']:.1f}ms warm={r['batch_warm_ms']:.1f}ms "
+                  f"(x{r['speedup_warm']}) agree={r['same_location']}/{r['templates']} "
+                  f"max_diff={r['max_score_diff']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,21 @@
 import os
+import re
 import time
 from ppadb.client import Client as AdbClient
 import cv2
 import numpy as np
+from services.metrics import metrics
+from services.trace import tracer
+from services.template_cache import template_cache
+from services.frame import Frame
+from services.match_memo import match_memo
+from services.peaks import find_peaks
+from services.batch_matcher import batch_matcher
+from services.template_meta import template_meta, scale_between
+from settings import settings_store
+
+# Screen scales tried by multi-scale template matching
+TEMPLATE_SCALES = tuple(float(s) for s in np.linspace(0.5, 1.5, 20))
 
 
 # BlueStacks Bot Class to handle ADB interactions
@@ -23,6 +36,10 @@ class BlueStacksBot:
         self.logger(f"Connecting to ADB Server at {adb_server_host}:{adb_server_port}...")
         self.client = AdbClient(host=adb_server_host, port=adb_server_port)
         self.device = None
+        # {'width', 'height', 'density'} of the connected screen (None until read)
+        self.display = None
+        self.last_frame = None
+        self._frame_seq = 0
         
         # Connect to the target device
         # 連接到目標設備
@@ -48,6 +65,7 @@ class BlueStacksBot:
                     
                 if self.device:
                     self.logger(f"Connected to device: {self.device.serial}")
+                    self.display = self.read_display()
                 else:
                     self.logger("Detailed device connect failed.")
                 
@@ -55,6 +73,80 @@ class BlueStacksBot:
             self.logger(f"Failed to get devices: {e}")
             self.device = None
 
+    def _shell(self, command):
+        """
+        Run an ADB shell command on the device (counted in metrics).
+        在設備上執行 ADB shell 指令。
+        """
+        parts = command.split()
+        # "input tap 1 2" -> "tap", other commands keep their program name
+        kind = parts[1] if parts[0] == "input" and len(parts) > 1 else parts[0]
+        metrics.inc("adb_commands", command=kind)
+        with tracer.span(f"adb {kind}", "device", command=command):
+            return self.device.shell(command)
+
+    def ping(self):
+        """
+        Round-trip a no-op shell command (opens the ADB shell transport). Returns True on a reply.
+        測試設備連線 (開啟 ADB shell 通道)。
+        """
+        return (self._shell("echo ready") or "").strip() == "ready"
+
+    def read_display(self):
+        """
+        Read the screen resolution and density ('wm size' / 'wm density'; override values win).
+        讀取設備解析度與密度。
+        Returns: {'width', 'height', 'density'} or None
+        """
+        try:
+            size = self._shell("wm size") or ""
+            density = self._shell("wm density") or ""
+        except Exception as e:
+            self.logger(f"Could not read display info: {e}")
+            return None
+        sizes = re.findall(r'(\d+)\s*x\s*(\d+)', size)
+        densities = re.findall(r'(\d+)', density)
+        if not sizes:
+            return None
+        width, height = (int(v) for v in sizes[-1])
+        display = {"width": width, "height": height, "density": int(densities[-1]) if densities else None}
+        self.logger(f"Display: {width}x{height}" + (f" @ {display['density']}dpi" if display['density'] else ""))
+        return display
+
+    def template_scale(self, cached, frame=None):
+        """
+        Factor mapping a template to this device's resolution, from its recorded capture
+        resolution. None if the capture resolution is unknown (use multi-scale search).
+        """
+        source = template_meta.resolution_for(cached.digest)
+        if source is None:
+            return None
+        target = self.display
+        if target is None and frame is not None:
+            target = {"width": frame.width, "height": frame.height}
+        return scale_between(source, target) if target else None
+
+    def _screencap(self):
+        """
+        Grab the raw PNG screenshot bytes from the device (counted in metrics).
+        從設備獲取原始 PNG 截圖數據。
+        """
+        metrics.inc("captures")
+        with tracer.span("screencap", "capture"):
+            return self.device.screencap()
+
+    def capture_frame(self):
+        """
+        Capture the screen into memory as a BGR image (no disk I/O).
+        擷取螢幕至記憶體 (BGR 影像)，不寫入硬碟。
+        Returns: numpy array or None
+        """
+        if not self.device:
+            return None
+        result = self._screencap()
+        img_array = np.frombuffer(result, np.uint8)
+        return cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+
     def click(self, x, y):
         """
         Simulate a tap at the given coordinates.
@@ -67,7 +159,7 @@ class BlueStacksBot:
         if self.device:
             # Send the shell command to tap
             # 發送 shell 指令進行點擊
-            self.device.shell(f"input tap {x} {y}")
+            self._shell(f"input tap {x} {y}")
             self.logger(f"Clicked at ({x}, {y})")
             # 已點擊於 ({x}, {y})
         else:
@@ -86,7 +178,7 @@ class BlueStacksBot:
             duration: Duration in milliseconds / 持續時間 (毫秒)
         """
         if self.device:
-            self.device.shell(f"input swipe {x1} {y1} {x2} {y2} {duration}")
+            self._shell(f"input swipe {x1} {y1} {x2} {y2} {duration}")
             self.logger(f"Swiped from ({x1}, {y1}) to ({x2}, {y2})")
             # 已從 ({x1}, {y1}) 滑動到 ({x2}, {y2})
         else:
@@ -98,7 +190,7 @@ class BlueStacksBot:
         按下 Home 鍵。
         """
         if self.device:
-            self.device.shell("input keyevent 3")
+            self._shell("input keyevent 3")
             self.logger("Pressed HOME button")
         else:
             self.logger("Device not connected.")
@@ -110,7 +202,7 @@ class BlueStacksBot:
         """
         if self.device:
             # Open recent apps screen (App Switcher / Overview)
-            self.device.shell("input keyevent 187")  # KEYCODE_APP_SWITCH
+            self._shell("input keyevent 187")  # KEYCODE_APP_SWITCH
             self.logger("Opened Recent Apps screen")
         else:
             self.logger("Device not connected.")
@@ -124,7 +216,7 @@ class BlueStacksBot:
             try:
                 # Get the screenshot binary data
                 # 獲取截圖的二進制數據
-                result = self.device.screencap()
+                result = self._screencap()
                 with open(filename, "wb") as f:
                     f.write(result)
                 self.logger(f"Screenshot saved to {filename}")
@@ -144,9 +236,7 @@ class BlueStacksBot:
             return None
             
         try:
-            result = self.device.screencap()
-            img_array = np.frombuffer(result, np.uint8)
-            img_color = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+            img_color = self.capture_frame()
             
             if img_color is not None:
                 # height, width, channels
@@ -161,102 +251,334 @@ class BlueStacksBot:
             
         return None
 
-    def find_with_sift(self, template_path, timeout=3, min_match_count=10):
+    def frame(self):
         """
-        Find image using SIFT feature matching. Robust to scale and rotation.
-        使用 SIFT 特徵比對尋找圖片。對縮放和旋轉有較強的魯棒性。
+        Capture a new shared Frame; derived images (gray, scales, SIFT) are computed once per frame.
+        擷取新畫面，衍生影像 (灰階、縮放、SIFT) 每張畫面只計算一次。
+        Returns: Frame or None
         """
-        if not self.device: return None
-        
-        # Load template
-        template = cv2.imread(template_path, cv2.IMREAD_GRAYSCALE)
-        if template is None:
+        img = self.capture_frame()
+        if img is None:
+            return None
+        self._frame_seq += 1
+        self.last_frame = Frame(img, seq=self._frame_seq)
+        return self.last_frame
+
+    def match_sift(self, frame, template_path, min_match_count=10):
+        """
+        SIFT match of one template against one frame (no capture, no retry).
+        在單一畫面上以 SIFT 比對模板。
+        Returns: (x, y) center in screen coordinates or None
+        """
+        cached = template_cache.get(template_path, features=True)
+        if cached is None:
             self.logger(f"Could not load template: {template_path}")
             return None
-            
-        # Initialize SIFT
+        template = cached.gray
+        kp1, des1 = cached.keypoints, cached.descriptors
+        if des1 is None:
+            self.logger(f"Template has no SIFT features: {template_path}")
+            return None
+
+        metrics.inc("match_attempts", algorithm="sift")
+        # Screen-side features are shared by every template checked on this frame
+        kp2, des2 = frame.features()
+        if des2 is None or len(des2) < 2:
+            return None
+
+        # Match
+        flann = cv2.FlannBasedMatcher(dict(algorithm=1, trees=5), dict(checks=50))
+        matches = flann.knnMatch(des1, des2, k=2)
+
+        # Lowe's ratio test
+        good = [m for m, n in (p for p in matches if len(p) == 2) if m.distance < 0.7 * n.distance]
+
+        if len(good) <= min_match_count:
+            return None
+
+        # Homography to find location
+        src_pts = np.float32([ kp1[m.queryIdx].pt for m in good ]).reshape(-1,1,2)
+        dst_pts = np.float32([ kp2[m.trainIdx].pt for m in good ]).reshape(-1,1,2)
+
+        M, mask = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC, 5.0)
+        if M is None:
+            return None
+        h, w = template.shape
+        pts = np.float32([ [0,0],[0,h-1],[w-1,h-1],[w-1,0] ]).reshape(-1,1,2)
+        dst = cv2.perspectiveTransform(pts, M)
+
+        # --- State Verification (Pixel Check) ---
+        # Use Homography to unwarp the detected region from the screenshot back to template size
+        # This lets us verify if the pixel content (e.g. text/state) actually matches
         try:
-            sift = cv2.SIFT_create()
-        except:
-            self.logger("SIFT not available.")
+            M_inv = np.linalg.inv(M)
+            # Warp the target image (screenshot) back to the template's perspective
+            warped_patch = cv2.warpPerspective(frame.gray, M_inv, (w, h))
+
+            # Compare the unwrapped patch with the original template
+            # Using Correlation Coefficient (1.0 = perfect match)
+            res = cv2.matchTemplate(template, warped_patch, cv2.TM_CCOEFF_NORMED)
+            score = res[0][0] # Result is 1x1 array
+
+            # If pixel correlation is too low, it means we found the shape/text
+            # but the internal details (like ON/OFF state) don't match.
+            if score < 0.7: # Raised to 0.7 to prevent false positives (was 0.55)
+                self.logger(f"Rejected SIFT match due to low pixel correlation: {score:.2f}")
+                return None
+
+        except Exception as e:
+            # If warping fails, fallback to trusting SIFT (or log warning)
+            self.logger(f"Verification warning: {e}")
+        # ----------------------------------------
+
+        # Calculate center
+        center_x = int(np.mean(dst[:, 0, 0]))
+        center_y = int(np.mean(dst[:, 0, 1]))
+        return frame.to_screen((center_x, center_y))
+
+    def match_template(self, frame, template_path, threshold=0.7, scale=None, fallback=False):
+        """
+        Template match of one template against one frame (no capture, no retry).
+        With a known device scale the pre-scaled template is matched once and that
+        result is final; the multi-scale search runs only for templates without a
+        known scale, or after a miss when 'fallback' is set (opt-in).
+        在單一畫面上進行模板比對 (已知解析度時只比對一個尺度)。
+        Returns: (x, y) center in screen coordinates or None
+        """
+        cached = template_cache.get(template_path)
+        if cached is None:
             return None
+        metrics.inc("match_attempts", algorithm="template")
 
-        kp1, des1 = sift.detectAndCompute(template, None)
-        
+        if scale is not None:
+            template = cached.scaled(scale)
+            t_h, t_w = template.shape[:2]
+            if frame.height >= t_h and frame.width >= t_w:
+                res = cv2.matchTemplate(frame.gray, template, cv2.TM_CCOEFF_NORMED)
+                _, max_val, _, max_loc = cv2.minMaxLoc(res)
+                if max_val >= threshold:
+                    return frame.to_screen((int(max_loc[0] + t_w / 2), int(max_loc[1] + t_h / 2)))
+            if not fallback:
+                return None
+            metrics.inc("match_scale_fallback")
+
+        template = cached.gray
+        t_h, t_w = template.shape[:2]
+
+        # Multi-scale loop - scaled screens are memoized on the frame and shared across templates
+        found = None
+        for scale in TEMPLATE_SCALES:
+            resized = frame.scaled_gray(scale)
+            if resized.shape[0] < t_h or resized.shape[1] < t_w:
+                continue
+
+            res = cv2.matchTemplate(resized, template, cv2.TM_CCOEFF_NORMED)
+            _, max_val, _, max_loc = cv2.minMaxLoc(res)
+
+            if found is None or max_val > found[0]:
+                found = (max_val, max_loc, scale)
+
+        if found and found[0] >= threshold:
+            max_val, max_loc, scale = found
+            # Map back to original coordinate
+            center_x = int((max_loc[0] + t_w/2) / scale)
+            center_y = int((max_loc[1] + t_h/2) / scale)
+            return frame.to_screen((center_x, center_y))
+        return None
+
+    def match(self, frame, template_path, method='auto', threshold=0.8, roi=None):
+        """
+        Evaluate one template on one frame with the given method ('auto' = SIFT, then template matching).
+        Results are memoized per screen fingerprint, so polling an unchanged screen skips the matchers.
+        roi: optional (x, y, w, h) screen region to search in.
+        """
+        method = method.lower()
+        cached = template_cache.get(template_path)
+        if cached is None:
+            self.logger(f"Could not load template: {template_path}")
+            return None
+        roi = tuple(int(v) for v in roi) if roi else None
+        scale = self.template_scale(cached, frame)
+        # Opt-in: retry a known-scale miss with the multi-scale search
+        fallback = scale is not None and bool(settings_store.get('match_scale_fallback', False))
+        key = (frame.fingerprint, cached.digest, method, threshold, roi, scale, fallback)
+        hit, center = match_memo.get(key)
+        if hit:
+            return center
+
+        target = frame.roi(*roi) if roi else frame
+        center = None
+        if method in ('sift', 'auto'):
+            with tracer.span("match sift", "match", template=template_path):
+                center = self.match_sift(target, template_path)
+        if center is None and method in ('template', 'auto'):
+            with tracer.span("match template", "match", template=template_path):
+                center = self.match_template(target, template_path, threshold=threshold, scale=scale,
+                                             fallback=fallback)
+        match_memo.put(key, center)
+        return center
+
+    def match_batch(self, frame, template_paths, threshold=0.8, roi=None):
+        """
+        Single-scale template match of many templates against one frame in one batch
+        (shared screen spectrum, cached template spectra).
+        批次比對多個模板 (共用畫面頻譜)。
+        Returns: list of (x, y) centers in screen coordinates or None, per template
+        """
+        roi = tuple(int(v) for v in roi) if roi else None
+        target = frame.roi(*roi) if roi else frame
+        results = [None] * len(template_paths)
+        todo = []
+        for index, template_path in enumerate(template_paths):
+            cached = template_cache.get(template_path)
+            if cached is None:
+                self.logger(f"Could not load template: {template_path}")
+                continue
+            scale = self.template_scale(cached, frame) or 1.0
+            key = (frame.fingerprint, cached.digest, 'batch', threshold, roi, scale)
+            hit, center = match_memo.get(key)
+            if hit:
+                results[index] = center
+            else:
+                todo.append((index, cached.scaled(scale), key))
+        if not todo:
+            return results
+
+        metrics.inc("match_attempts", len(todo), algorithm="batch")
+        with tracer.span("match batch", "match", templates=len(todo)):
+            # Spectrum cache key: template content + scale (key[1], key[-1])
+            scores = batch_matcher.match(target.gray, [t for _, t, _ in todo],
+                                         keys=[(key[1], key[-1]) for _, _, key in todo])
+        for (index, template, key), best in zip(todo, scores):
+            center = None
+            if best is not None and best[0] >= threshold:
+                (x, y), (t_h, t_w) = best[1], template.shape[:2]
+                center = target.to_screen((int(x + t_w / 2), int(y + t_h / 2)))
+            match_memo.put(key, center)
+            results[index] = center
+        return results
+
+    def match_all(self, frame, template_path, threshold=0.8, max_results=20, overlap=0.3, scale=None, roi=None):
+        """
+        Every occurrence of a template on one frame from a single matchTemplate pass
+        (local maxima + non-maximum suppression). scale=None uses the device scale.
+        在單一畫面上一次找出模板的所有出現位置。
+        Returns: tuple of (x, y, score) centers in screen coordinates, best first
+        """
+        cached = template_cache.get(template_path)
+        if cached is None:
+            self.logger(f"Could not load template: {template_path}")
+            return ()
+        roi = tuple(int(v) for v in roi) if roi else None
+        if scale is None:
+            scale = self.template_scale(cached, frame) or 1.0
+        key = (frame.fingerprint, cached.digest, 'all', threshold, roi, max_results, overlap, scale)
+        hit, found = match_memo.get(key)
+        if hit:
+            return found
+
+        target = frame.roi(*roi) if roi else frame
+        template = cached.scaled(scale)
+        t_h, t_w = template.shape[:2]
+        screen = target.gray
+        found = ()
+        if screen.shape[0] >= t_h and screen.shape[1] >= t_w:
+            metrics.inc("match_attempts", algorithm="template_all")
+            with tracer.span("match all", "match", template=template_path):
+                res = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
+                peaks = find_peaks(res, threshold, t_w, t_h, overlap, max_results)
+            found = tuple(target.to_screen((int(x + t_w / 2), int(y + t_h / 2))) + (round(score, 4),)
+                          for x, y, score in peaks)
+        match_memo.put(key, found)
+        return found
+
+    def find_all(self, template_path, timeout=2, threshold=0.8, max_results=20, overlap=0.3, scale=None, roi=None):
+        """
+        Capture frames until at least one occurrence of the template is found (or timeout).
+        Returns: tuple of (x, y, score), empty if none
+        """
+        if not self.device:
+            return ()
         start_time = time.time()
-        
-        while time.time() - start_time < timeout:
-            # Capture screen
-            result = self.device.screencap()
-            img_array = np.frombuffer(result, np.uint8)
-            img_color = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-            target = cv2.cvtColor(img_color, cv2.COLOR_BGR2GRAY)
-            
-            # Compute SIFT on target
-            kp2, des2 = sift.detectAndCompute(target, None)
-            
-            if des2 is None: 
-                time.sleep(0.5)
+        while True:
+            frame = self.frame()
+            if frame is not None:
+                found = self.match_all(frame, template_path, threshold, max_results, overlap, scale, roi)
+                if found:
+                    return found
+            if time.time() - start_time + 0.5 >= timeout:
+                return ()
+            time.sleep(0.5)
+
+    def _region_frame(self, roi=None):
+        frame = self.frame()
+        if frame is None or not roi:
+            return frame
+        return frame.roi(*roi)
+
+    def wait_for_change(self, roi=None, threshold=2.0, timeout=10.0, interval=0.1, should_continue=None):
+        """
+        Block until the screen (or ROI) differs from how it looked at the start by more than
+        'threshold' percent mean difference.
+        等待畫面 (或區域) 與起始畫面的差異超過門檻。
+        Returns: True when changed, False on timeout/stop
+        """
+        if not self.device:
+            return False
+        deadline = time.monotonic() + timeout
+        reference = self._region_frame(roi)
+        while time.monotonic() < deadline:
+            if should_continue and not should_continue():
+                return False
+            time.sleep(interval)
+            current = self._region_frame(roi)
+            if current is None:
                 continue
-            
-            # Match
-            flann = cv2.FlannBasedMatcher(dict(algorithm=1, trees=5), dict(checks=50))
-            matches = flann.knnMatch(des1, des2, k=2)
-            
-            # Lowe's ratio test
-            good = []
-            for m, n in matches:
-                if m.distance < 0.7 * n.distance:
-                    good.append(m)
-            
-            # self.logger(f"SIFT Good Matches: {len(good)}/{min_match_count}")
+            if reference is None:
+                reference = current  # The first capture failed: start from the first good frame
+            elif current.diff(reference) >= threshold:
+                return True
+        return False
 
-            if len(good) > min_match_count:
-                # Homography to find location
-                src_pts = np.float32([ kp1[m.queryIdx].pt for m in good ]).reshape(-1,1,2)
-                dst_pts = np.float32([ kp2[m.trainIdx].pt for m in good ]).reshape(-1,1,2)
-                
-                M, mask = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC, 5.0)
-                if M is not None:
-                    h, w = template.shape
-                    pts = np.float32([ [0,0],[0,h-1],[w-1,h-1],[w-1,0] ]).reshape(-1,1,2)
-                    dst = cv2.perspectiveTransform(pts, M)
-                    
-                    # --- State Verification (Pixel Check) ---
-                    # Use Homography to unwarp the detected region from the screenshot back to template size
-                    # This lets us verify if the pixel content (e.g. text/state) actually matches
-                    try:
-                        M_inv = np.linalg.inv(M)
-                        # Warp the target image (screenshot) back to the template's perspective
-                        warped_patch = cv2.warpPerspective(target, M_inv, (w, h))
-                        
-                        # Compare the unwrapped patch with the original template
-                        # Using Correlation Coefficient (1.0 = perfect match)
-                        res = cv2.matchTemplate(template, warped_patch, cv2.TM_CCOEFF_NORMED)
-                        score = res[0][0] # Result is 1x1 array
-                        
-                        # self.logger(f"SIFT Candidate Score: {score}")
-                        
-                        # If pixel correlation is too low, it means we found the shape/text 
-                        # but the internal details (like ON/OFF state) don't match.
-                        if score < 0.7: # Raised to 0.7 to prevent false positives (was 0.55)
-                            self.logger(f"Rejected SIFT match due to low pixel correlation: {score:.2f}")
-                            continue
-                            
-                    except Exception as e:
-                        # If warping fails, fallback to trusting SIFT (or log warning)
-                        self.logger(f"Verification warning: {e}")
-                        pass
-                    # ----------------------------------------
-                    
-                    # Calculate center
-                    center_x = int(np.mean(dst[:, 0, 0]))
-                    center_y = int(np.mean(dst[:, 0, 1]))
-                    
-                    return (center_x, center_y)
-            
+    def wait_for_stable(self, roi=None, threshold=0.5, stable_ms=300, timeout=10.0, interval=0.1, should_continue=None):
+        """
+        Block until the screen (or ROI) has differed by less than 'threshold' percent from
+        the first frame of the current window for at least 'stable_ms' milliseconds, i.e.
+        no net change (a slow fade cannot pass as stable frame by frame).
+        等待畫面穩定 (相對於穩定區間首張畫面的差異低於門檻達指定毫秒)。
+        Returns: True when stable, False on timeout/stop
+        """
+        if not self.device:
+            return False
+        deadline = time.monotonic() + timeout
+        reference = self._region_frame(roi)  # First frame of the current stable window
+        while time.monotonic() < deadline:
+            if should_continue and not should_continue():
+                return False
+            time.sleep(interval)
+            current = self._region_frame(roi)
+            if current is None:
+                continue
+            if reference is None or current.diff(reference) >= threshold:
+                reference = current
+            elif (current.captured_at - reference.captured_at) * 1000 >= stable_ms:
+                return True
+        return False
+
+    def find_with_sift(self, template_path, timeout=3, min_match_count=10):
+        """
+        Find image using SIFT feature matching. Robust to scale and rotation.
+        使用 SIFT 特徵比對尋找圖片。對縮放和旋轉有較強的魯棒性。
+        """
+        if not self.device: return None
+        start_time = time.time()
+        while time.time() - start_time < timeout:
+            frame = self.frame()
+            if frame is not None:
+                center = self.match_sift(frame, template_path, min_match_count)
+                if center:
+                    return center
             time.sleep(0.5)
-                    
         return None
 
     def find_with_template_matching(self, template_path, timeout=3, threshold=0.7):
@@ -265,43 +587,45 @@ class BlueStacksBot:
         Best for low-feature images (buttons, flat icons) where SIFT fails.
         """
         if not self.device: return None
-
-        template = cv2.imread(template_path, cv2.IMREAD_GRAYSCALE)
-        if template is None:
-            return None
-        t_h, t_w = template.shape[:2]
-
         start_time = time.time()
         while time.time() - start_time < timeout:
-            result = self.device.screencap()
-            img_array = np.frombuffer(result, np.uint8)
-            img_color = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-            gray = cv2.cvtColor(img_color, cv2.COLOR_BGR2GRAY)
-
-            # Multi-scale loop - Expanded range and steps
-            found = None
-            for scale in np.linspace(0.5, 1.5, 20): 
-                resized = cv2.resize(gray, None, fx=scale, fy=scale)
-                if resized.shape[0] < t_h or resized.shape[1] < t_w:
-                    continue
-
-                res = cv2.matchTemplate(resized, template, cv2.TM_CCOEFF_NORMED)
-                _, max_val, _, max_loc = cv2.minMaxLoc(res)
+            frame = self.frame()
+            if frame is not None:
+                center = self.match_template(frame, template_path, threshold)
+                if center:
+                    return center
+            time.sleep(0.5)
+        return None
 
-                if found is None or max_val > found[0]:
-                    found = (max_val, max_loc, scale)
+    def find_any(self, template_paths, timeout=3, method='auto', threshold=0.8):
+        """
+        Search several templates, evaluating all of them on each captured frame.
+        每次擷取一張畫面並比對所有模板。
+        Returns: (index, (x, y)) of the first template found, or None
+        """
+        if not self.device:
+            self.logger("Device not connected.")
+            return None
 
-            if found and found[0] >= threshold:
-                max_val, max_loc, scale = found
-                # self.logger(f"Template Found! Score: {max_val:.2f} Scale: {scale:.2f}")
-                
-                # Map back to original coordinate
-                center_x = int((max_loc[0] + t_w/2) / scale)
-                center_y = int((max_loc[1] + t_h/2) / scale)
-                return (center_x, center_y)
-            
+        start_time = time.time()
+        while True:
+            frame = self.frame()
+            if frame is not None and method.lower() == 'batch':
+                # All templates are scored in one batch; the first one in list order wins
+                centers = self.match_batch(frame, template_paths, threshold)
+                found = next((i for i, c in enumerate(centers) if c), None)
+                metrics.inc("matches", method="batch", result="not_found" if found is None else "found")
+                if found is not None:
+                    return found, centers[found]
+            elif frame is not None:
+                for index, template_path in enumerate(template_paths):
+                    center = self.match(frame, template_path, method, threshold)
+                    metrics.inc("matches", method=method.lower(), result="found" if center else "not_found")
+                    if center:
+                        return index, center
+            if time.time() - start_time + 0.5 >= timeout:
+                return None
             time.sleep(0.5)
-        return None
 
     def find_and_click(self, template_path, timeout=3, click_target=True, method='auto'):
         """
@@ -314,38 +638,16 @@ class BlueStacksBot:
             click_target (bool): Whether to click if found.
             method (str): 'auto', 'sift', or 'template'.
         """
-        if not self.device:
-            self.logger("Device not connected.")
-            return False
-
-        center = None
-        method = method.lower()
-        
-        if method == 'sift':
-            # Force SIFT
-            center = self.find_with_sift(template_path, timeout=timeout)
-            
-        elif method == 'template':
-            # Force Template Matching
-            center = self.find_with_template_matching(template_path, timeout=timeout, threshold=0.8)
-            
-        else: # auto
-            # 1. Try SIFT (Robust)
-            center = self.find_with_sift(template_path, timeout=min(timeout, 2))
-            
-            if not center:
-                # 2. Fallback to Template Matching
-                center = self.find_with_template_matching(template_path, timeout=min(timeout, 2), threshold=0.8)
-                if center:
-                     self.logger(f"Template Matching Found {template_path} at ({center[0]}, {center[1]})")
-
-        if center:
+        result = self.find_any([template_path], timeout=timeout, method=method)
+        if result:
+            center = result[1]
             self.logger(f"Found at ({center[0]}, {center[1]})")
             if click_target:
                 self.click(center[0], center[1])
             return center
         else:
-            self.logger(f"Failed to find {template_path}")
+            if self.device:
+                self.logger(f"Failed to find {template_path}")
             return None
 
 def main():
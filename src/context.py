@@ -20,6 +20,7 @@ class RuntimeContext:
     # Loop Management
     loop_states: Dict[str, int] = field(default_factory=dict) # {node_id: counter}
     loop_stack: List[str] = field(default_factory=list)       # [node_id, node_id]
+    loop_items: Dict[str, List[Any]] = field(default_factory=dict) # {node_id: items} for loops over an 'Items' input
     
     # Data Flow (Outputs from nodes)
     # { node_id: { slot_index: value } }
@@ -33,6 +34,11 @@ class RuntimeContext:
     
     # Script Path (for local image resolution)
     script_path: str = None
+    # Script Name (for metrics labels; None = top-level graph)
+    script_name: str = None
+    
+    # Outcome of the last branching node (True = found/success), reset per node
+    branch_result: Optional[bool] = None
     
     def stop(self):
         self.is_running = False
@@ -1,18 +1,20 @@
-import discord
-from discord import app_commands
 import asyncio
 import threading
 import time
 import shared
 from shared import log_message
-from engine import execute_graph, get_bot
-from settings import load_settings
+from settings import settings_store
+# engine (OpenCV/NumPy/ADB) is imported by the handlers that run a graph, so
+# starting the Discord bot alone does not load it
 
 def run_discord_bot_thread(token):
     """
     Background thread to run the persistent Discord Bot.
     """
     log_message("Starting Persistent Discord Bot...")
+    # discord.py is imported here so running scripts without Discord never loads it
+    import discord
+    from discord import app_commands
     
     intents = discord.Intents.default()
     # Set status and activity immediately upon client creation
@@ -34,73 +36,8 @@ def run_discord_bot_thread(token):
         log_message(f"Discord Bot Logged in as {client.user} (Persistent)")
         await client.wait_until_ready() # Ensure internal cache is ready
         # Status is now set in __init__
-        await tree.sync()
-        
-        # Load commands from settings
-        settings = load_settings()
-        commands_config = settings.get('commands', [])
-        
-        if commands_config:
-            log_message(f"Registering {len(commands_config)} declared commands...")
-            # We clear commands to ensure clean slate based on settings
-            tree.clear_commands(guild=None)
-            
-            for cmd in commands_config:
-                c_name = cmd.get('name', '').strip()
-                c_desc = cmd.get('desc', '').strip()
-                if not c_desc: c_desc = "Script command"
-                
-                if not c_name: continue
-                
-                # Generic Callback that delegates to shared.command_hooks
-                # We use a factory to capture c_name
-                def make_handler(name_captured):
-                     async def _generic_handler(interaction: discord.Interaction):
-                         log_message(f"Command triggered: /{name_captured}")
-                         
-                         handler = shared.command_hooks.get(name_captured)
-                         if handler:
-                             # Execute handler (could be running script or signaling event)
-                             # Handler returns a message or boolean? Let's say handler handles its own logic, 
-                             # but here we need to acknowledge interaction.
-                             await interaction.response.send_message(f"Command /{name_captured} received...", ephemeral=True)
-                             result = handler()
-                             if result is False: # Explicit False
-                                 pass # Handler failed?
-                         else:
-                             await interaction.response.send_message(f"Command /{name_captured} is declared, but no running script is handling it.", ephemeral=True)
-                     return _generic_handler
-                
-                command = app_commands.Command(name=c_name, description=c_desc, callback=make_handler(c_name))
-                tree.add_command(command)
-            
-            try:
-                await tree.sync()
-                log_message("Commands synced with Discord.")
-                
-                # Notify user to refresh
-                user_id_raw = settings.get('user_id')
-                if user_id_raw:
-                    try:
-                        user_id = int(str(user_id_raw).strip()) # Ensure int
-                        user = await client.fetch_user(user_id)
-                        if user:
-                            await user.send(
-                                "✅ **Bot Commands Updated!**\n"
-                                "If you don't see the new commands:\n"
-                                "💻 **PC**: Press `Ctrl + R` to refresh Discord.\n"
-                                "📱 **Mobile**: Completely restart the App.",
-                                silent=True
-                            )
-                    except ValueError:
-                        log_message(f"Invalid User ID format: {user_id_raw}")
-                    except Exception as ux:
-                        log_message(f"Could not send DM to user (ID: {user_id_raw}): {ux}")
-                        
-            except Exception as e:
-                log_message(f"Failed to sync commands: {e}")
-        else:
-            log_message("No declared commands found in settings.")
+        # on_ready also fires after gateway reconnects; sync_commands only talks to Discord when something differs
+        await sync_commands(tree)
 
     async def runner():
         async with client:
@@ -116,10 +53,98 @@ def run_discord_bot_thread(token):
         loop.close()
         log_message("Discord Bot Loop Closed")
 
+def make_command_handler(name):
+    """
+    Interaction callback for a declared command; delegates to shared.command_hooks.
+    宣告指令的回呼，轉交給 shared.command_hooks 處理。
+    """
+    import discord
+
+    async def _generic_handler(interaction: discord.Interaction):
+        log_message(f"Command triggered: /{name}")
+        
+        handler = shared.command_hooks.get(name)
+        if handler:
+            # Acknowledge first (Discord expects a response within 3s), then run the hook
+            await interaction.response.send_message(f"Command /{name} received...", ephemeral=True)
+            handler()
+        else:
+            await interaction.response.send_message(f"Command /{name} is declared, but no running script is handling it.", ephemeral=True)
+    return _generic_handler
+
+def declared_commands(commands_config=None):
+    """{name: description} from the 'commands' setting."""
+    if commands_config is None:
+        commands_config = settings_store.get('commands', [])
+    declared = {}
+    for cmd in commands_config or []:
+        c_name = (cmd.get('name') or '').strip()
+        if not c_name:
+            continue
+        declared[c_name] = (cmd.get('desc') or '').strip() or "Script command"
+    return declared
+
+def update_tree(tree, declared):
+    """
+    Make the local command tree match 'declared'. Returns True if anything changed.
+    Unchanged commands keep their Command objects.
+    """
+    from discord import app_commands
+
+    current = {c.name: c.description for c in tree.get_commands()}
+    changed = False
+    for name in current:
+        if name not in declared:
+            tree.remove_command(name)
+            changed = True
+    for name, desc in declared.items():
+        if current.get(name) == desc:
+            continue
+        if name in current:
+            tree.remove_command(name)
+        tree.add_command(app_commands.Command(name=name, description=desc, callback=make_command_handler(name)))
+        changed = True
+    return changed
+
+async def sync_commands(tree, commands_config=None):
+    """
+    Apply the declared commands and sync with Discord only if the registered set differs.
+    Returns True if a sync was performed.
+    """
+    declared = declared_commands(commands_config)
+    update_tree(tree, declared)
+    try:
+        remote = {c.name: c.description for c in await tree.fetch_commands()}
+    except Exception as e:
+        log_message(f"Could not fetch registered commands ({e}), syncing anyway.")
+        remote = None
+    if remote == declared:
+        log_message(f"Commands up to date ({len(declared)} registered), no sync needed.")
+        return False
+    
+    try:
+        await tree.sync()
+    except Exception as e:
+        log_message(f"Failed to sync commands: {e}")
+        return False
+    added = sorted(set(declared) - set(remote or {}))
+    removed = sorted(set(remote or {}) - set(declared))
+    log_message(f"Commands synced with Discord ({len(declared)} declared; added: {added or '-'}, removed: {removed or '-'}).")
+    
+    # Notify user to refresh
+    if settings_store.get('user_id'):
+        from services.discord_outbox import discord_outbox
+        discord_outbox.send(
+            "✅ **Bot Commands Updated!**\n"
+            "If you don't see the new commands:\n"
+            "💻 **PC**: Press `Ctrl + R` to refresh Discord.\n"
+            "📱 **Mobile**: Completely restart the App."
+        )
+    return True
+
 def start_bot_background(token=None):
     if not token:
-        settings = load_settings()
-        token = settings.get('discord_token')
+        token = settings_store.get('discord_token')
     
     if not token:
         log_message("No Discord Token found. Bot not started.")
@@ -133,18 +158,87 @@ def start_bot_background(token=None):
     shared.discord_thread.daemon = True # Kill when main server stops
     shared.discord_thread.start()
 
-def stop_bot():
+def stop_bot(wait=False):
     if shared.discord_client and shared.discord_loop and not shared.discord_client.is_closed():
         asyncio.run_coroutine_threadsafe(shared.discord_client.close(), shared.discord_loop)
     log_message("Discord Bot Stop Requested.")
+    if wait and shared.discord_thread and shared.discord_thread is not threading.current_thread():
+        shared.discord_thread.join(timeout=10)
+
+def restart_bot(token=None):
+    # Wait for the old client to close, otherwise start_bot_background sees it as still running
+    stop_bot(wait=True)
+    start_bot_background(token)
+
+def _on_commands_changed(changed):
+    """Settings subscriber: apply the new command list on the live connection."""
+    client, tree, loop = shared.discord_client, shared.discord_tree, shared.discord_loop
+    if not client or not tree or not loop or client.is_closed() or not client.is_ready():
+        return  # Applied by on_ready when the bot connects
+    asyncio.run_coroutine_threadsafe(sync_commands(tree, changed['commands']), loop)
+
+settings_store.subscribe(['commands'], _on_commands_changed)
 
 # Old explicitly registration function removed as we now use declarative settings
 
+def register_command_hooks(actions, slash_nodes, wait_nodes):
+    """
+    Map command names to runtime hooks: Slash nodes start the graph from that
+    node on a new thread, Wait nodes signal their wait event.
+    將指令名稱對應到執行時的 Hook。
+    """
+    # Map command_name -> Logic
+    for node in slash_nodes:
+        cmd_name = node['properties'].get('command_name', '').strip()
+        if not cmd_name: 
+            log_message(f"Warning: Slash Node {node['id']} has no command name. Skipping.")
+            continue
+
+        if cmd_name in shared.command_hooks:
+            log_message(f"Warning: Command '/{cmd_name}' (Node {node['id']}) overwrites previous handler!")
+
+        node_id = node['id']
+
+        # Factory function to properly capture node_id in closure
+        def make_runner(nid, acts):
+            def runner():
+                from engine import execute_graph
+                log_message(f"Slash Command triggered: Starting async execution from node {nid}")
+                threading.Thread(target=execute_graph, args=(acts,), kwargs={'start_node_id': nid}).start()
+            return runner
+
+        shared.command_hooks[cmd_name] = make_runner(node_id, actions)
+        log_message(f"Registered Slash Command: /{cmd_name} -> Node {node_id}")
+
+    for node in wait_nodes:
+        cmd_name = node['properties'].get('command_name', 'continue').strip()
+        if not cmd_name: cmd_name = 'continue'
+
+        if cmd_name in shared.command_hooks:
+            log_message(f"Warning: Command '/{cmd_name}' (WaitNode {node['id']}) overwrites previous handler! Check for duplicates.")
+
+        node_id = node['id']
+        # Logic: Signal Wait Event
+        # Fix closure capture by using default argument
+        def signaler(nid=node_id, nm=cmd_name):
+            event = shared.wait_events.get(nid)
+            if event:
+                log_message(f"Signaling event for node {nid}")
+                event.set()
+                return True
+            else:
+                log_message(f"Command '/{nm}' received, but WaitNode {nid} is not waiting (Event not found).")
+            return False
+
+        shared.command_hooks[cmd_name] = signaler
+        log_message(f"Registered Wait Command: /{cmd_name} -> Node {node_id}")
+
 def run_script(actions, mode='graph'):
     """
     Main entry point for running a script.
     執行腳本的主要入口點。
     """
+    from engine import execute_graph
     shared.is_running = True
     # Clear old hooks
     shared.command_hooks.clear()
@@ -152,7 +246,14 @@ def run_script(actions, mode='graph'):
     log_message(f"Starting execution...")
     
     try:
-        get_bot()
+        # Report graph problems (dangling links, busy loops, ...) before anything runs
+        from services.graph_analysis import analyze, log_issues
+        analysis = analyze(actions)
+        log_issues(analysis, log_message)
+        
+        # Preload templates/features of the whole graph and connect the device up front
+        from services.warmup import prepare_run
+        shared.last_prepare = prepare_run(actions)
             
         # Identify nodes
         start_node = next((n for n in actions if n.get('type') == 'start'), None)
@@ -163,50 +264,7 @@ def run_script(actions, mode='graph'):
         if not wait_nodes: wait_nodes = [n for n in actions if n.get('type') == 'bot/discord_wait']
 
         # 1. Register Runtime Hooks
-        # Map command_name -> Logic
-        for node in slash_nodes:
-            cmd_name = node['properties'].get('command_name', '').strip()
-            if not cmd_name: 
-                log_message(f"Warning: Slash Node {node['id']} has no command name. Skipping.")
-                continue
-            
-            if cmd_name in shared.command_hooks:
-                log_message(f"Warning: Command '/{cmd_name}' (Node {node['id']}) overwrites previous handler!")
-            
-            node_id = node['id']
-            
-            # Factory function to properly capture node_id in closure
-            def make_runner(nid, acts):
-                def runner():
-                    log_message(f"Slash Command triggered: Starting async execution from node {nid}")
-                    threading.Thread(target=execute_graph, args=(acts,), kwargs={'start_node_id': nid}).start()
-                return runner
-            
-            shared.command_hooks[cmd_name] = make_runner(node_id, actions)
-            log_message(f"Registered Slash Command: /{cmd_name} -> Node {node_id}")
-
-        for node in wait_nodes:
-            cmd_name = node['properties'].get('command_name', 'continue').strip()
-            if not cmd_name: cmd_name = 'continue'
-            
-            if cmd_name in shared.command_hooks:
-                log_message(f"Warning: Command '/{cmd_name}' (WaitNode {node['id']}) overwrites previous handler! Check for duplicates.")
-
-            node_id = node['id']
-            # Logic: Signal Wait Event
-            # Fix closure capture by using default argument
-            def signaler(nid=node_id, nm=cmd_name):
-                event = shared.wait_events.get(nid)
-                if event:
-                    log_message(f"Signaling event for node {nid}")
-                    event.set()
-                    return True
-                else:
-                    log_message(f"Command '/{nm}' received, but WaitNode {nid} is not waiting (Event not found).")
-                return False
-            
-            shared.command_hooks[cmd_name] = signaler
-            log_message(f"Registered Wait Command: /{cmd_name} -> Node {node_id}")
+        register_command_hooks(actions, slash_nodes, wait_nodes)
 
         # 2. Start Execution
         # Key change: Run main flow in separate thread if we have both Start Node AND Slash Commands
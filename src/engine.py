@@ -1,8 +1,8 @@
 import shared
-from shared import log_message
-from bluestacks_bot import BlueStacksBot
+from shared import log_message, set_log_fields, clear_log_fields
 from context import RuntimeContext
 from executor import GraphExecutor
+from services.profiler import profiler
 
 def start_adb_server():
     """Start local ADB server if not running"""
@@ -26,14 +26,13 @@ def get_bot(bot_instance=None):
     if bot_instance is None:
         start_adb_server()
         import os
-        from settings import load_settings
-        
-        settings = load_settings()
+        from settings import settings_store
+        from bluestacks_bot import BlueStacksBot  # OpenCV/NumPy/ADB load on first connection
         
         # Priority: Environment Variable > settings.json > Default
         default_host = "host.docker.internal" if os.environ.get("ADB_HOST") == "host.docker.internal" else "127.0.0.1"
-        device_host = os.environ.get("ADB_HOST") or settings.get("adb_host") or default_host
-        device_port = int(os.environ.get("ADB_PORT") or settings.get("adb_port") or 5555)
+        device_host = os.environ.get("ADB_HOST") or settings_store.get("adb_host") or default_host
+        device_port = int(os.environ.get("ADB_PORT") or settings_store.get("adb_port") or 5555)
         
         log_message(f"Connecting to ADB at {device_host}:{device_port}")
         bot_instance = BlueStacksBot(device_host=device_host, device_port=device_port, logger=log_message)
@@ -65,7 +64,15 @@ def execute_graph(nodes_list, recursion_depth=0, start_node_id=None):
         context.recursion_depth = recursion_depth
         
         executor = GraphExecutor()
-        success = executor.execute(nodes_list, context, start_node_id=start_node_id)
+        # Make this thread visible to the on-demand profiler
+        profiler.enter_thread()
+        if bot_instance.device:
+            set_log_fields(device=bot_instance.device.serial)
+        try:
+            success = executor.execute(nodes_list, context, start_node_id=start_node_id)
+        finally:
+            profiler.leave_thread()
+            clear_log_fields()
         return success
 
     except Exception as e:
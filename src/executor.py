@@ -1,52 +1,104 @@
+import ast
+import os
+import threading
 import time
-from typing import List, Dict, Any, Type, Optional
+from typing import List, Dict, Any, Type, Optional, Tuple
 from context import RuntimeContext
 from nodes.base import NodeHandler
-from shared import log_message
+from shared import log_message, log_debug, log_error, set_log_fields
+from services.metrics import metrics
+from services.trace import tracer
+from services.profiler import profiler
+from services.startup import startup
 import shared  # For checking is_running globally
 
-# Import all nodes to register them
-from nodes.basic import StartNode, ClickNode, SwipeNode, WaitNode, ClearAppsNode, HomeNode
-from nodes.vision import FindImageNode, CheckPixelNode, FindMultiImagesNode
-from nodes.logic import LoopNode, LoopBreakNode, ScriptNode
-from nodes.discord_nodes import DiscordSendNode, DiscordWaitNode, DiscordScreenshotNode
+NODES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nodes')
+
+def _scan_node_module(path: str) -> Dict[str, str]:
+    """
+    Find NodeHandler classes in a module without importing it:
+    {node_type: class name} for classes whose node_type returns a string literal.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+    found = {}
+    for cls in tree.body:
+        if not isinstance(cls, ast.ClassDef):
+            continue
+        for item in cls.body:
+            if isinstance(item, ast.FunctionDef) and item.name == 'node_type':
+                ret = item.body[-1] if item.body else None
+                if isinstance(ret, ast.Return) and isinstance(ret.value, ast.Constant) and isinstance(ret.value.value, str):
+                    found[ret.value.value] = cls.name
+    return found
 
 class NodeRegistry:
+    """
+    Node handlers by type. Modules in nodes/ are scanned (not imported) to
+    build the type index; a module is imported the first time one of its
+    node types is executed, so e.g. discord.py only loads for Discord nodes.
+    """
     _handlers: Dict[str, NodeHandler] = {}
+    # {node_type: (module name, class name)}
+    _index: Dict[str, Tuple[str, str]] = {}
+    _lock = threading.Lock()
 
     @classmethod
     def register(cls, handler_cls: Type[NodeHandler]):
         handler = handler_cls()
         cls._handlers[handler.node_type] = handler
-        # Also register normalized names if needed, or handle in get()
-        
+
+    @classmethod
+    def discover(cls, force: bool = False):
+        if cls._index and not force:
+            return
+        index = {}
+        for filename in sorted(os.listdir(NODES_DIR)):
+            if not filename.endswith('.py') or filename in ('__init__.py', 'base.py'):
+                continue
+            module = 'nodes.' + filename[:-3]
+            try:
+                for node_type, class_name in _scan_node_module(os.path.join(NODES_DIR, filename)).items():
+                    index[node_type] = (module, class_name)
+            except (OSError, SyntaxError) as e:
+                log_error(f"Could not scan node module {filename}: {e}")
+        cls._index = index
+
+    @classmethod
+    def known_types(cls) -> List[str]:
+        cls.discover()
+        return sorted(set(cls._index) | set(cls._handlers))
+
+    @classmethod
+    def loaded_types(cls) -> List[str]:
+        return sorted(cls._handlers)
+
     @classmethod
-    def get(cls, node_type: str) -> NodeHandler:
+    def get(cls, node_type: str) -> Optional[NodeHandler]:
         # types might come in as 'bot/click' or 'click'
         # The ScriptService normalizes them to 'click'.
         # But just in case:
         if node_type.startswith('bot/'):
             node_type = node_type.replace('bot/', '')
         
+        handler = cls._handlers.get(node_type)
+        if handler is not None:
+            return handler
+        cls.discover()
+        entry = cls._index.get(node_type)
+        if entry is None:
+            return None
+        with cls._lock:
+            if node_type not in cls._handlers:
+                module_name, class_name = entry
+                module = startup.timed_import(module_name, reason=f"node '{node_type}'")
+                cls.register(getattr(module, class_name))
         return cls._handlers.get(node_type)
 
     @classmethod
     def initialize_defaults(cls):
-        cls.register(StartNode)
-        cls.register(ClickNode)
-        cls.register(SwipeNode)
-        cls.register(WaitNode)
-        cls.register(FindImageNode)
-        cls.register(LoopNode)
-        cls.register(LoopBreakNode)
-        cls.register(ScriptNode)
-        cls.register(DiscordSendNode)
-        cls.register(DiscordWaitNode)
-        cls.register(DiscordScreenshotNode)
-        cls.register(CheckPixelNode)
-        cls.register(FindMultiImagesNode)
-        cls.register(ClearAppsNode)
-        cls.register(HomeNode)
+        # Kept for callers that expect it; handlers are now loaded on first use
+        cls.discover()
 
 class GraphExecutor:
     def __init__(self):
@@ -68,10 +120,12 @@ class GraphExecutor:
         # Scope Management: Isolate state for this recursion level
         old_map = context.node_map
         old_loop_states = context.loop_states
+        old_loop_items = context.loop_items
         old_outputs = context.outputs
         
         context.node_map = { str(node['id']): node for node in nodes_list }
         context.loop_states = {} # Isolated loop counters
+        context.loop_items = {}
         context.outputs = {}     # Isolated data flow
         
         # Track which loops were started in THIS SCOPE
@@ -100,22 +154,34 @@ class GraphExecutor:
                 raw_type = current_node.get('type', '')
                 node_type = raw_type.replace('bot/', '')
                 
-                log_message(f"--- Executing: {node_type} (ID: {node_id}) ---")
+                script_label = context.script_name or "main"
+                set_log_fields(script=script_label, node=node_id)
+                log_debug("--- Executing: %s (ID: %s) ---", node_type, node_id)
                 
                 handler = NodeRegistry.get(node_type)
                 
                 if handler:
                     # Debug: log key fields for branching nodes
                     if node_type in ['find_image', 'check_pixel']:
-                         log_message(f"  > Branch Keys: next_found={current_node.get('next_found')}, next_not_found={current_node.get('next_not_found')}")
+                         log_debug("  > Branch Keys: next_found=%s, next_not_found=%s", current_node.get('next_found'), current_node.get('next_not_found'))
                     
+                    profiler.set_location(script_label, f"{node_type} #{node_id}")
+                    context.branch_result = None
+                    started = time.perf_counter()
                     try:
-                        next_id = handler.execute(current_node, context)
+                        with tracer.span(f"{node_type} #{node_id}", "node", script=script_label, type=node_type, id=node_id) as span:
+                            next_id = handler.execute(current_node, context)
+                            span.set(next=next_id)
                     except Exception as e:
-                        log_message(f"Error executing node {node_type} ({node_id}): {e}")
+                        metrics.observe_node(script_label, node_type, node_id, time.perf_counter() - started, error=True)
+                        log_error(f"Error executing node {node_type} ({node_id}): {e}")
                         return False
+                    metrics.observe_node(script_label, node_type, node_id, time.perf_counter() - started)
+                    if context.branch_result is not None:
+                        metrics.record_branch(script_label, node_type, node_id, context.branch_result)
+                        context.branch_result = None
                 else:
-                    log_message(f"Error: Unknown node type '{node_type}'")
+                    log_error(f"Error: Unknown node type '{node_type}'")
                     next_id = current_node.get('next')
 
                 # Loop Break / Return Logic
@@ -139,6 +205,7 @@ class GraphExecutor:
             # Restore scope
             context.node_map = old_map
             context.loop_states = old_loop_states
+            context.loop_items = old_loop_items
             context.outputs = old_outputs
             
             # Clean up loops that were started in this scope but never finished
@@ -1,12 +1,27 @@
+from services.startup import startup  # First, so the report measures from process start
 from flask import Flask
 from routes import configure_routes
-from settings import load_settings
+from settings import settings_store
+from shared import set_log_level, log_message
+import threading
 import os
 
+startup.phase("import web server")
+
 app = Flask(__name__, template_folder='../templates', static_folder='../static')
 
 # Configure Routes
 configure_routes(app)
+startup.phase("configure routes")
+
+def _on_token_changed(changed):
+    """
+    Settings subscriber: a new token is the only change that needs a reconnect.
+    只有 Token 變更才需要重新連線。discord.py 只在需要時載入。
+    """
+    log_message("Discord token changed, restarting bot...")
+    discord_manager = startup.timed_import('discord_manager', reason='discord token set')
+    threading.Thread(target=discord_manager.restart_bot, daemon=True).start()
 
 def start_server():
     # Ensure images directory exists
@@ -14,12 +29,17 @@ def start_server():
         os.makedirs('images')
     
     # Load settings
-    settings = load_settings()
-    web_port = int(settings.get('web_port', 5000))
+    web_port = int(settings_store.get('web_port', 5000))
+    set_log_level(settings_store.get('log_level', 'info'))
+    settings_store.subscribe(['log_level'], lambda changed: set_log_level(changed['log_level'] or 'info'))
+    settings_store.subscribe(['discord_token'], _on_token_changed)
     
-    # Start Discord Bot if token exists
-    from discord_manager import start_bot_background
-    start_bot_background()
+    # Start Discord Bot if token exists (discord.py is only imported then)
+    if settings_store.get('discord_token'):
+        startup.timed_import('discord_manager', reason='discord token set').start_bot_background()
+    else:
+        log_message("No Discord Token found. Bot not started.")
+    startup.phase("start discord bot")
 
     # Auto-open browser
     import webbrowser
@@ -30,6 +50,7 @@ def start_server():
         
     Timer(1.5, open_browser).start()
     
+    startup.phase("ready to serve")
     app.run(host='0.0.0.0', port=web_port, debug=False)
 
 if __name__ == '__main__':
@@ -2,7 +2,7 @@ import time
 from typing import Dict, Any, Optional
 from context import RuntimeContext
 from nodes.base import NodeHandler
-from shared import log_message
+from shared import log_message, log_debug
 
 class StartNode(NodeHandler):
     @property
@@ -46,7 +46,7 @@ class WaitNode(NodeHandler):
     def execute(self, node: Dict[str, Any], context: RuntimeContext) -> Optional[str]:
         props = node.get('properties', {})
         sec = float(props.get('seconds', 1.0))
-        log_message(f"Waiting {sec}s...")
+        log_debug("Waiting %ss...", sec)
         time.sleep(sec)
         return node.get('next')
 
@@ -1,12 +1,14 @@
-import os
-import asyncio
-import discord
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from typing import Dict, Any, Optional
 from context import RuntimeContext
 from nodes.base import NodeHandler
-from shared import log_message
-from settings import load_settings 
+from shared import log_message, log_debug
+from settings import settings_store
+from services.discord_outbox import discord_outbox
+from services.screen_stream import encode_frame, FORMATS
+from services.image_utils import parse_region
 # Note: dynamic hook registration for WaitNode needs access to shared.command_hooks?
 # Or we move command_hooks to context?
 # For now, command_hooks are global in shared.py. 
@@ -16,6 +18,17 @@ from settings import load_settings
 # Let's import shared for now to keep it working, refactor later.
 import shared
 
+# Screenshot encoding runs off the executor thread
+_encode_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="discord-encode")
+# Seconds a waiting screenshot node blocks for encoding + delivery together
+SEND_TIMEOUT = 20
+
+def _encode_and_send(frame, message, fmt, quality, scale, crop):
+    data, mimetype = encode_frame(frame, fmt, quality, scale, crop)
+    ext = FORMATS.get(fmt, FORMATS['jpeg'])[0]
+    log_debug("Screenshot encoded: %d bytes (%s)", len(data), mimetype)
+    return discord_outbox.send(message, file=(data, "screenshot" + ext))
+
 class DiscordSendNode(NodeHandler):
     @property
     def node_type(self): return "discord_send"
@@ -24,27 +37,17 @@ class DiscordSendNode(NodeHandler):
         props = node.get('properties', {})
         msg = props.get('message', '')
         try:
-            settings = load_settings()
-            uid = settings.get('user_id')
-            
-            if context.discord_client and uid:
-                async def _send_dm():
-                    try:
-                        await context.discord_client.wait_until_ready()
-                        user = await context.discord_client.fetch_user(int(uid))
-                        await user.send(msg)
-                        log_message(f"Sent DM to {uid}: {msg}")
-                    except Exception as exc:
-                        log_message(f"Failed to send DM: {exc}")
-                
-                if context.discord_loop:
-                    future = asyncio.run_coroutine_threadsafe(_send_dm(), context.discord_loop)
+            if context.discord_client and settings_store.get('user_id'):
+                # Queued on the Discord loop; only block when the node asks to wait for delivery
+                future = discord_outbox.send(msg)
+                if props.get('wait'):
                     try:
-                         future.result(timeout=15)
+                        future.result(timeout=15)
+                        log_message(f"Sent DM: {msg}")
                     except Exception as fe:
-                         log_message(f"Discord Send Timed Out/Failed: {fe}")
+                        log_message(f"Discord Send Timed Out/Failed: {fe}")
                 else:
-                     log_message("Discord loop not active.")
+                    log_debug("Queued DM: %s", msg)
             else:
                 log_message("Skipped Discord Send: No client or User ID.")
         except Exception as e:
@@ -59,48 +62,43 @@ class DiscordScreenshotNode(NodeHandler):
     def execute(self, node: Dict[str, Any], context: RuntimeContext) -> Optional[str]:
         props = node.get('properties', {})
         msg = props.get('message', '')
-        temp_path = "temp_screenshot_discord.png"
         
-        # 1. Capture
+        if not (context.discord_client and settings_store.get('user_id')):
+            log_message("Skipped Discord Screenshot: No client or User ID.")
+            return node.get('next')
+        
+        # 1. Capture into memory (on this thread, so the image matches this point of the script)
         try:
-            context.bot.screencap(temp_path)
+            frame = context.bot.capture_frame()
         except Exception as e:
+            frame = None
             log_message(f"Screenshot capture failed: {e}")
-            
-        # 2. Send
-        if os.path.exists(temp_path):
+        if frame is None:
+            return node.get('next')
+        
+        # 2. Encode on a worker thread and upload from memory
+        try:
+            fmt = str(props.get('format') or 'jpeg').lower()
+            quality = int(props.get('quality') or 80)
+            scale = float(props.get('scale') or 1.0)
+            crop = parse_region(props.get('crop'))
+        except (TypeError, ValueError) as e:
+            log_message(f"Discord Screenshot: invalid options ({e}), using defaults.")
+            fmt, quality, scale, crop = 'jpeg', 80, 1.0, None
+        
+        encoded = _encode_pool.submit(_encode_and_send, frame, msg, fmt, quality, scale, crop)
+        if props.get('wait'):
+            # One deadline covers both encoding and delivery
+            deadline = time.monotonic() + SEND_TIMEOUT
             try:
-                settings = load_settings()
-                uid = settings.get('user_id')
-                if context.discord_client and uid:
-                    async def _send_dm_img():
-                        try:
-                            await context.discord_client.wait_until_ready()
-                            user = await context.discord_client.fetch_user(int(uid))
-                            with open(temp_path, 'rb') as f:
-                                picture = discord.File(f, filename="screenshot.png")
-                                await user.send(content=msg, file=picture)
-                            log_message(f"Sent Screenshot to {uid}")
-                        except Exception as exc:
-                            log_message(f"Failed to send Screenshot: {exc}")
-                    
-                    if context.discord_loop:
-                        future = asyncio.run_coroutine_threadsafe(_send_dm_img(), context.discord_loop)
-                        try:
-                            future.result(timeout=20)
-                        except Exception as fe:
-                            log_message(f"Discord Screenshot Timed Out/Failed: {fe}")
-                    else:
-                        log_message("Discord loop not active.")
-                else:
-                    log_message("Skipped Discord Screenshot: No client or User ID.")
-            except Exception as e:
-                log_message(f"Discord Screenshot Error: {e}")
-            
-            # Cleanup
-            try: os.remove(temp_path)
-            except: pass
-            
+                sent = encoded.result(timeout=SEND_TIMEOUT)
+                sent.result(timeout=max(0.0, deadline - time.monotonic()))
+                log_message("Sent Screenshot.")
+            except FutureTimeout:
+                log_message(f"Discord Screenshot not sent within {SEND_TIMEOUT}s, continuing.")
+            except Exception as fe:
+                log_message(f"Discord Screenshot Failed: {fe}")
+        
         return node.get('next')
 
 class DiscordWaitNode(NodeHandler):
@@ -2,7 +2,8 @@ from typing import Dict, Any, Optional, List
 from context import RuntimeContext
 from nodes.base import NodeHandler
 from services.script_service import ScriptService
-from shared import log_message
+from shared import log_message, log_sampled
+from services.trace import tracer
 import shared # For global hooks
 
 class LoopNode(NodeHandler):
@@ -15,28 +16,48 @@ class LoopNode(NodeHandler):
         
         # Initialize
         if node_id not in context.loop_states:
-            c_val = int(props.get('count', 3))
-            # 0 means infinite (-1 internally)
-            if c_val == 0: c_val = -1
+            # Optional 'Items' input (e.g. Find All points): iterate once per item
+            items = self.get_input_value(node, 'Items', None, context)
+            if isinstance(items, (list, tuple)):
+                c_val = len(items)
+                context.loop_items[node_id] = list(items)
+                log_message(f"Loop Start (Items: {c_val})")
+            else:
+                c_val = int(props.get('count', 3))
+                # 0 means infinite (-1 internally)
+                if c_val == 0: c_val = -1
+                log_message(f"Loop Start (Count: {'Infinite' if c_val == -1 else c_val})")
             
             context.loop_states[node_id] = c_val
             context.loop_stack.append(node_id)
-            log_message(f"Loop Start (Count: {'Infinite' if c_val == -1 else c_val})")
             
         count = context.loop_states[node_id]
+        items = context.loop_items.get(node_id)
+        if items is not None and count > 0:
+            # Expose the current item on the data outputs before entering the body
+            index = len(items) - count
+            item = items[index]
+            if isinstance(item, (list, tuple)) and len(item) >= 2:
+                context.set_output(node_id, 2, item[0])  # Slot 2: X
+                context.set_output(node_id, 3, item[1])  # Slot 3: Y
+            context.set_output(node_id, 4, index)        # Slot 4: Index
+            context.set_output(node_id, 5, item)         # Slot 5: Item
         
         if count == -1:
             # Infinite
+            tracer.instant("loop iteration", "loop", id=node_id, remaining="inf")
             return node.get('next_body')
         elif count > 0:
             context.loop_states[node_id] -= 1
-            log_message(f"Looping... ({context.loop_states[node_id]} left)")
+            tracer.instant("loop iteration", "loop", id=node_id, remaining=context.loop_states[node_id])
+            log_sampled(f"loop:{node_id}", 5.0, "Looping... (%s left)", context.loop_states[node_id])
             return node.get('next_body')
         else:
             log_message("Loop Finished.")
             if context.loop_stack and context.loop_stack[-1] == node_id:
                 context.loop_stack.pop()
             context.loop_states.pop(node_id, None)
+            context.loop_items.pop(node_id, None)
             return node.get('next_exit')
 
 class LoopBreakNode(NodeHandler):
@@ -48,6 +69,7 @@ class LoopBreakNode(NodeHandler):
         if context.loop_stack:
             target_id = str(context.loop_stack.pop()) # Standardize to string
             context.loop_states.pop(target_id, None)
+            context.loop_items.pop(target_id, None)
             
             # We need to find the 'next_exit' of the target loop node.
             # But we don't have the target node object here, only ID.
@@ -157,14 +179,18 @@ class ScriptNode(NodeHandler):
                  
                  # Save parent script_path and set sub-script path
                  parent_script_path = context.script_path
+                 parent_script_name = context.script_name
                  context.script_path = sub_script_path
+                 context.script_name = script_name
                  
                  context.recursion_depth += 1
-                 success = context.executor.execute(sub_actions, context)
+                 with tracer.span(f"script: {script_name}", "script", depth=context.recursion_depth):
+                     success = context.executor.execute(sub_actions, context)
                  context.recursion_depth -= 1
                  
                  # Restore parent script_path
                  context.script_path = parent_script_path
+                 context.script_name = parent_script_name
                  
                  if success:
                      log_message(f"Sub-script '{script_name}' finished normally.")
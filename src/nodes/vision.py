@@ -1,7 +1,7 @@
 from typing import Dict, Any, Optional
 from context import RuntimeContext
 from nodes.base import NodeHandler
-from shared import log_message
+from shared import log_message, log_debug, log_sampled
 
 class FindImageNode(NodeHandler):
     @property
@@ -18,7 +18,7 @@ class FindImageNode(NodeHandler):
         if template:
             # Resolve template path with script-local priority
             resolved_path = resolve_template_path(template, context.script_path)
-            log_message(f"Checking: {resolved_path} (Algo: {algorithm})")
+            log_debug("Checking: %s (Algo: %s)", resolved_path, algorithm)
             center = context.bot.find_and_click(resolved_path, click_target=False, method=algorithm)
             
             if center:
@@ -26,11 +26,14 @@ class FindImageNode(NodeHandler):
                 context.set_output(node_id, 2, center[0]) # Slot 2: X
                 context.set_output(node_id, 3, center[1]) # Slot 3: Y
                 
+                context.branch_result = True
                 return node.get('next_found')
             else:
-                log_message(f"Not found: {template}")
+                log_sampled(f"not_found:{node_id}", 5.0, "Not found: %s", template)
+                context.branch_result = False
                 return node.get('next_not_found')
         else:
+            context.branch_result = False
             return node.get('next_not_found')
 
 class CheckPixelNode(NodeHandler):
@@ -51,24 +54,27 @@ class CheckPixelNode(NodeHandler):
             log_message(f"Invalid Hex color: {expected_hex}")
             return node.get('next_not_found')
 
-        log_message(f"Checking pixel at ({x}, {y}) for color #{expected_hex}")
+        log_debug("Checking pixel at (%s, %s) for color #%s", x, y, expected_hex)
         actual_bgr = context.bot.get_pixel_color(x, y)
         
         if actual_bgr:
             # actual_bgr is (B, G, R)
             actual_rgb = (actual_bgr[2], actual_bgr[1], actual_bgr[0])
-            log_message(f"Actual color: RGB{actual_rgb}")
+            log_debug("Actual color: RGB%s", actual_rgb)
             
             # Compare with tolerance
             diff = sum(abs(a - b) for a, b in zip(actual_rgb, expected_rgb))
             if diff <= tolerance * 3: # Simple Manhattan distance check
                 log_message("Color matches!")
+                context.branch_result = True
                 return node.get('next_found')
             else:
                 log_message(f"Color mismatch (Diff: {diff})")
+                context.branch_result = False
                 return node.get('next_not_found')
         else:
             log_message("Failed to get pixel color.")
+            context.branch_result = False
             return node.get('next_not_found')
 
 class FindMultiImagesNode(NodeHandler):
@@ -92,17 +98,165 @@ class FindMultiImagesNode(NodeHandler):
         
         log_message(f"Searching {len(templates)} images: {', '.join(templates)}")
         
-        for template in templates:
-            # Resolve template path with script-local priority
-            resolved_path = resolve_template_path(template, context.script_path)
-            log_message(f"Checking: {resolved_path} (Algo: {algorithm})")
-            center = context.bot.find_and_click(resolved_path, click_target=False, method=algorithm, timeout=1)
-            
-            if center:
-                log_message(f"✓ Found: {template} at ({center[0]}, {center[1]})")
-                context.set_output(node_id, 2, center[0])  # Slot 2: X
-                context.set_output(node_id, 3, center[1])  # Slot 3: Y
-                return node.get('next_found')
+        # Resolve template paths with script-local priority
+        resolved_paths = [resolve_template_path(t, context.script_path) for t in templates]
+        log_debug("Checking: %s (Algo: %s)", resolved_paths, algorithm)
+        
+        # Every template is evaluated on the same frame per attempt (one capture, shared screen features)
+        result = context.bot.find_any(resolved_paths, timeout=2, method=algorithm)
+        if result:
+            index, center = result
+            log_message(f"✓ Found: {templates[index]} at ({center[0]}, {center[1]})")
+            context.set_output(node_id, 2, center[0])  # Slot 2: X
+            context.set_output(node_id, 3, center[1])  # Slot 3: Y
+            context.branch_result = True
+            return node.get('next_found')
+        
+        log_sampled(f"not_found:{node_id}", 5.0, "✗ None of %d images found.", len(templates))
+        context.branch_result = False
+        return node.get('next_not_found')
+
+class FindAllNode(NodeHandler):
+    """Find every occurrence of a template in one pass; outputs Points (list of [x, y]) and Count."""
+    @property
+    def node_type(self): return "find_all"
+    
+    def execute(self, node: Dict[str, Any], context: RuntimeContext) -> Optional[str]:
+        from services.image_utils import resolve_template_path, parse_region
+        
+        props = node.get('properties', {})
+        node_id = node['id']
+        template = props.get('template', '')
+        if not template:
+            log_message("No template selected for Find All.")
+            context.set_output(node_id, 2, [])
+            context.set_output(node_id, 3, 0)
+            return node.get('next_not_found')
+        
+        try:
+            roi = parse_region(props.get('roi'))
+        except ValueError as e:
+            log_message(f"Find All: invalid region ({e}), using full screen.")
+            roi = None
+        
+        resolved_path = resolve_template_path(template, context.script_path)
+        found = context.bot.find_all(resolved_path,
+                                     timeout=float(props.get('timeout', 2)),
+                                     threshold=float(props.get('threshold', 0.8)),
+                                     max_results=int(props.get('max_results', 20)),
+                                     overlap=float(props.get('overlap', 0.3)),
+                                     scale=float(props.get('scale') or 0) or None,  # 0/empty: device scale
+                                     roi=roi)
+        points = [[x, y] for x, y, _ in found]
+        context.set_output(node_id, 2, points)       # Slot 2: Points
+        context.set_output(node_id, 3, len(points))  # Slot 3: Count
+        context.branch_result = bool(points)
+        if points:
+            log_message(f"✓ Found {len(points)} x {template}")
+            log_debug("Points: %s", points)
+            return node.get('next_found')
+        log_sampled(f"not_found:{node_id}", 5.0, "✗ No occurrences of %s.", template)
+        return node.get('next_not_found')
+
+class ScreenRouterNode(NodeHandler):
+    """Classify the current screen against the screen catalog and branch to its output ('Unknown' first)."""
+    @property
+    def node_type(self): return "screen_router"
+    
+    def execute(self, node: Dict[str, Any], context: RuntimeContext) -> Optional[str]:
+        import time
+        import shared
+        from services.screen_catalog import screen_catalog
+        from services.script_service import router_screens
+        
+        props = node.get('properties', {})
+        node_id = node['id']
+        screens = router_screens(props)
+        if not screens:
+            log_message("Screen Router: no screens configured.")
+            return node.get('next_unknown')
+        max_distance = int(props.get('max_distance', 10))
+        timeout = float(props.get('timeout', 2))
+        
+        # Poll until one of the listed screens is recognized (transitions may still be animating)
+        deadline = time.monotonic() + timeout
+        result = None
+        while shared.is_running:
+            frame = context.bot.frame()
+            if frame is not None:
+                result = screen_catalog.classify(frame, screens, max_distance)
+                if result is None:
+                    log_message(f"Screen Router: none of {', '.join(screens)} is in the screen catalog.")
+                    break
+                if result['name']:
+                    break
+            if time.monotonic() + 0.3 >= deadline:
+                break
+            time.sleep(0.3)
+        
+        if result and result['name']:
+            log_message(f"Screen: {result['name']} (distance {result['distance']})")
+            context.branch_result = True
+            return node.get(f"next_screen_{screens.index(result['name'])}")
+        if result:
+            log_sampled(f"screen_unknown:{node_id}", 5.0, "Screen unknown (closest: %s, distance %s).",
+                        result['best'], result['distance'])
+        context.branch_result = False
+        return node.get('next_unknown')
+
+class WaitChangeNode(NodeHandler):
+    """Wait until the screen (or a region) changes; 'Changed' / 'Timeout' outputs."""
+    @property
+    def node_type(self): return "wait_change"
+    
+    def execute(self, node: Dict[str, Any], context: RuntimeContext) -> Optional[str]:
+        from services.image_utils import parse_region
+        import shared
+        
+        props = node.get('properties', {})
+        try:
+            roi = parse_region(props.get('roi'))
+        except ValueError as e:
+            log_message(f"Wait Change: invalid region ({e}), using full screen.")
+            roi = None
+        threshold = float(props.get('threshold', 2.0))
+        timeout = float(props.get('timeout', 10.0))
+        
+        log_debug("Waiting for screen change (roi=%s, threshold=%s%%, timeout=%ss)", roi, threshold, timeout)
+        changed = context.bot.wait_for_change(roi=roi, threshold=threshold, timeout=timeout,
+                                              should_continue=lambda: shared.is_running)
+        context.branch_result = changed
+        if changed:
+            log_debug("Screen changed.")
+            return node.get('next_found')
+        log_sampled(f"wait_change_timeout:{node['id']}", 5.0, "Wait Change timed out after %ss.", timeout)
+        return node.get('next_not_found')
+
+class WaitStableNode(NodeHandler):
+    """Wait until the screen (or a region) stops changing; 'Stable' / 'Timeout' outputs."""
+    @property
+    def node_type(self): return "wait_stable"
+    
+    def execute(self, node: Dict[str, Any], context: RuntimeContext) -> Optional[str]:
+        from services.image_utils import parse_region
+        import shared
+        
+        props = node.get('properties', {})
+        try:
+            roi = parse_region(props.get('roi'))
+        except ValueError as e:
+            log_message(f"Wait Stable: invalid region ({e}), using full screen.")
+            roi = None
+        threshold = float(props.get('threshold', 0.5))
+        stable_ms = float(props.get('stable_ms', 300))
+        timeout = float(props.get('timeout', 10.0))
         
-        log_message(f"✗ None of {len(templates)} images found.")
+        log_debug("Waiting for stable screen (roi=%s, %sms below %s%%, timeout=%ss)", roi, stable_ms, threshold, timeout)
+        stable = context.bot.wait_for_stable(roi=roi, threshold=threshold, stable_ms=stable_ms, timeout=timeout,
+                                             should_continue=lambda: shared.is_running)
+        context.branch_result = stable
+        if stable:
+            log_debug("Screen stable.")
+            return node.get('next_found')
+        log_sampled(f"wait_stable_timeout:{node['id']}", 5.0, "Wait Stable timed out after %ss.", timeout)
         return node.get('next_not_found')
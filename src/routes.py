@@ -1,13 +1,25 @@
-from flask import render_template, request, jsonify, send_file
+from flask import render_template, request, jsonify, send_file, Response, stream_with_context
 import threading
 import os
 import time
 import json
 import shared
-from shared import log_message, log_lock, log_buffer
-from engine import get_bot
-from discord_manager import run_script
-from settings import load_settings, save_settings
+from shared import log_message, get_logs_since, wait_for_logs
+from settings import load_settings, settings_store
+from services.metrics import metrics
+from services.trace import tracer
+from services.profiler import profiler
+from services.screen_stream import screen_stream, FORMATS
+from services.image_library import image_library
+from services.startup import startup
+
+# engine (OpenCV/NumPy/ADB) and discord_manager (discord.py) are imported on
+# first use, so the server starts serving before those libraries are loaded.
+def get_bot():
+    return startup.timed_import('engine', reason='device connection').get_bot()
+
+def run_script(actions, mode='graph'):
+    return startup.timed_import('discord_manager', reason='script run').run_script(actions, mode)
 
 SCRIPTS_DIR = 'scripts'
 
@@ -15,30 +27,11 @@ def ensure_scripts_dir():
     if not os.path.exists(SCRIPTS_DIR):
         os.makedirs(SCRIPTS_DIR)
 
-def get_image_tree(path_to_scan, relative_path=""):
-    items = []
-    if not os.path.exists(path_to_scan):
-        return items
-        
-    for entry in sorted(os.listdir(path_to_scan)):
-        full_path = os.path.join(path_to_scan, entry)
-        rel_path = os.path.join(relative_path, entry).replace("\\", "/")
-        
-        if os.path.isdir(full_path):
-            children = get_image_tree(full_path, rel_path)
-            if children:
-                items.append({
-                    "name": entry,
-                    "type": "folder",
-                    "children": children
-                })
-        elif entry.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp')):
-            items.append({
-                "name": entry,
-                "type": "file",
-                "path": "images/" + rel_path
-            })
-    return items
+def get_device_bot():
+    """Reuse the connected bot for previews instead of reconnecting on every request"""
+    if shared.bot is None or not shared.bot.device:
+        shared.bot = get_bot()
+    return shared.bot
 
 def configure_routes(app):
     
@@ -48,8 +41,28 @@ def configure_routes(app):
 
     @app.route('/logs')
     def get_logs():
-        with log_lock:
-            return jsonify({"logs": list(log_buffer)})
+        # ?since=<seq> returns only records newer than the cursor
+        since = request.args.get('since', 0, type=int)
+        records, last_seq, missed = get_logs_since(since)
+        return jsonify({"logs": records, "last_seq": last_seq, "missed": missed})
+
+    @app.route('/logs/stream')
+    def stream_logs():
+        # Server-sent events; browsers resend the last 'id' as Last-Event-ID on reconnect
+        cursor = request.headers.get('Last-Event-ID', type=int) or request.args.get('since', 0, type=int)
+
+        def generate(cursor):
+            while True:
+                records = wait_for_logs(cursor, timeout=15)
+                if not records:
+                    yield ": keep-alive\n\n"
+                    continue
+                for record in records:
+                    yield f"id: {record['seq']}\ndata: {json.dumps(record, ensure_ascii=False)}\n\n"
+                cursor = records[-1]['seq']
+
+        return Response(stream_with_context(generate(cursor)), mimetype='text/event-stream',
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
     @app.route('/run', methods=['POST'])
     def run():
@@ -123,17 +136,12 @@ def configure_routes(app):
     @app.route('/capture', methods=['POST'])
     def capture():
         try:
-            bot_instance = get_bot()
+            bot_instance = get_device_bot()
             if bot_instance.device:
-                if not os.path.exists('static'):
-                    os.makedirs('static')
-                    
-                filename = "static/capture.png"
-                bot_instance.screencap(filename)
-                
+                # Lossless PNG so the color picker reads exact pixel values; served from memory
                 return jsonify({
                     "status": "success", 
-                    "url": f"/{filename}?t={int(time.time())}"
+                    "url": f"/api/capture/frame?format=png&t={int(time.time() * 1000)}"
                 })
             else:
                 return jsonify({"status": "error", "message": "無法連接到設備 (Device not connected)"}), 500
@@ -141,6 +149,50 @@ def configure_routes(app):
             log_message(f"Capture failed: {e}")
             return jsonify({"status": "error", "message": f"Error: {e}"}), 500
 
+    @app.route('/api/capture/frame', methods=['GET'])
+    def capture_frame():
+        fmt = request.args.get('format', 'jpeg').lower()
+        if fmt not in FORMATS:
+            return jsonify({"status": "error", "message": f"Unsupported format '{fmt}'"}), 400
+        quality = request.args.get('quality', 80, type=int)
+        scale = request.args.get('scale', 1.0, type=float)
+        # Reuse a frame captured within max_age seconds (shared with other viewers)
+        max_age = request.args.get('max_age', 0.0, type=float)
+        try:
+            bot_instance = get_device_bot()
+            if not bot_instance.device:
+                return jsonify({"status": "error", "message": "無法連接到設備 (Device not connected)"}), 500
+            seq, data, mimetype = screen_stream.encoded(bot_instance, fmt, quality, scale, max_age=max_age)
+        except Exception as e:
+            log_message(f"Capture failed: {e}")
+            return jsonify({"status": "error", "message": f"Error: {e}"}), 500
+
+        etag = f'"{seq}-{fmt}-{quality}-{scale}"'
+        if request.headers.get('If-None-Match') == etag:
+            return Response(status=304, headers={"ETag": etag})
+        return Response(data, mimetype=mimetype, headers={
+            "ETag": etag,
+            "X-Frame-Seq": str(seq),
+            "Cache-Control": "no-cache",
+        })
+
+    @app.route('/api/capture/stream', methods=['GET'])
+    def capture_stream():
+        max_fps = float(settings_store.get('stream_max_fps', 10))
+        fps = min(request.args.get('fps', 5.0, type=float), max_fps)
+        quality = request.args.get('quality', 70, type=int)
+        scale = request.args.get('scale', 1.0, type=float)
+        try:
+            bot_instance = get_device_bot()
+        except Exception as e:
+            return jsonify({"status": "error", "message": f"Error: {e}"}), 500
+        if not bot_instance.device:
+            return jsonify({"status": "error", "message": "無法連接到設備 (Device not connected)"}), 500
+
+        return Response(screen_stream.mjpeg(bot_instance, fps=fps, quality=quality, scale=scale),
+                        mimetype='multipart/x-mixed-replace; boundary=frame',
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
     @app.route('/images', methods=['GET'])
     def list_images():
         try:
@@ -181,7 +233,8 @@ def configure_routes(app):
             return jsonify({"error": "Missing name or content"}), 400
             
         try:
-            from services.image_utils import extract_image_paths_from_script, copy_images_to_script_folder
+            from services.image_utils import extract_image_paths_from_script
+            from services.template_store import template_store
             
             # Create script folder
             script_folder = os.path.join(SCRIPTS_DIR, name)
@@ -204,9 +257,10 @@ def configure_routes(app):
             if isinstance(parsed_content, dict) and 'nodes' in parsed_content:
                 images = extract_image_paths_from_script(parsed_content)
                 log_message(f"Found {len(images)} images in script: {images}")
-                if images:
-                    copied = copy_images_to_script_folder(images, script_folder)
-                    log_message(f"Copied {copied} images to script folder.")
+                # Only changed templates are stored/linked; unchanged ones cost a stat
+                counts = template_store.sync_script_images(images, script_folder)
+                log_message(f"Script images: {counts['linked']} updated, {counts['unchanged']} unchanged, "
+                            f"{counts['stored']} new blobs, {counts['missing']} missing.")
             
             # Clean up legacy .json file if exists
             legacy_file = os.path.join(SCRIPTS_DIR, f"{name}.json")
@@ -214,18 +268,49 @@ def configure_routes(app):
                 os.remove(legacy_file)
                 log_message(f"Removed legacy file: {legacy_file}")
             
-            return jsonify({"status": "success", "message": f"Script '{name}' saved."})
+            # Analyze once on save; analysis.json is reused until script.json changes
+            analysis = None
+            try:
+                from services.graph_analysis import analyze_script
+                result = analyze_script(name)
+                analysis = result["counts"] if result else None
+            except Exception as e:
+                log_message(f"Graph analysis failed for '{name}': {e}")
+            
+            return jsonify({"status": "success", "message": f"Script '{name}' saved.", "analysis": analysis})
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
     @app.route('/api/images', methods=['GET'])
     def api_list_images():
-        img_dir = os.path.join(os.getcwd(), 'images')
-        if not os.path.exists(img_dir):
-            os.makedirs(img_dir)
-        
-        tree = get_image_tree(img_dir)
-        return jsonify({"images": tree})
+        # Flat, paginated listing when filtering/paging; folder tree otherwise
+        if any(k in request.args for k in ('q', 'folder', 'offset', 'limit')):
+            offset = max(0, request.args.get('offset', 0, type=int))
+            limit = max(1, min(1000, request.args.get('limit', 100, type=int)))
+            items, total = image_library.search(request.args.get('q', ''), request.args.get('folder'), offset, limit)
+            return jsonify({"images": items, "total": total, "offset": offset, "limit": limit,
+                            "version": image_library.version})
+
+        tree = image_library.tree()
+        etag = f'"images-{image_library.version}"'
+        if request.headers.get('If-None-Match') == etag:
+            return Response(status=304, headers={"ETag": etag})
+        response = jsonify({"images": tree, "version": image_library.version})
+        response.headers["ETag"] = etag
+        return response
+
+    @app.route('/api/images/thumb/<path:path>', methods=['GET'])
+    def api_image_thumb(path):
+        size = request.args.get('size', 128, type=int)
+        try:
+            thumb = image_library.thumbnail(path, size)
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        if not thumb:
+            return jsonify({"error": "Image not found"}), 404
+        response = send_file(os.path.abspath(thumb), mimetype='image/png')
+        response.headers["Cache-Control"] = "public, max-age=86400"
+        return response
 
     @app.route('/api/scripts/<name>', methods=['GET'])
     def load_script(name):
@@ -279,34 +364,347 @@ def configure_routes(app):
             settings = load_settings()
             return jsonify(settings)
         elif request.method == 'POST':
-            new_data = request.json
-            current_settings = load_settings()
-            
-            # Update generic fields
-            for key, value in new_data.items():
-                current_settings[key] = value
-                
-            if save_settings(current_settings):
-                # Restart bot to apply new token OR new command list
-                from discord_manager import start_bot_background, stop_bot
-                
-                # Check for commands update or token update
-                # Simpler to just restart if anything distinct changes, or just always restart on save for simplicity
-                stop_bot()
-                # Give it a moment?
-                start_bot_background(current_settings.get('discord_token'))
-                
-                return jsonify({"status": "success", "message": "Settings saved"})
-            else:
+            new_data = request.get_json(silent=True) or {}
+            try:
+                # Subscribers react to the keys that changed (log level, Discord token/commands)
+                changed = settings_store.update(new_data)
+            except Exception as e:
+                log_message(f"Error saving settings: {e}")
                 return jsonify({"status": "error", "message": "Failed to save settings"})
+            return jsonify({"status": "success", "message": "Settings saved", "changed": sorted(changed)})
 
     @app.route('/api/logs/export', methods=['GET'])
     def export_logs():
         try:
-            if os.path.exists("server.log"):
+            # Make sure queued records are on disk first
+            shared.log_writer.flush()
+            if os.path.exists(shared.LOG_FILE):
                 # Use send_file to return the log file
-                return send_file(os.path.abspath("server.log"), as_attachment=True, download_name="server.log")
+                return send_file(os.path.abspath(shared.LOG_FILE), as_attachment=True, download_name="server.log")
             else:
                 return "No log file found.", 404
         except Exception as e:
             return str(e), 500
+
+    @app.route('/api/metrics', methods=['GET'])
+    def get_metrics():
+        # Prometheus text exposition format
+        return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+    @app.route('/api/metrics/json', methods=['GET'])
+    def get_metrics_json():
+        return jsonify(metrics.snapshot())
+
+    @app.route('/api/metrics/reset', methods=['POST'])
+    def reset_metrics():
+        metrics.reset()
+        return jsonify({"status": "success", "message": "Metrics reset"})
+
+    @app.route('/api/trace/start', methods=['POST'])
+    def start_trace():
+        data = request.get_json(silent=True) or {}
+        tracer.start(capacity=data.get('capacity'))
+        log_message("Trace recording started.")
+        return jsonify({"status": "success", **tracer.status()})
+
+    @app.route('/api/trace/stop', methods=['POST'])
+    def stop_trace():
+        tracer.stop()
+        log_message(f"Trace recording stopped ({tracer.status()['events']} events).")
+        return jsonify({"status": "success", **tracer.status()})
+
+    @app.route('/api/trace', methods=['GET'])
+    def export_trace():
+        # Chrome trace-event JSON, open in chrome://tracing or ui.perfetto.dev
+        if request.args.get('status'):
+            return jsonify(tracer.status())
+        body = json.dumps(tracer.export())
+        return Response(body, mimetype='application/json',
+                        headers={"Content-Disposition": "attachment; filename=trace.json"})
+
+    @app.route('/api/trace', methods=['DELETE'])
+    def clear_trace():
+        tracer.clear()
+        return jsonify({"status": "success", **tracer.status()})
+
+    @app.route('/api/profile/start', methods=['POST'])
+    def start_profile():
+        data = request.get_json(silent=True) or {}
+        interval_ms = data.get('interval_ms')
+        if not profiler.start(interval=float(interval_ms) / 1000 if interval_ms else None):
+            return jsonify({"status": "error", "message": "Profiler is already running", **profiler.status()}), 400
+        log_message(f"Profiler started (interval {profiler.interval * 1000:.1f} ms).")
+        return jsonify({"status": "success", **profiler.status()})
+
+    @app.route('/api/profile/stop', methods=['POST'])
+    def stop_profile():
+        if not profiler.stop():
+            return jsonify({"status": "error", "message": "Profiler is not running", **profiler.status()}), 400
+        log_message(f"Profiler stopped ({profiler.samples} samples).")
+        return jsonify({"status": "success", **profiler.status(), "top": profiler.top()})
+
+    @app.route('/api/profile', methods=['GET'])
+    def export_profile():
+        fmt = request.args.get('format', 'collapsed')
+        if fmt == 'pstats':
+            return Response(profiler.pstats_bytes(), mimetype='application/octet-stream',
+                            headers={"Content-Disposition": "attachment; filename=profile.pstats"})
+        elif fmt == 'collapsed':
+            return Response(profiler.collapsed(), mimetype='text/plain; charset=utf-8',
+                            headers={"Content-Disposition": "attachment; filename=profile.collapsed.txt"})
+        elif fmt == 'json':
+            return jsonify({**profiler.status(), "top": profiler.top(int(request.args.get('limit', 50)))})
+        return jsonify({"error": f"Unknown format '{fmt}'"}), 400
+
+    @app.route('/api/logs/level', methods=['GET', 'POST'])
+    def log_level():
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            level = str(data.get('level', '')).lower()
+            if level not in shared.LEVELS:
+                return jsonify({"status": "error", "message": f"Unknown level '{level}'"}), 400
+            shared.set_log_level(level)
+            log_message(f"Log level set to {level}.")
+        return jsonify({"level": shared.LEVEL_NAMES[shared.log_level], "levels": list(shared.LEVELS)})
+
+    @app.route('/api/store/gc', methods=['POST'])
+    def store_gc():
+        from services.template_store import template_store
+        data = request.get_json(silent=True) or {}
+        try:
+            result = template_store.gc(SCRIPTS_DIR, dry_run=bool(data.get('dry_run')))
+        except Exception as e:
+            return jsonify({"status": "error", "message": str(e)}), 500
+        log_message(f"Template store GC: removed {result['removed']} blobs ({result['freed_bytes']} bytes).")
+        return jsonify({"status": "success", **result})
+
+    @app.route('/api/scripts/<name>/export', methods=['GET'])
+    def export_script_bundle(name):
+        from services.bundle import export_bundle
+        try:
+            data = export_bundle(name)
+        except FileNotFoundError as e:
+            return jsonify({"error": str(e)}), 404
+        except Exception as e:
+            log_message(f"Bundle export failed: {e}")
+            return jsonify({"error": str(e)}), 500
+        return Response(data, mimetype='application/zip',
+                        headers={"Content-Disposition": f"attachment; filename={name}.bbs.zip"})
+
+    @app.route('/api/scripts/import', methods=['POST'])
+    def import_script_bundle():
+        from services.bundle import import_bundle
+        # Accept multipart upload ('bundle' field) or a raw zip body
+        upload = request.files.get('bundle')
+        data = upload.read() if upload else request.get_data()
+        if not data:
+            return jsonify({"status": "error", "message": "No bundle uploaded"}), 400
+        overwrite = request.args.get('overwrite', '').lower() in ('1', 'true', 'yes')
+        try:
+            result = import_bundle(data, overwrite=overwrite)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        except Exception as e:
+            log_message(f"Bundle import failed: {e}")
+            return jsonify({"status": "error", "message": str(e)}), 500
+        return jsonify({"status": "success", **result})
+
+    @app.route('/api/startup', methods=['GET'])
+    def startup_report():
+        from executor import NodeRegistry
+        report = startup.report()
+        report["node_types"] = NodeRegistry.known_types()
+        report["node_types_loaded"] = NodeRegistry.loaded_types()
+        return jsonify(report)
+
+    @app.route('/api/run/prepare', methods=['GET', 'POST'])
+    def prepare_run_route():
+        """POST: preload a graph (same body as /run) and report missing templates. GET: last run's report."""
+        if request.method == 'GET':
+            return jsonify(shared.last_prepare or {})
+        from services.warmup import prepare_run
+        data = request.get_json(silent=True) or {}
+        try:
+            report = prepare_run(data.get('actions', []), connect=bool(data.get('connect', False)))
+        except Exception as e:
+            return jsonify({"status": "error", "message": str(e)}), 500
+        return jsonify({"status": "success", **report})
+
+    @app.route('/api/scripts/<name>/analysis', methods=['GET'])
+    def script_analysis(name):
+        from services.graph_analysis import analyze_script
+        try:
+            result = analyze_script(name, use_cache=request.args.get('refresh') is None)
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        if result is None:
+            return jsonify({"error": f"Script '{name}' not found"}), 404
+        return jsonify(result)
+
+    @app.route('/api/analyze', methods=['POST'])
+    def analyze_graph():
+        """Analyze an unsaved graph: {"actions": [...]} (normalized) or {"content": <LiteGraph JSON>}."""
+        from services.graph_analysis import analyze
+        from services.script_service import ScriptService
+        data = request.get_json(silent=True) or {}
+        nodes = data.get('actions')
+        if nodes is None:
+            content = data.get('content')
+            if isinstance(content, str):
+                try:
+                    content = json.loads(content)
+                except ValueError:
+                    return jsonify({"error": "Invalid content JSON"}), 400
+            nodes = ScriptService.normalize(content) if content is not None else []
+        return jsonify(analyze(nodes))
+
+    @app.route('/api/match-memo', methods=['GET', 'POST', 'DELETE'])
+    def match_memo_route():
+        from services.match_memo import match_memo
+        if request.method == 'DELETE':
+            match_memo.clear()
+        elif request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            if 'enabled' in data:
+                match_memo.enabled = bool(data['enabled'])
+                if not match_memo.enabled:
+                    match_memo.clear()
+        return jsonify({"entries": len(match_memo), "max_entries": match_memo.max_entries,
+                        "enabled": match_memo.enabled,
+                        "hits": metrics.get_counter("match_memo", result="hit"),
+                        "misses": metrics.get_counter("match_memo", result="miss")})
+
+    def _parse_ignore(value):
+        """Ignored regions: list of [x,y,w,h] or "x,y,w,h; x,y,w,h"."""
+        from services.image_utils import parse_region
+        if not value:
+            return []
+        if isinstance(value, str):
+            value = [part for part in value.split(';') if part.strip()]
+        return [list(r) for r in (parse_region(v) for v in value) if r]
+
+    @app.route('/api/screens', methods=['GET'])
+    def list_screens():
+        from services.screen_catalog import screen_catalog
+        return jsonify({"screens": screen_catalog.list()})
+
+    @app.route('/api/screens', methods=['POST'])
+    def register_screen():
+        """Register a reference screen: multipart 'image' upload, or the current device frame."""
+        from services.screen_catalog import screen_catalog
+        data = request.get_json(silent=True) or request.form
+        name = data.get('name', '')
+        try:
+            ignore = _parse_ignore(data.get('ignore'))
+            upload = request.files.get('image')
+            if upload:
+                import cv2
+                import numpy as np
+                bgr = cv2.imdecode(np.frombuffer(upload.read(), np.uint8), cv2.IMREAD_COLOR)
+                if bgr is None:
+                    return jsonify({"status": "error", "message": "Unreadable image"}), 400
+            else:
+                bot_instance = get_device_bot()
+                if not bot_instance.device:
+                    return jsonify({"status": "error", "message": "無法連接到設備 (Device not connected)"}), 500
+                frame = bot_instance.frame()
+                if frame is None:
+                    return jsonify({"status": "error", "message": "Capture failed"}), 500
+                bgr = frame.bgr
+            entry = screen_catalog.register(name, bgr, ignore)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        except Exception as e:
+            log_message(f"Screen registration failed: {e}")
+            return jsonify({"status": "error", "message": str(e)}), 500
+        log_message(f"Registered screen '{entry['name']}'.")
+        return jsonify({"status": "success", "screen": entry})
+
+    @app.route('/api/screens/<name>', methods=['DELETE'])
+    def delete_screen(name):
+        from services.screen_catalog import screen_catalog
+        if not screen_catalog.remove(name):
+            return jsonify({"status": "error", "message": f"Screen '{name}' not found"}), 404
+        return jsonify({"status": "success"})
+
+    @app.route('/api/screens/<name>/image', methods=['GET'])
+    def screen_image(name):
+        from services.screen_catalog import screen_catalog
+        path = screen_catalog.image_path(name)
+        if not path or not os.path.exists(path):
+            return jsonify({"error": f"Screen '{name}' not found"}), 404
+        return send_file(os.path.abspath(path), mimetype='image/png')
+
+    @app.route('/api/screens/classify', methods=['GET'])
+    def classify_screen():
+        """Classify the current device frame (?screens=a,b to restrict, ?max_distance=N)."""
+        from services.screen_catalog import screen_catalog, DEFAULT_MAX_DISTANCE
+        from services.script_service import router_screens
+        try:
+            bot_instance = get_device_bot()
+            frame = bot_instance.frame() if bot_instance.device else None
+        except Exception as e:
+            return jsonify({"status": "error", "message": str(e)}), 500
+        if frame is None:
+            return jsonify({"status": "error", "message": "無法連接到設備 (Device not connected)"}), 500
+        screens = router_screens({"screens": request.args.get('screens', '')}) or None
+        result = screen_catalog.classify(frame, screens,
+                                         request.args.get('max_distance', DEFAULT_MAX_DISTANCE, type=int))
+        return jsonify({"status": "success", "result": result})
+
+    @app.route('/api/device/display', methods=['GET'])
+    def device_display():
+        """Resolution/density of the connected device (?refresh=1 re-reads it)."""
+        try:
+            bot_instance = get_device_bot()
+        except Exception as e:
+            return jsonify({"status": "error", "message": str(e)}), 500
+        if not bot_instance.device:
+            return jsonify({"status": "error", "message": "無法連接到設備 (Device not connected)"}), 500
+        if bot_instance.display is None or request.args.get('refresh'):
+            bot_instance.display = bot_instance.read_display()
+        return jsonify({"status": "success", "display": bot_instance.display})
+
+    @app.route('/api/templates/resolution', methods=['GET', 'POST'])
+    def template_resolution():
+        """
+        GET ?template=images/x.png: recorded capture resolution and the scale on the connected device.
+        POST {"templates": [...], "resolution": "1280x720@240" | "device" | null}: record (null clears).
+        """
+        from services.image_utils import resolve_template_path
+        from services.template_store import template_store
+        from services.template_meta import template_meta, parse_resolution, scale_between
+
+        if request.method == 'GET':
+            path = resolve_template_path(request.args.get('template', ''))
+            if not os.path.isfile(path):
+                return jsonify({"error": "Template not found"}), 404
+            digest = template_store.hash_file(path)
+            recorded = template_meta.get(digest)
+            effective = template_meta.resolution_for(digest)
+            display = shared.bot.display if shared.bot is not None and shared.bot.device else None
+            return jsonify({"template": path, "recorded": recorded, "effective": effective, "display": display,
+                            "scale": scale_between(effective, display) if effective and display else None})
+
+        data = request.get_json(silent=True) or {}
+        value = data.get('resolution')
+        try:
+            if value == 'device':
+                bot_instance = get_device_bot()
+                if not bot_instance.device or not bot_instance.display:
+                    return jsonify({"status": "error", "message": "Device resolution unknown"}), 500
+                resolution = dict(bot_instance.display)
+            else:
+                resolution = parse_resolution(value)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        digests, missing = [], []
+        for template in data.get('templates', []):
+            path = resolve_template_path(template)
+            if os.path.isfile(path):
+                digests.append(template_store.hash_file(path))
+            else:
+                missing.append(template)
+        template_meta.set(digests, resolution)
+        return jsonify({"status": "success", "updated": len(digests), "missing": missing, "resolution": resolution})
@@ -0,0 +1,118 @@
+"""
+Batched template matching in the frequency domain.
+Evaluating N templates with N independent matchTemplate calls repeats the
+screen-side work N times. Here the screen spectrum and its integral images are
+computed once per frame, template spectra are cached by content, and each
+template then costs one spectrum multiply and one inverse DFT. Scores are
+TM_CCOEFF_NORMED, so thresholds carry over from the per-template matcher.
+"""
+import threading
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# Cached template spectra (float32 CCS at screen DFT size) are evicted past this many bytes
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def _spectrum(image, shape):
+    """Forward DFT (packed CCS) of a float32 image zero-padded to shape."""
+    padded = np.zeros(shape, np.float32)
+    padded[:image.shape[0], :image.shape[1]] = image
+    return cv2.dft(padded, nonzeroRows=image.shape[0])
+
+
+class BatchMatcher:
+    def __init__(self, max_cache_bytes: int = MAX_CACHE_BYTES):
+        self.max_cache_bytes = max_cache_bytes
+        self._lock = threading.Lock()
+        # {(key, dft_h, dft_w): spectrum} in LRU order
+        self._spectra: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+        self._cache_bytes = 0
+
+    def clear(self):
+        with self._lock:
+            self._spectra.clear()
+            self._cache_bytes = 0
+
+    def _template_spectrum(self, key: Hashable, centered, shape):
+        cache_key = (key, shape)
+        with self._lock:
+            spectrum = self._spectra.get(cache_key)
+            if spectrum is not None:
+                self._spectra.move_to_end(cache_key)
+                return spectrum
+        spectrum = _spectrum(centered, shape)
+        with self._lock:
+            self._spectra[cache_key] = spectrum
+            self._cache_bytes += spectrum.nbytes
+            while self._cache_bytes > self.max_cache_bytes and len(self._spectra) > 1:
+                _, old = self._spectra.popitem(last=False)
+                self._cache_bytes -= old.nbytes
+        return spectrum
+
+    @staticmethod
+    def _inverse_deviation(sums, sq_sums, th: int, tw: int):
+        """1 / sqrt(sum of squared deviations) of every th x tw window, from integral images (in place)."""
+        s1 = sums[th:, tw:] - sums[:-th, tw:]
+        s1 -= sums[th:, :-tw]
+        s1 += sums[:-th, :-tw]
+        s2 = sq_sums[th:, tw:] - sq_sums[:-th, tw:]
+        s2 -= sq_sums[th:, :-tw]
+        s2 += sq_sums[:-th, :-tw]
+        s1 *= s1
+        s1 *= 1.0 / (th * tw)
+        s2 -= s1
+        deviation = cv2.sqrt(np.maximum(s2, 0).astype(np.float32))
+        # Flat windows have no defined correlation: score them 0 like a non-match
+        return np.divide(1.0, deviation, out=np.zeros_like(deviation), where=deviation > 1e-3)
+
+    def match(self, screen, templates: Sequence, keys: Optional[Sequence[Hashable]] = None
+              ) -> List[Optional[Tuple[float, Tuple[int, int]]]]:
+        """
+        Best TM_CCOEFF_NORMED score of every template on one grayscale screen.
+
+        Args:
+            screen: uint8 grayscale image
+            templates: uint8 grayscale templates
+            keys: content keys (e.g. template digests) for the spectrum cache; None disables caching
+
+        Returns:
+            [(score, (x, y) top-left)] per template, None where the template does not fit
+        """
+        H, W = screen.shape[:2]
+        # Circular correlation is exact for the valid region as long as the DFT covers the screen
+        shape = (cv2.getOptimalDFTSize(H), cv2.getOptimalDFTSize(W))
+        screen_f = screen.astype(np.float32)
+        screen_spectrum = _spectrum(screen_f, shape)
+        sums, sq_sums = cv2.integral2(screen_f, sdepth=cv2.CV_64F)
+
+        results: List[Optional[Tuple[float, Tuple[int, int]]]] = [None] * len(templates)
+        inv_std = {}  # {(th, tw): 1 / windowed deviation (0 on flat windows)}, shared by same-size templates
+        for i, template in enumerate(templates):
+            th, tw = template.shape[:2]
+            if th > H or tw > W:
+                continue
+            centered = template.astype(np.float32)
+            centered -= centered.mean()
+            norm = float(np.sqrt((centered.astype(np.float64) ** 2).sum()))
+            if norm < 1e-6:
+                results[i] = (0.0, (0, 0))  # Flat template: correlation undefined
+                continue
+            if (th, tw) not in inv_std:
+                inv_std[(th, tw)] = self._inverse_deviation(sums, sq_sums, th, tw)
+
+            key = keys[i] if keys is not None else None
+            spectrum = self._template_spectrum(key, centered, shape) if key is not None else _spectrum(centered, shape)
+            product = cv2.mulSpectrums(screen_spectrum, spectrum, 0, conjB=True)
+            corr = cv2.idft(product, flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE)
+            scores = cv2.multiply(corr[:H - th + 1, :W - tw + 1], inv_std[(th, tw)], scale=1.0 / norm)
+            _, best, _, loc = cv2.minMaxLoc(scores)
+            results[i] = (float(min(best, 1.0)), (int(loc[0]), int(loc[1])))
+        return results
+
+
+# Global matcher (template spectra are shared across bots and scripts)
+batch_matcher = BatchMatcher()
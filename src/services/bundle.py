@@ -0,0 +1,218 @@
+"""
+Single-file script bundles.
+A bundle is a zip archive holding a script, every sub-script it calls through
+Script nodes, their templates (content-addressed) and precomputed SIFT
+features, so an imported script runs without first-run feature extraction.
+
+Layout:
+    bundle.json                      manifest (scripts, dependencies, templates)
+    scripts/<name>/script.json       script files, stored verbatim
+    blobs/<sha256><ext>              template images
+    features/<sha256>.npz            template SIFT keypoints/descriptors
+
+Blob entries carry the template's capture resolution when one is recorded.
+"""
+import datetime
+import hashlib
+import io
+import json
+import os
+import zipfile
+from typing import Dict, Any, List
+
+from shared import log_message
+from services.script_service import ScriptService
+from services.image_utils import extract_image_paths_from_script, resolve_template_path
+from services.template_store import template_store, relative_image_path, check_blob_key
+from services.template_meta import template_meta, parse_resolution
+
+BUNDLE_FORMAT = "bluestacks-script-bundle"
+BUNDLE_VERSION = 1
+
+
+def _check_name(name: str) -> str:
+    if not name or name in ('.', '..') or os.path.basename(name) != name or '\\' in name:
+        raise ValueError(f"Invalid script name '{name}'")
+    return name
+
+
+def _read(zf: zipfile.ZipFile, name: str) -> bytes:
+    """Read a bundle entry; a missing entry is an invalid bundle."""
+    try:
+        return zf.read(name)
+    except KeyError:
+        raise ValueError(f"Bundle entry {name} is missing")
+
+
+def script_dependencies(nodes: List[Dict[str, Any]]) -> List[str]:
+    """Sub-script names referenced by Script nodes, in first-use order."""
+    deps = []
+    for node in nodes:
+        if node.get('type', '').replace('bot/', '') == 'script':
+            name = (node.get('properties', {}).get('scriptName') or '').strip()
+            if name and name not in deps:
+                deps.append(name)
+    return deps
+
+
+def export_bundle(script_name: str) -> bytes:
+    """Build a bundle for a script and its (transitive) sub-scripts. Returns zip bytes."""
+    from services.template_cache import template_cache
+
+    scripts: Dict[str, Dict[str, Any]] = {}
+    blobs: Dict[str, Dict[str, Any]] = {}
+    buf = io.BytesIO()
+
+    with zipfile.ZipFile(buf, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        pending = [script_name]
+        while pending:
+            name = pending.pop(0)
+            if name in scripts:
+                continue
+            script_file, script_folder = ScriptService.locate(name)
+            if not script_file:
+                raise FileNotFoundError(f"Script '{name}' not found")
+
+            raw = ScriptService.load_raw(script_file)
+            nodes = ScriptService.normalize(raw) if raw is not None else []
+            deps = script_dependencies(nodes)
+            pending.extend(deps)
+
+            templates, missing = {}, []
+            for template in sorted(extract_image_paths_from_script({'nodes': nodes})):
+                path = resolve_template_path(template, script_folder)
+                if not os.path.isfile(path):
+                    missing.append(template)
+                    continue
+                digest = template_store.hash_file(path)
+                ext = os.path.splitext(path)[1].lower()
+                key = digest + ext
+                templates[relative_image_path(template)] = {"hash": digest, "ext": ext, "size": os.path.getsize(path)}
+                if key in blobs:
+                    continue
+
+                zf.write(path, f"blobs/{key}", compress_type=zipfile.ZIP_STORED)  # Already compressed images
+                entry = {"size": os.path.getsize(path), "features": False}
+                resolution = template_meta.get(digest)
+                if resolution:
+                    entry["resolution"] = resolution
+                try:
+                    features = template_cache.features_bytes(path)
+                    if features:
+                        zf.writestr(f"features/{digest}.npz", features)
+                        entry["features"] = True
+                except Exception as e:
+                    log_message(f"Bundle: could not precompute features for {template}: {e}")
+                blobs[key] = entry
+
+            zf.write(script_file, f"scripts/{name}/script.json")
+            scripts[name] = {"dependencies": deps, "templates": templates, "missing_templates": missing}
+
+        zf.writestr("bundle.json", json.dumps({
+            "format": BUNDLE_FORMAT,
+            "version": BUNDLE_VERSION,
+            "name": script_name,
+            "created": datetime.datetime.utcnow().isoformat() + 'Z',
+            "scripts": scripts,
+            "blobs": blobs,
+        }, indent=2, ensure_ascii=False))
+
+    return buf.getvalue()
+
+
+def import_bundle(data: bytes, overwrite: bool = False) -> Dict[str, Any]:
+    """
+    Install a bundle: templates go into the content-addressed store, features
+    into the feature cache, and each script gets its folder, manifest and views.
+
+    Raises:
+        ValueError: invalid bundle, or existing scripts and overwrite=False
+    """
+    from services.template_cache import template_cache
+
+    try:
+        zf = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile:
+        raise ValueError("Not a bundle (invalid zip file)")
+
+    with zf:
+        try:
+            manifest = json.loads(zf.read("bundle.json").decode('utf-8'))
+        except KeyError:
+            raise ValueError("Not a bundle (bundle.json missing)")
+        if not isinstance(manifest, dict) or manifest.get("format") != BUNDLE_FORMAT or int(manifest.get("version", 0)) > BUNDLE_VERSION:
+            raise ValueError("Unsupported bundle format or version")
+
+        scripts = manifest.get("scripts", {})
+        blobs = manifest.get("blobs", {})
+        if not isinstance(scripts, dict) or not isinstance(blobs, dict):
+            raise ValueError("Invalid bundle manifest")
+        for name in scripts:
+            _check_name(name)
+        existing = [name for name in scripts if ScriptService.locate(name)[0]]
+        if existing and not overwrite:
+            raise ValueError(f"Scripts already exist: {', '.join(existing)}")
+
+        # Validate and read everything before writing anything: blobs (name, content,
+        # features, resolution), then every script file and template path
+        verified = {}
+        for key, entry in blobs.items():
+            digest, ext = check_blob_key(key)
+            if not isinstance(entry, dict):
+                raise ValueError(f"Invalid entry for template blob {key}")
+            blob = _read(zf, f"blobs/{key}")
+            if hashlib.sha256(blob).hexdigest() != digest:
+                raise ValueError(f"Corrupt template blob {key}")
+            features = None
+            if entry.get("features"):
+                features = _read(zf, f"features/{digest}.npz")
+                template_cache.check_features(features)
+            resolution = None
+            if entry.get("resolution"):
+                try:
+                    resolution = parse_resolution(entry["resolution"])
+                except (TypeError, ValueError) as e:
+                    raise ValueError(f"Invalid resolution for template blob {key}: {e}")
+            verified[key] = (digest, ext, blob, features, resolution)
+        digests = {item[0] for item in verified.values()}
+        script_files, templates = {}, {}
+        for name, info in scripts.items():
+            if info is not None and not isinstance(info, dict):
+                raise ValueError(f"Invalid entry for script '{name}'")
+            script_files[name] = _read(zf, f"scripts/{name}/script.json")
+            try:
+                json.loads(script_files[name].decode('utf-8'))
+            except ValueError as e:
+                raise ValueError(f"Invalid script file for '{name}': {e}")
+            folder = os.path.join(ScriptService.SCRIPTS_DIR, name)
+            templates[name] = template_store.check_images(folder, (info or {}).get("templates", {}), digests)
+
+        stored = 0
+        # Under the store lock: a concurrent gc() must not collect blobs before their manifests exist
+        with template_store.transaction():
+            for digest, ext, blob, features, resolution in verified.values():
+                _, _, created = template_store.put_bytes(blob, ext)
+                stored += int(created)
+                if features is not None:
+                    template_cache.import_features(digest, features)
+                if resolution and not template_meta.get(digest):
+                    template_meta.set([digest], resolution)
+
+            for name in scripts:
+                folder = os.path.join(ScriptService.SCRIPTS_DIR, name)
+                os.makedirs(folder, exist_ok=True)
+                with open(os.path.join(folder, 'script.json'), 'wb') as f:
+                    f.write(script_files[name])
+                template_store.install_images(folder, templates[name])
+
+                legacy_file = os.path.join(ScriptService.SCRIPTS_DIR, f"{name}.json")
+                if os.path.exists(legacy_file):
+                    os.remove(legacy_file)
+
+    log_message(f"Imported bundle '{manifest.get('name')}': {len(scripts)} scripts, {stored} new templates.")
+    return {
+        "name": manifest.get("name"),
+        "scripts": list(scripts),
+        "templates_stored": stored,
+        "overwritten": existing,
+    }
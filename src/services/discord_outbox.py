@@ -0,0 +1,198 @@
+"""
+Outbound Discord DM queue.
+Nodes enqueue messages from the executor thread and return immediately; a
+single drain task on the Discord loop resolves the recipient once (cached),
+coalesces bursts of text messages into one DM and backs off on rate limits.
+Text longer than Discord's limit is split over several DMs, never truncated.
+"""
+import asyncio
+import io
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Optional, Tuple
+
+import shared
+from shared import log_message, log_debug
+from settings import settings_store
+from services.metrics import metrics
+
+MAX_MESSAGE_LENGTH = 2000  # Discord content limit
+MAX_PENDING = 500
+COALESCE_DELAY = 0.25      # Seconds to gather a burst before sending
+RATE_LIMIT_RETRIES = 1     # Extra attempts after a 429 before the batch is dropped
+
+
+def split_message(text: str, limit: int = MAX_MESSAGE_LENGTH):
+    """Split text into chunks of at most 'limit' characters, preferring line breaks."""
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind('\n', 0, limit + 1)
+        if cut <= 0:
+            chunks.append(text[:limit])
+            text = text[limit:]
+        else:
+            chunks.append(text[:cut])
+            text = text[cut + 1:]
+    chunks.append(text)
+    return chunks
+
+
+class RateLimited(RuntimeError):
+    """Discord kept answering 429 after the retries; the message was dropped."""
+
+
+class _Outgoing:
+    __slots__ = ('content', 'file', 'future')
+
+    def __init__(self, content: str, file: Optional[Tuple[bytes, str]]):
+        self.content = content or ""
+        self.file = file  # (bytes, filename) or None
+        self.future = Future()
+
+
+class DiscordOutbox:
+    def __init__(self, max_pending: int = MAX_PENDING, coalesce_delay: float = COALESCE_DELAY):
+        self.max_pending = max_pending
+        self.coalesce_delay = coalesce_delay
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._draining_on = None  # Loop running the drain task, None when idle
+        # (client id, user id) -> discord.User
+        self._user_key = None
+        self._user = None
+        settings_store.subscribe(['user_id'], lambda changed: self.forget_user())
+
+    # --- Producer side (any thread) ---
+
+    def send(self, content: str = "", file: Optional[Tuple[bytes, str]] = None) -> Future:
+        """
+        Queue a DM to the configured user. Returns a Future resolved when the
+        message is delivered (or failed); callers that don't care can drop it.
+        """
+        item = _Outgoing(content, file)
+        client, loop = shared.discord_client, shared.discord_loop
+        if not client or not loop or loop.is_closed():
+            item.future.set_exception(RuntimeError("Discord bot is not running"))
+            return item.future
+
+        dropped = None
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                dropped = self._pending.popleft()
+            self._pending.append(item)
+            # A restarted bot has a new loop: start a drain there even if the old one never finished
+            start = self._draining_on is not loop
+            self._draining_on = loop
+        if dropped:
+            metrics.inc("discord_messages_dropped")
+            dropped.future.set_exception(RuntimeError("Discord outbox full, message dropped"))
+        if start:
+            loop.call_soon_threadsafe(lambda: loop.create_task(self._drain(client)))
+        return item.future
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def forget_user(self):
+        self._user_key = None
+        self._user = None
+
+    # --- Consumer side (Discord loop) ---
+
+    async def _get_user(self, client):
+        uid = settings_store.get('user_id')
+        if not uid:
+            raise RuntimeError("No Discord User ID configured")
+        key = (id(client), str(uid).strip())
+        if self._user_key != key or self._user is None:
+            await client.wait_until_ready()
+            user_id = int(key[1])
+            self._user = client.get_user(user_id) or await client.fetch_user(user_id)
+            self._user_key = key
+        return self._user
+
+    def _take_batch(self):
+        """Pop the next unit to send: one file message, or a run of text messages that fit in one DM."""
+        with self._lock:
+            if not self._pending:
+                self._draining_on = None
+                return None
+            first = self._pending.popleft()
+            batch = [first]
+            if first.file is None:
+                size = len(first.content)
+                while self._pending and self._pending[0].file is None:
+                    nxt = self._pending[0]
+                    if size + 1 + len(nxt.content) > MAX_MESSAGE_LENGTH:
+                        break
+                    size += 1 + len(nxt.content)
+                    batch.append(self._pending.popleft())
+            return batch
+
+    @staticmethod
+    async def _send(user, content, file=None):
+        """One DM; discord.py already retries most 429s, so back off at most RATE_LIMIT_RETRIES more times."""
+        import discord  # Only loaded once the bot is actually sending
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            try:
+                if file is not None:
+                    data, filename = file
+                    await user.send(content=content or None, file=discord.File(io.BytesIO(data), filename=filename))
+                else:
+                    await user.send(content)
+                return
+            except discord.HTTPException as e:
+                if e.status != 429:
+                    raise
+                metrics.inc("discord_rate_limited")
+                if attempt == RATE_LIMIT_RETRIES:
+                    raise RateLimited("Discord rate limit persisted, message dropped") from e
+                retry_after = float(getattr(e, 'retry_after', 1.0) or 1.0)
+                log_debug("Discord rate limited, retrying in %.1fs", retry_after)
+                await asyncio.sleep(retry_after)
+
+    async def _deliver(self, user, batch):
+        first = batch[0]
+        if first.file is not None:
+            chunks = split_message(first.content)
+        else:
+            chunks = split_message("\n".join(item.content for item in batch))
+        # Long text goes out as several DMs; an attached file rides on the last one
+        for i, chunk in enumerate(chunks):
+            last = i == len(chunks) - 1
+            try:
+                await self._send(user, chunk, first.file if last else None)
+            except RateLimited:
+                metrics.inc("discord_messages_dropped", len(batch))
+                raise
+
+    async def _drain(self, client):
+        import discord  # Already loaded by the running client; imported here to keep this module light
+        # Let a burst of sends accumulate so it goes out as one message
+        if self.coalesce_delay:
+            await asyncio.sleep(self.coalesce_delay)
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            try:
+                user = await self._get_user(client)
+                await self._deliver(user, batch)
+                metrics.inc("discord_messages", len(batch))
+                if len(batch) > 1:
+                    metrics.inc("discord_messages_coalesced", len(batch) - 1)
+                for item in batch:
+                    item.future.set_result(True)
+            except Exception as e:
+                if isinstance(e, discord.NotFound):
+                    self.forget_user()
+                metrics.inc("discord_send_errors")
+                log_message(f"Failed to send Discord DM: {e}")
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+
+
+# Global outbox
+discord_outbox = DiscordOutbox()
@@ -0,0 +1,151 @@
+"""
+Per-frame derived image cache.
+A Frame wraps one captured BGR screenshot and computes derived
+representations on first use (grayscale, HSV, scaled copies for multi-scale
+matching, SIFT keypoints/descriptors, perceptual hashes, ROI crops). Every matcher evaluating the
+same frame shares them, so checking N templates against one screenshot
+extracts screen features once instead of N times.
+"""
+import hashlib
+import threading
+import time
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+_local = threading.local()
+
+# Frame differencing runs on grayscale area-downsampled by this factor
+FINGERPRINT_FACTOR = 4
+
+
+# Perceptual hash: DCT of a PHASH_SIZE square thumbnail, low PHASH_BITS x PHASH_BITS coefficients
+PHASH_SIZE = 32
+PHASH_BITS = 8
+
+
+def perceptual_hash(gray, ignore=()) -> int:
+    """
+    64-bit DCT perceptual hash of a grayscale image. 'ignore' regions (x, y, w, h)
+    are filled with the mean of the rest first, so dynamic areas (counters,
+    timers, chat) do not change the hash.
+    """
+    if ignore:
+        gray = gray.copy()
+        keep = np.ones(gray.shape[:2], dtype=bool)
+        for x, y, w, h in ignore:
+            keep[max(0, y):max(0, y + h), max(0, x):max(0, x + w)] = False
+        gray[~keep] = int(gray[keep].mean()) if keep.any() else 0
+    small = cv2.resize(gray, (PHASH_SIZE, PHASH_SIZE), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:PHASH_BITS, :PHASH_BITS].flatten()
+    # Compare against the median of the AC terms (the DC term only carries brightness)
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def sift_detector():
+    """One SIFT detector per thread (detectors are not safe to share across threads)."""
+    detector = getattr(_local, 'sift', None)
+    if detector is None:
+        detector = _local.sift = cv2.SIFT_create()
+    return detector
+
+
+class Frame:
+    def __init__(self, bgr, seq: int = 0, captured_at: float = None, origin: Tuple[int, int] = (0, 0)):
+        self.bgr = bgr
+        self.seq = seq
+        self.captured_at = captured_at if captured_at is not None else time.monotonic()
+        # Offset of this frame inside the full screen (ROI frames), for mapping coordinates back
+        self.origin = origin
+        self._lock = threading.RLock()
+        self._derived = {}
+
+    @property
+    def shape(self):
+        return self.bgr.shape
+
+    @property
+    def width(self) -> int:
+        return self.bgr.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.bgr.shape[0]
+
+    def age(self) -> float:
+        return time.monotonic() - self.captured_at
+
+    def _memo(self, key, compute):
+        value = self._derived.get(key)
+        if value is None:
+            with self._lock:
+                value = self._derived.get(key)
+                if value is None:
+                    value = self._derived[key] = compute()
+        return value
+
+    @property
+    def gray(self):
+        return self._memo('gray', lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY))
+
+    @property
+    def hsv(self):
+        return self._memo('hsv', lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2HSV))
+
+    @property
+    def small_gray(self):
+        """Grayscale area-downsampled by FINGERPRINT_FACTOR (fingerprints, frame differencing)."""
+        def compute():
+            size = (max(1, self.width // FINGERPRINT_FACTOR), max(1, self.height // FINGERPRINT_FACTOR))
+            return cv2.resize(self.gray, size, interpolation=cv2.INTER_AREA)
+        return self._memo('small_gray', compute)
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Content hash of the full-resolution pixels: equal screens give equal fingerprints.
+        Captures are lossless PNG, so an unchanged screen hashes identically; any pixel
+        change (a toggled checkbox, one digit) gives a new fingerprint, which match
+        results memoized per fingerprint rely on.
+        """
+        return self._memo('fingerprint', lambda: hashlib.blake2b(
+            memoryview(np.ascontiguousarray(self.bgr)), digest_size=16).hexdigest())
+
+    def phash(self, ignore=()) -> int:
+        """Perceptual hash of the frame with optional ignored regions (see perceptual_hash)."""
+        ignore = tuple(tuple(int(v) for v in r) for r in ignore)
+        return self._memo(('phash', ignore), lambda: perceptual_hash(self.gray, ignore))
+
+    def scaled_gray(self, scale: float):
+        """Grayscale resized by 'scale' (multi-scale template matching levels)."""
+        scale = round(float(scale), 4)
+        if scale == 1.0:
+            return self.gray
+        return self._memo(('scaled', scale), lambda: cv2.resize(self.gray, None, fx=scale, fy=scale))
+
+    def features(self):
+        """SIFT (keypoints, descriptors) of the whole frame; descriptors may be None."""
+        return self._memo('sift', lambda: sift_detector().detectAndCompute(self.gray, None))
+
+    def roi(self, x: int, y: int, w: int, h: int) -> 'Frame':
+        """Sub-frame for a screen region (clipped), with its own derived cache."""
+        x0, y0 = max(0, int(x)), max(0, int(y))
+        x1, y1 = min(self.width, int(x) + int(w)), min(self.height, int(y) + int(h))
+        key = ('roi', x0, y0, x1, y1)
+        return self._memo(key, lambda: Frame(self.bgr[y0:y1, x0:x1], self.seq, self.captured_at,
+                                             (self.origin[0] + x0, self.origin[1] + y0)))
+
+    def diff(self, other: 'Frame') -> float:
+        """Mean absolute difference to another frame of the same size, in percent (0-100)."""
+        a, b = self.small_gray, other.small_gray
+        if a.shape != b.shape:
+            return 100.0
+        return float(cv2.absdiff(a, b).mean()) / 2.55
+
+    def to_screen(self, point: Optional[Tuple[int, int]]) -> Optional[Tuple[int, int]]:
+        """Map a point in this frame's coordinates to full-screen coordinates."""
+        if point is None:
+            return None
+        return (point[0] + self.origin[0], point[1] + self.origin[1])
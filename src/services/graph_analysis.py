@@ -0,0 +1,306 @@
+"""
+Static analysis of normalized script graphs.
+Builds the control-flow graph once and reports problems that otherwise only
+show up at runtime: dangling pointers, unreachable nodes, unconnected
+branches, unknown node types, loop_break outside loops, missing sub-scripts
+and loops that spin forever without anything that waits.
+Results for saved scripts are cached next to script.json (analysis.json).
+"""
+import json
+import os
+from typing import Dict, Any, List, Optional, Set
+
+from services.script_service import ScriptService, BRANCH_NODE_TYPES, router_screens
+
+ANALYSIS_NAME = 'analysis.json'
+ANALYSIS_VERSION = 4
+
+BRANCH_TYPES = BRANCH_NODE_TYPES
+ENTRY_TYPES = ('start', 'discord_slash')
+# Nodes that take real time (sleep, capture, remote wait) and so pace a loop
+PACING_TYPES = ('wait', 'discord_wait', 'find_image', 'find_multi_images', 'check_pixel', 'script',
+                'find_all', 'wait_change', 'wait_stable', 'screen_router')
+
+ERROR, WARNING, INFO = 'error', 'warning', 'info'
+
+
+# Output pointers per node type (others use 'next')
+_POINTERS = {
+    'loop': ('next_body', 'next_exit'),
+    'loop_break': (),
+    **{t: ('next_found', 'next_not_found') for t in BRANCH_TYPES},
+}
+
+
+def _pointers(node: Dict[str, Any]) -> tuple:
+    node_type = node.get('type', '').replace('bot/', '')
+    if node_type == 'screen_router':
+        screens = router_screens(node.get('properties', {}))
+        return ('next_unknown',) + tuple(f'next_screen_{i}' for i in range(len(screens)))
+    return _POINTERS.get(node_type, ('next',))
+
+
+def _key(node_id) -> str:
+    return str(node_id)
+
+
+def _successors(node: Dict[str, Any]) -> Dict[str, Any]:
+    """{pointer name: target id} for every non-empty next* pointer."""
+    return {k: v for k, v in node.items() if k.startswith('next') and v is not None}
+
+
+class GraphAnalysis:
+    def __init__(self, nodes: List[Dict[str, Any]], known_types: Optional[Set[str]] = None):
+        self.nodes = {_key(n['id']): n for n in nodes if 'id' in n}
+        self.known_types = known_types
+        self.issues: List[Dict[str, Any]] = []
+        self.edges: Dict[str, List[str]] = {}
+        self.loop_bodies: Dict[str, Set[str]] = {}
+
+    def _issue(self, severity: str, code: str, node_id, message: str):
+        self.issues.append({"severity": severity, "code": code,
+                            "node": None if node_id is None else _key(node_id), "message": message})
+
+    @staticmethod
+    def _type(node: Dict[str, Any]) -> str:
+        return node.get('type', '').replace('bot/', '')
+
+    # --- Control-flow graph ---
+
+    def _build_edges(self):
+        for nid, node in self.nodes.items():
+            targets = []
+            for pointer, target in _successors(node).items():
+                if _key(target) in self.nodes:
+                    targets.append(_key(target))
+                else:
+                    self._issue(ERROR, 'dangling_pointer', nid,
+                                f"{self._type(node)} #{nid}: '{pointer}' points to missing node {target}")
+            self.edges[nid] = targets
+
+    def _region(self, start: str, stop: str) -> Set[str]:
+        """Nodes reachable from start without passing through stop."""
+        seen, stack = set(), [start]
+        while stack:
+            nid = stack.pop()
+            if nid in seen or nid == stop or nid not in self.nodes:
+                continue
+            seen.add(nid)
+            stack.extend(self.edges.get(nid, ()))
+        return seen
+
+    def _build_loops(self):
+        for nid, node in self.nodes.items():
+            if self._type(node) != 'loop':
+                continue
+            body = node.get('next_body')
+            self.loop_bodies[nid] = self._region(_key(body), nid) if body is not None else set()
+
+        # An unconnected output inside a body returns to the innermost loop at runtime (executor auto-return)
+        for member in set().union(*self.loop_bodies.values()) if self.loop_bodies else ():
+            node = self.nodes[member]
+            if all(node.get(p) is not None for p in _pointers(node)):
+                continue
+            innermost = min((lid for lid, body in self.loop_bodies.items() if member in body),
+                            key=lambda lid: len(self.loop_bodies[lid]))
+            self.edges[member].append(innermost)
+
+    def _reachable(self, entries: List[str]) -> Set[str]:
+        seen, stack = set(), list(entries)
+        while stack:
+            nid = stack.pop()
+            if nid in seen:
+                continue
+            seen.add(nid)
+            stack.extend(self.edges.get(nid, ()))
+        return seen
+
+    def _cycles(self) -> List[List[str]]:
+        """Strongly connected components that contain a cycle (iterative Tarjan)."""
+        index, low, on_stack, stack, result = {}, {}, set(), [], []
+        counter = 0
+        for root in self.nodes:
+            if root in index:
+                continue
+            work = [(root, iter(self.edges.get(root, ())))]
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                nid, it = work[-1]
+                advanced = False
+                for succ in it:
+                    if succ not in index:
+                        index[succ] = low[succ] = counter
+                        counter += 1
+                        stack.append(succ)
+                        on_stack.add(succ)
+                        work.append((succ, iter(self.edges.get(succ, ()))))
+                        advanced = True
+                        break
+                    if succ in on_stack:
+                        low[nid] = min(low[nid], index[succ])
+                if advanced:
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[nid])
+                if low[nid] == index[nid]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == nid:
+                            break
+                    if len(component) > 1 or nid in self.edges.get(nid, ()):
+                        result.append(component)
+        return result
+
+    # --- Checks ---
+
+    def run(self) -> Dict[str, Any]:
+        self._build_edges()
+        self._build_loops()
+
+        entries = [nid for nid, n in self.nodes.items() if self._type(n) in ENTRY_TYPES]
+        if not entries:
+            self._issue(ERROR, 'no_entry', None, "No Start or Slash Command node: nothing will run")
+        reachable = self._reachable(entries)
+        in_loop = set().union(*self.loop_bodies.values()) if self.loop_bodies else set()
+
+        for nid, node in self.nodes.items():
+            node_type = self._type(node)
+            label = f"{node_type} #{nid}"
+
+            if nid not in reachable and entries:
+                self._issue(WARNING, 'unreachable', nid, f"{label} is never reached from a Start/Slash node")
+
+            if self.known_types is not None and node_type not in self.known_types:
+                self._issue(ERROR, 'unknown_type', nid, f"{label}: unknown node type '{node_type}'")
+
+            if node_type in BRANCH_TYPES:
+                for pointer, outcome in (('next_found', 'found'), ('next_not_found', 'not found')):
+                    if node.get(pointer) is None:
+                        if nid in in_loop:
+                            self._issue(INFO, 'missing_branch', nid,
+                                        f"{label}: '{outcome}' output unconnected (returns to the loop)")
+                        else:
+                            self._issue(WARNING, 'missing_branch', nid,
+                                        f"{label}: '{outcome}' output unconnected (the run stops there)")
+
+            if node_type == 'loop_break' and nid not in in_loop:
+                self._issue(WARNING, 'break_outside_loop', nid, f"{label} is not inside any loop body")
+
+            if node_type == 'loop' and node.get('next_body') is None:
+                self._issue(WARNING, 'empty_loop', nid, f"{label} has no body connected")
+
+            if node_type == 'script':
+                name = (node.get('properties', {}).get('scriptName') or '').strip()
+                if not name:
+                    self._issue(ERROR, 'missing_script', nid, f"{label}: no script selected")
+                elif not ScriptService.locate(name)[0]:
+                    self._issue(ERROR, 'missing_script', nid, f"{label}: script '{name}' not found")
+
+        self._check_busy_loops()
+
+        counts = {ERROR: 0, WARNING: 0, INFO: 0}
+        for issue in self.issues:
+            counts[issue["severity"]] += 1
+        return {
+            "version": ANALYSIS_VERSION,
+            "ok": counts[ERROR] == 0,
+            "counts": counts,
+            "nodes": len(self.nodes),
+            "reachable": len(reachable),
+            "loops": len(self.loop_bodies),
+            "issues": self.issues,
+        }
+
+    def _paced(self, members) -> bool:
+        return any(self._type(self.nodes[m]) in PACING_TYPES for m in members)
+
+    def _check_busy_loops(self):
+        reported = set()
+        # Infinite Loop nodes (count 0) whose body neither waits nor breaks
+        for nid, body in self.loop_bodies.items():
+            node = self.nodes[nid]
+            try:
+                infinite = int(node.get('properties', {}).get('count', 3)) == 0
+            except (TypeError, ValueError):
+                infinite = False
+            has_break = any(self._type(self.nodes[m]) == 'loop_break' for m in body)
+            if infinite and body and not has_break and not self._paced(body):
+                self._issue(WARNING, 'busy_loop', nid,
+                            f"loop #{nid} is infinite and its body never waits (spins at full speed)")
+                reported.add(nid)
+
+        # Other cycles (e.g. a chain wired back to an earlier node) with no exit and no pacing
+        for component in self._cycles():
+            members = set(component)
+            if members & reported or self._paced(members):
+                continue
+            if any(self._type(self.nodes[m]) in ('loop', 'loop_break') for m in members):
+                continue  # Counted loops terminate; breaks exit
+            exits = any(t not in members for m in members for t in self.edges.get(m, ()))
+            if not exits:
+                first = sorted(members)[0]
+                self._issue(WARNING, 'busy_cycle', first,
+                            f"nodes {', '.join(sorted(members))} form a cycle with no exit and no wait")
+
+
+def analyze(nodes: List[Dict[str, Any]], known_types: Optional[Set[str]] = None) -> Dict[str, Any]:
+    """Analyze a normalized node list (see ScriptService.normalize)."""
+    if known_types is None:
+        from executor import NodeRegistry
+        # Slash nodes are entry points handled by discord_manager, not by a NodeHandler
+        known_types = set(NodeRegistry.known_types()) | set(ENTRY_TYPES)
+    return GraphAnalysis(nodes, known_types).run()
+
+
+def analyze_script(script_name: str, use_cache: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Analyze a saved script, reusing scripts/<name>/analysis.json while script.json
+    is unchanged. Returns None if the script does not exist.
+    """
+    script_file, script_folder = ScriptService.locate(script_name)
+    if not script_file:
+        return None
+    st = os.stat(script_file)
+    stamp = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "version": ANALYSIS_VERSION}
+    cache_file = os.path.join(script_folder, ANALYSIS_NAME) if script_folder else None
+
+    if use_cache and cache_file and os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get("source") == stamp:
+                return cached["result"]
+        except Exception:
+            pass  # Recompute below
+
+    raw = ScriptService.load_raw(script_file)
+    result = analyze(ScriptService.normalize(raw) if raw is not None else [])
+    result["script"] = script_name
+
+    if cache_file:
+        tmp = cache_file + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"source": stamp, "result": result}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, cache_file)
+    return result
+
+
+def log_issues(result: Dict[str, Any], logger, limit: int = 20):
+    """Log errors and warnings of an analysis (info items are skipped)."""
+    shown = 0
+    for issue in result.get("issues", []):
+        if issue["severity"] == INFO:
+            continue
+        if shown >= limit:
+            logger(f"Graph check: ... {result['counts'][ERROR] + result['counts'][WARNING] - shown} more")
+            break
+        logger(f"Graph check [{issue['severity']}]: {issue['message']}")
+        shown += 1
@@ -0,0 +1,132 @@
+"""
+Cached index of the images/ template library and a server-side thumbnail cache.
+The index is rebuilt only when a directory mtime changes (an entry was added,
+removed or renamed), so listing thousands of templates does not rescan the tree.
+"""
+import hashlib
+import os
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+THUMB_DIR = os.path.join('.cache', 'thumbs')
+THUMB_SIZES = (32, 64, 128, 256)
+
+
+class ImageLibrary:
+    def __init__(self, root: str = 'images', thumb_dir: str = THUMB_DIR):
+        self.root = root
+        self.thumb_dir = thumb_dir
+        self._lock = threading.Lock()
+        self._dir_mtimes: Dict[str, int] = {}  # {directory: st_mtime_ns}
+        self._tree: List[Dict[str, Any]] = []
+        self._files: List[Dict[str, Any]] = []
+        self.version = 0
+
+    # --- Index ---
+
+    def _is_stale(self) -> bool:
+        if not self._dir_mtimes:
+            return True
+        for directory, mtime in self._dir_mtimes.items():
+            try:
+                if os.stat(directory).st_mtime_ns != mtime:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def _scan(self, directory: str, relative: str, files: List[Dict[str, Any]], mtimes: Dict[str, int]):
+        mtimes[directory] = os.stat(directory).st_mtime_ns
+        items = []
+        with os.scandir(directory) as it:
+            entries = sorted(it, key=lambda e: e.name)
+        for entry in entries:
+            rel_path = f"{relative}/{entry.name}" if relative else entry.name
+            if entry.is_dir():
+                children = self._scan(entry.path, rel_path, files, mtimes)
+                if children:
+                    items.append({"name": entry.name, "type": "folder", "children": children})
+            elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                item = {"name": entry.name, "type": "file", "path": "images/" + rel_path}
+                items.append(item)
+                files.append({**item, "folder": relative})
+        return items
+
+    def refresh(self, force: bool = False) -> bool:
+        """Rebuild the index if any directory changed. Returns True if rebuilt."""
+        with self._lock:
+            if not force and not self._is_stale():
+                return False
+            os.makedirs(self.root, exist_ok=True)
+            files: List[Dict[str, Any]] = []
+            mtimes: Dict[str, int] = {}
+            self._tree = self._scan(self.root, "", files, mtimes)
+            self._files = files
+            self._dir_mtimes = mtimes
+            self.version += 1
+            return True
+
+    def tree(self) -> List[Dict[str, Any]]:
+        self.refresh()
+        return self._tree
+
+    def search(self, query: str = "", folder: str = None, offset: int = 0, limit: int = 100) -> Tuple[List[Dict[str, Any]], int]:
+        """Flat, paginated listing filtered by case-insensitive name/path substring."""
+        self.refresh()
+        files = self._files
+        if folder:
+            folder = folder.strip('/')
+            files = [f for f in files if f["folder"] == folder or f["folder"].startswith(folder + "/")]
+        if query:
+            q = query.lower()
+            files = [f for f in files if q in f["path"].lower()]
+        return files[offset:offset + limit], len(files)
+
+    # --- Thumbnails ---
+
+    def resolve(self, path: str) -> Optional[str]:
+        """Map 'images/a/b.png' or 'a/b.png' to a file inside the library root (no traversal)."""
+        if path.startswith('images/'):
+            path = path[7:]
+        root = os.path.abspath(self.root)
+        full = os.path.abspath(os.path.join(root, path))
+        if not full.startswith(root + os.sep) or not os.path.isfile(full):
+            return None
+        return full
+
+    def thumbnail(self, path: str, size: int = 128) -> Optional[str]:
+        """
+        Return the cached thumbnail file for an image, creating it if missing.
+        The cache key includes the source mtime, so edited templates get new thumbnails.
+        """
+        import cv2
+
+        source = self.resolve(path)
+        if source is None:
+            return None
+        size = min(THUMB_SIZES, key=lambda s: abs(s - size))
+
+        st = os.stat(source)
+        key = hashlib.sha1(f"{source}|{st.st_mtime_ns}|{st.st_size}|{size}".encode('utf-8')).hexdigest()
+        thumb_path = os.path.join(self.thumb_dir, key[:2], key + '.png')
+        if os.path.exists(thumb_path):
+            return thumb_path
+
+        img = cv2.imread(source, cv2.IMREAD_UNCHANGED)
+        if img is None:
+            return None
+        h, w = img.shape[:2]
+        factor = size / max(h, w)
+        if factor < 1:
+            img = cv2.resize(img, (max(1, int(w * factor)), max(1, int(h * factor))), interpolation=cv2.INTER_AREA)
+
+        os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+        tmp_path = thumb_path + '.tmp.png'
+        cv2.imwrite(tmp_path, img)
+        os.replace(tmp_path, thumb_path)
+        return thumb_path
+
+
+# Global library for the images/ folder
+image_library = ImageLibrary()
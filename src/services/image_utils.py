@@ -2,14 +2,14 @@
 Image utility functions for script folder management.
 """
 import os
-import shutil
 from typing import List, Set
 from shared import log_message
+from services.template_store import template_store
 
 
 def extract_image_paths_from_script(script_data: dict) -> Set[str]:
     """
-    Parse all find_image / find_multi_images nodes and extract template paths.
+    Parse all find_image / find_all / find_multi_images nodes and extract template paths.
     
     Args:
         script_data: Raw LiteGraph JSON data with 'nodes' list
@@ -24,7 +24,7 @@ def extract_image_paths_from_script(script_data: dict) -> Set[str]:
         node_type = node.get('type', '').replace('bot/', '')
         properties = node.get('properties', {})
         
-        if node_type == 'find_image':
+        if node_type in ('find_image', 'find_all'):
             template = properties.get('template', '')
             if template:
                 images.add(template)
@@ -38,53 +38,6 @@ def extract_image_paths_from_script(script_data: dict) -> Set[str]:
     return images
 
 
-def copy_images_to_script_folder(image_paths: Set[str], script_folder: str) -> int:
-    """
-    Copy images from global images/ folder to script's local images/ folder.
-    
-    Args:
-        image_paths: Set of image paths (e.g., 'buttons/ok.png' or 'enemy.png')
-        script_folder: Absolute path to script folder (e.g., 'scripts/MY_SCRIPT/')
-        
-    Returns:
-        Number of images successfully copied
-    """
-    global_images_dir = 'images'
-    local_images_dir = os.path.join(script_folder, 'images')
-    
-    # Ensure local images directory exists
-    os.makedirs(local_images_dir, exist_ok=True)
-    
-    copied = 0
-    for img_path in image_paths:
-        # img_path might be 'images/subfolder/file.png' or just 'file.png'
-        # Normalize: remove leading 'images/' if present
-        if img_path.startswith('images/'):
-            relative_path = img_path[7:]  # Remove 'images/'
-        else:
-            relative_path = img_path
-        
-        src = os.path.join(global_images_dir, relative_path)
-        dst = os.path.join(local_images_dir, relative_path)
-        
-        if os.path.exists(src):
-            # Ensure destination subdirectory exists
-            dst_dir = os.path.dirname(dst)
-            if dst_dir:
-                os.makedirs(dst_dir, exist_ok=True)
-            
-            try:
-                shutil.copy2(src, dst)
-                log_message(f"Copied image: {relative_path}")
-                copied += 1
-            except Exception as e:
-                log_message(f"Failed to copy {relative_path}: {e}")
-        else:
-            log_message(f"Image not found in global folder: {src}")
-    
-    return copied
-
-
 def resolve_template_path(template: str, script_path: str = None) -> str:
     """
     Resolve template path, prioritizing script-local images.
@@ -102,16 +55,38 @@ def resolve_template_path(template: str, script_path: str = None) -> str:
     else:
         relative_path = template
     
-    # Priority 1: Script-local images folder
+    # Priority 1: Script manifest (content-addressed blob snapshot)
+    # Priority 2: Script-local images folder
     if script_path:
+        blob_path = template_store.resolve(script_path, relative_path)
+        if blob_path:
+            return blob_path
         local_path = os.path.join(script_path, 'images', relative_path)
         if os.path.exists(local_path):
             return local_path
     
-    # Priority 2: Global images folder
+    # Priority 3: Global images folder
     global_path = os.path.join('images', relative_path)
     if os.path.exists(global_path):
         return global_path
     
     # Fallback: Return original (will fail gracefully in find_and_click)
     return template
+
+
+def parse_region(value):
+    """
+    Parse a screen region property: "x,y,w,h" string or 4-item list -> (x, y, w, h).
+    Empty values and non-positive sizes give None (whole screen).
+
+    Raises:
+        ValueError: malformed value
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = [v for v in value.replace(' ', '').split(',') if v]
+    if len(value) != 4:
+        raise ValueError(f"Region needs 4 values (x,y,w,h), got {len(value)}")
+    x, y, w, h = (int(float(v)) for v in value)
+    return (x, y, w, h) if w > 0 and h > 0 else None
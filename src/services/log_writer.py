@@ -0,0 +1,193 @@
+"""
+Asynchronous, batched log writer.
+Callers enqueue records; a background thread writes them to stdout and to a
+persistently open log file, rotating it by size and gzip-compressing backups.
+"""
+import gzip
+import os
+import queue
+import shutil
+import sys
+import threading
+from typing import Dict, Any
+
+from services.metrics import metrics
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024   # Rotate server.log at 5 MB
+DEFAULT_BACKUP_COUNT = 5              # Keep server.log.1.gz ... server.log.5.gz
+DEFAULT_QUEUE_SIZE = 10000
+BATCH_SIZE = 500
+
+_STOP = object()  # Queue sentinel: write what is pending, close the file and exit
+
+
+class AsyncLogWriter:
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES, backup_count: int = DEFAULT_BACKUP_COUNT,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, echo: bool = True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.echo = echo
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._file = None
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.errors = 0
+
+    def write(self, timestamp: str, message: str, level: str = "info") -> bool:
+        """Enqueue a record without blocking. Returns False if the queue is full and the record was dropped."""
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait((timestamp, level, message))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            metrics.inc("log_records_dropped")
+            return False
+
+    def flush(self, timeout: float = 2.0) -> bool:
+        """Block until everything enqueued so far has been written."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 2.0):
+        """Write everything pending, stop the writer thread and close the log file."""
+        with self._start_lock:
+            thread = self._thread
+            if thread is None:
+                return
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                return
+            thread.join(timeout)
+            if not thread.is_alive():
+                self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "capacity": self._queue.maxsize,
+            "written": self.written,
+            "dropped": self.dropped,
+            "rotations": self.rotations,
+            "errors": self.errors,
+        }
+
+    # --- Writer thread ---
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+
+    def _open(self):
+        try:
+            self._file = open(self.path, "a", encoding="utf-8")
+        except Exception as e:
+            self._file = None
+            self._failed(f"Log file could not be opened: {e}")
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+
+    def _failed(self, message: str):
+        """Count a file write failure; the first one is reported on the real stdout."""
+        self.errors += 1
+        metrics.inc("log_write_errors")
+        if self.errors == 1:
+            try:
+                sys.__stdout__.write(f"{message}\n")
+            except Exception:
+                pass
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            markers = []
+            stop = False
+            for item in batch:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    markers.append(item)
+                else:
+                    lines.append(item)
+
+            if lines:
+                self._write_batch(lines)
+            for marker in markers:
+                marker.set()
+            if stop:
+                self._close_file()
+                return
+
+    def _write_batch(self, records):
+        if self.echo:
+            try:
+                sys.__stdout__.write("".join(
+                    f"{msg}\n" if level == "info" else f"[{level.upper()}] {msg}\n" for _, level, msg in records
+                ))
+                sys.__stdout__.flush()
+            except Exception:
+                pass
+
+        if self._file is None:
+            self._open()
+            if self._file is None:
+                return
+        try:
+            self._file.write("".join(f"[{ts}] {level.upper():<5} {msg}\n" for ts, level, msg in records))
+            self._file.flush()
+            self.written += len(records)
+            if self.max_bytes and self._file.tell() >= self.max_bytes:
+                self._rotate()
+        except Exception as e:
+            self._failed(f"Log write failed: {e}")
+            # Reopen on the next batch (e.g. the file was deleted or the disk recovered)
+            self._close_file()
+
+    def _rotate(self):
+        """server.log -> server.log.1.gz, shifting older backups up and dropping the oldest."""
+        self._file.close()
+        self._file = None
+        try:
+            for i in range(self.backup_count - 1, 0, -1):
+                src = f"{self.path}.{i}.gz"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{i + 1}.gz")
+            if self.backup_count > 0:
+                with open(self.path, "rb") as src, gzip.open(f"{self.path}.1.gz", "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+            os.remove(self.path)
+            self.rotations += 1
+            metrics.inc("log_rotations")
+        except Exception as e:
+            try:
+                sys.__stdout__.write(f"Log rotation failed: {e}\n")
+            except Exception:
+                pass
+        self._open()
@@ -0,0 +1,57 @@
+"""
+Memo of template match results per screen fingerprint.
+While a script polls a static screen, every retry would otherwise rerun SIFT
+and multi-scale matching on identical pixels. Results (found or not) are kept
+in a bounded LRU keyed by (frame fingerprint, template content, algorithm,
+threshold, ROI), so repeated checks of an unchanged screen are a dict lookup.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Tuple
+
+from services.metrics import metrics
+
+MAX_ENTRIES = 4096
+_MISSING = object()
+
+
+class MatchMemo:
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return (hit, result)."""
+        if not self.enabled:
+            return False, None
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is not _MISSING:
+                self._entries.move_to_end(key)
+        if value is _MISSING:
+            metrics.inc("match_memo", result="miss")
+            return False, None
+        metrics.inc("match_memo", result="hit")
+        return True, value
+
+    def put(self, key: Hashable, result: Any):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Global memo shared by all bots (keys include the screen content, not the device)
+match_memo = MatchMemo()
@@ -0,0 +1,203 @@
+"""
+Execution metrics: per-node latency histograms and device/vision counters.
+Rendered as Prometheus text exposition format or as JSON for the UI.
+"""
+import bisect
+import threading
+import time
+from typing import Dict, Tuple, Optional, Any
+
+# Histogram bucket upper bounds (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_PREFIX = "bluestacks"
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (not thread-safe, guarded by Metrics._lock)."""
+    __slots__ = ('buckets', 'count', 'sum', 'min', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile from bucket counts (upper bound of the matching bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+        }
+
+
+def _labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels.items():
+        v = str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class Metrics:
+    """
+    Process-wide metrics registry.
+    The executor records node latencies and branch outcomes; BlueStacksBot records
+    captures, match attempts and ADB commands.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            # {node_type: Histogram}
+            self.node_type_latency: Dict[str, Histogram] = {}
+            # {(script, node_id, node_type): Histogram}
+            self.node_id_latency: Dict[Tuple[str, str, str], Histogram] = {}
+            # {(script, node_id, node_type, outcome): count}
+            self.branches: Dict[Tuple[str, str, str, str], int] = {}
+            # {(name, ((label, value), ...)): count}
+            self.counters: Dict[Tuple[str, Tuple], int] = {}
+
+    def observe_node(self, script: str, node_type: str, node_id: str, seconds: float, error: bool = False):
+        with self._lock:
+            hist = self.node_type_latency.get(node_type)
+            if hist is None:
+                hist = self.node_type_latency[node_type] = Histogram()
+            hist.observe(seconds)
+
+            key = (script, node_id, node_type)
+            hist = self.node_id_latency.get(key)
+            if hist is None:
+                hist = self.node_id_latency[key] = Histogram()
+            hist.observe(seconds)
+
+            if error:
+                ckey = ("node_errors", (("type", node_type),))
+                self.counters[ckey] = self.counters.get(ckey, 0) + 1
+
+    def record_branch(self, script: str, node_type: str, node_id: str, success: bool):
+        key = (script, node_id, node_type, "success" if success else "failure")
+        with self._lock:
+            self.branches[key] = self.branches.get(key, 0) + 1
+
+    def inc(self, name: str, amount: int = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def get_counter(self, name: str, **labels) -> int:
+        with self._lock:
+            return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-friendly view, sorted so the slowest node types come first."""
+        with self._lock:
+            node_types = sorted(
+                ({"type": t, **h.to_dict()} for t, h in self.node_type_latency.items()),
+                key=lambda d: d["sum"], reverse=True
+            )
+            nodes = sorted(
+                ({"script": s, "node_id": nid, "type": t, **h.to_dict()}
+                 for (s, nid, t), h in self.node_id_latency.items()),
+                key=lambda d: d["sum"], reverse=True
+            )
+            branches: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+            for (s, nid, t, outcome), n in self.branches.items():
+                entry = branches.setdefault((s, nid, t), {"script": s, "node_id": nid, "type": t, "success": 0, "failure": 0})
+                entry[outcome] = n
+            counters = [
+                {"name": name, "labels": dict(labels), "value": n}
+                for (name, labels), n in sorted(self.counters.items())
+            ]
+            return {
+                "uptime": round(time.time() - self.started_at, 3),
+                "node_types": node_types,
+                "nodes": nodes,
+                "branches": list(branches.values()),
+                "counters": counters,
+            }
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+
+        def histogram(name, help_text, series):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, hist in series:
+                cumulative = 0
+                for i, bound in enumerate(LATENCY_BUCKETS):
+                    cumulative += hist.buckets[i]
+                    lines.append(f"{name}_bucket{_labels({**labels, 'le': bound})} {cumulative}")
+                lines.append(f"{name}_bucket{_labels({**labels, 'le': '+Inf'})} {hist.count}")
+                lines.append(f"{name}_sum{_labels(labels)} {hist.sum:.6f}")
+                lines.append(f"{name}_count{_labels(labels)} {hist.count}")
+
+        with self._lock:
+            histogram(
+                f"{METRIC_PREFIX}_node_duration_seconds",
+                "Node execution latency by node type.",
+                [({"type": t}, h) for t, h in sorted(self.node_type_latency.items())]
+            )
+            histogram(
+                f"{METRIC_PREFIX}_node_instance_duration_seconds",
+                "Node execution latency by script and node id.",
+                [({"script": s, "node_id": nid, "type": t}, h)
+                 for (s, nid, t), h in sorted(self.node_id_latency.items())]
+            )
+
+            name = f"{METRIC_PREFIX}_branch_total"
+            lines.append(f"# HELP {name} Branching node outcomes.")
+            lines.append(f"# TYPE {name} counter")
+            for (s, nid, t, outcome), n in sorted(self.branches.items()):
+                lines.append(f"{name}{_labels({'script': s, 'node_id': nid, 'type': t, 'outcome': outcome})} {n}")
+
+            declared = set()
+            for (cname, labels), n in sorted(self.counters.items()):
+                full = f"{METRIC_PREFIX}_{cname}_total"
+                if full not in declared:
+                    lines.append(f"# TYPE {full} counter")
+                    declared.add(full)
+                lines.append(f"{full}{_labels(dict(labels))} {n}")
+
+            name = f"{METRIC_PREFIX}_uptime_seconds"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {time.time() - self.started_at:.3f}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Global registry
+metrics = Metrics()
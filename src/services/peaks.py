@@ -0,0 +1,65 @@
+"""
+Peak extraction for template matching score maps.
+A single matchTemplate result holds every occurrence of a template; instead of
+re-searching after each hit, local maxima above the threshold are taken in one
+vectorized pass and overlapping detections are dropped with non-maximum
+suppression.
+"""
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+# Candidates kept before NMS (the highest scoring local maxima)
+MAX_CANDIDATES = 2000
+
+
+def non_max_suppression(xs, ys, scores, box_w: int, box_h: int, overlap: float = 0.3,
+                        max_results: int = 50) -> List[int]:
+    """
+    Greedy NMS for same-size boxes at (xs, ys). Keeps the best scoring box and drops
+    every remaining box whose IoU with it exceeds 'overlap', one vectorized step per kept box.
+
+    Returns:
+        Indices of kept boxes, best first
+    """
+    xs = np.asarray(xs, dtype=np.float32)
+    ys = np.asarray(ys, dtype=np.float32)
+    area = float(box_w * box_h)
+    order = np.argsort(-np.asarray(scores), kind='stable')
+    keep = []
+    while order.size and len(keep) < max_results:
+        best, rest = order[0], order[1:]
+        keep.append(int(best))
+        iw = np.clip(box_w - np.abs(xs[rest] - xs[best]), 0, None)
+        ih = np.clip(box_h - np.abs(ys[rest] - ys[best]), 0, None)
+        inter = iw * ih
+        iou = inter / (2 * area - inter)
+        order = rest[iou <= overlap]
+    return keep
+
+
+def find_peaks(scores, threshold: float, box_w: int, box_h: int, overlap: float = 0.3,
+               max_results: int = 50) -> List[Tuple[int, int, float]]:
+    """
+    All template positions in a TM_CCOEFF_NORMED score map above 'threshold'.
+
+    Args:
+        scores: float32 result of cv2.matchTemplate
+        box_w, box_h: template size (used for the local-max window and NMS)
+
+    Returns:
+        [(x, y, score)] top-left positions, best first
+    """
+    # A point is a peak if it equals the max of its neighbourhood (half a template)
+    kernel = np.ones((max(1, box_h // 2), max(1, box_w // 2)), np.uint8)
+    local_max = cv2.dilate(scores, kernel)
+    ys, xs = np.nonzero((scores >= threshold) & (scores >= local_max))
+    if not len(xs):
+        return []
+    values = scores[ys, xs]
+    if len(values) > MAX_CANDIDATES:
+        top = np.argpartition(-values, MAX_CANDIDATES)[:MAX_CANDIDATES]
+        xs, ys, values = xs[top], ys[top], values[top]
+    keep = non_max_suppression(xs, ys, values, box_w, box_h, overlap, max_results)
+    return [(int(xs[i]), int(ys[i]), float(values[i])) for i in keep]
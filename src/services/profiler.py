@@ -0,0 +1,177 @@
+"""
+On-demand sampling profiler for threads running execute_graph.
+Samples the stacks of tracked executor threads from a background thread, so it
+can be attached to an already running script without restarting the server.
+Results export as pstats (marshal) or collapsed stacks (flamegraph.pl / speedscope).
+"""
+import marshal
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Any, Optional, Tuple
+
+DEFAULT_INTERVAL = 0.005  # 5 ms
+
+# (filename, first line, function name) - same key layout as pstats
+FuncKey = Tuple[str, int, str]
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # {thread ident: (script, node)} for threads currently inside execute_graph
+        self._locations: Dict[int, Tuple[str, str]] = {}
+        self._sampler: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._reset()
+
+    def _reset(self):
+        self.interval = DEFAULT_INTERVAL
+        self.samples = 0
+        self._rounds = 0
+        self._elapsed = 0.0
+        self.started_at = None
+        self.stopped_at = None
+        self._stacks: Counter = Counter()        # collapsed stack -> samples
+        self._self: Counter = Counter()          # FuncKey -> samples as leaf
+        self._cumulative: Counter = Counter()    # FuncKey -> samples on stack
+        self._edges: Counter = Counter()         # (caller, callee) -> samples
+
+    # --- Executor hooks ---
+
+    def enter_thread(self):
+        self._locations[threading.get_ident()] = ("main", "-")
+
+    def leave_thread(self):
+        self._locations.pop(threading.get_ident(), None)
+
+    def set_location(self, script: str, node: str):
+        """Called by the executor before each node; a plain dict write."""
+        self._locations[threading.get_ident()] = (script, node)
+
+    # --- Control ---
+
+    @property
+    def running(self) -> bool:
+        return self._sampler is not None and self._sampler.is_alive()
+
+    def start(self, interval: float = None) -> bool:
+        with self._lock:
+            if self.running:
+                return False
+            self._reset()
+            self.interval = max(0.001, float(interval or DEFAULT_INTERVAL))
+            self.started_at = time.time()
+            self._stop_event.clear()
+            self._sampler = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+            self._sampler.start()
+            return True
+
+    def stop(self) -> bool:
+        with self._lock:
+            if not self.running:
+                return False
+            self._stop_event.set()
+            self._sampler.join(timeout=2)
+            self._sampler = None
+            self.stopped_at = time.time()
+            return True
+
+    def _run(self):
+        t0 = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            self._sample()
+            self._rounds += 1
+            self._elapsed = time.perf_counter() - t0
+
+    @property
+    def sample_period(self) -> float:
+        """Measured seconds per sampling round (GIL contention makes it exceed interval)."""
+        if self._rounds:
+            return self._elapsed / self._rounds
+        return self.interval
+
+    def _sample(self):
+        frames = sys._current_frames()
+        for ident, (script, node) in list(self._locations.items()):
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            stack.reverse()
+
+            # Annotate with pseudo-frames so both formats attribute time to script/node
+            stack = [("~script", 0, script), ("~node", 0, node)] + stack
+
+            self.samples += 1
+            self._self[stack[-1]] += 1
+            for key in set(stack):
+                self._cumulative[key] += 1
+            for edge in set(zip(stack, stack[1:])):
+                self._edges[edge] += 1
+            self._stacks[";".join(self._frame_label(k) for k in stack)] += 1
+
+    @staticmethod
+    def _frame_label(key: FuncKey) -> str:
+        filename, line, name = key
+        if filename == "~script":
+            return f"script:{name}"
+        if filename == "~node":
+            return f"node:{name}"
+        return f"{name} ({os.path.basename(filename)}:{line})"
+
+    # --- Export ---
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "sample_period": round(self.sample_period, 6),
+            "samples": self.samples,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+            "threads": len(self._locations),
+        }
+
+    def top(self, limit: int = 20):
+        """Functions with the most self samples."""
+        return [
+            {
+                "function": self._frame_label(key),
+                "self": n,
+                "cumulative": self._cumulative[key],
+                "self_seconds": round(n * self.sample_period, 4),
+            }
+            for key, n in self._self.most_common(limit)
+        ]
+
+    def collapsed(self) -> str:
+        """Collapsed stack format: 'frame;frame;frame count' per line."""
+        return "".join(f"{stack} {n}\n" for stack, n in self._stacks.most_common())
+
+    def pstats_bytes(self) -> bytes:
+        """
+        Marshalled pstats dictionary, loadable with pstats.Stats(filename).
+        Call counts are sample counts; times are samples * measured sample period.
+        """
+        period = self.sample_period
+        callers: Dict[FuncKey, Dict[FuncKey, tuple]] = {}
+        for (caller, callee), n in self._edges.items():
+            callers.setdefault(callee, {})[caller] = (n, n, 0.0, n * period)
+
+        stats = {}
+        for key, cum in self._cumulative.items():
+            own = self._self.get(key, 0)
+            stats[key] = (cum, cum, own * period, cum * period, callers.get(key, {}))
+        return marshal.dumps(stats)
+
+
+# Global profiler
+profiler = SamplingProfiler()
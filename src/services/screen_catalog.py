@@ -0,0 +1,185 @@
+"""
+Screen catalog: reference screenshots indexed by perceptual hash.
+Each registered screen stores a PNG, its size, optional ignored regions
+(dynamic areas such as counters) and a 64-bit DCT hash. Classifying a frame
+hashes it once per distinct mask and takes the nearest reference by Hamming
+distance, so "which screen am I on" is one lookup instead of a chain of
+template searches.
+"""
+import json
+import os
+import re
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from services.frame import Frame
+
+SCREENS_DIR = 'screens'
+INDEX_NAME = 'screens.json'
+# Hamming distance (of 64 bits) accepted as the same screen
+DEFAULT_MAX_DISTANCE = 10
+
+_NAME_RE = re.compile(r'^[\w\-. ]{1,64}$')
+
+
+def _hamming(hashes, query: int):
+    diff = hashes ^ np.uint64(query)
+    return np.unpackbits(diff.view(np.uint8)).reshape(len(hashes), 64).sum(axis=1)
+
+
+class ScreenCatalog:
+    def __init__(self, root: str = SCREENS_DIR):
+        self.root = root
+        self._lock = threading.RLock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._loaded = False
+        # {(ignore, width, height): (names, uint64 hashes)}
+        self._groups: Dict[Tuple, Tuple[List[str], Any]] = {}
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.root, INDEX_NAME)
+
+    def _load(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            entries = {}
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    for entry in json.load(f).get('screens', []):
+                        entries[entry['name']] = entry
+            self._entries = entries
+            self._rebuild()
+            self._loaded = True
+
+    def _save(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"screens": list(self._entries.values())}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.index_path)
+
+    def _rebuild(self):
+        groups: Dict[Tuple, List[Dict[str, Any]]] = {}
+        for entry in self._entries.values():
+            key = (tuple(tuple(r) for r in entry.get('ignore', [])), entry['width'], entry['height'])
+            groups.setdefault(key, []).append(entry)
+        self._groups = {key: ([e['name'] for e in items],
+                              np.array([int(e['hash'], 16) for e in items], dtype=np.uint64))
+                        for key, items in groups.items()}
+
+    def reload(self):
+        with self._lock:
+            self._loaded = False
+        self._load()
+
+    def list(self) -> List[Dict[str, Any]]:
+        self._load()
+        with self._lock:
+            return [dict(e) for e in sorted(self._entries.values(), key=lambda e: e['name'])]
+
+    def names(self) -> List[str]:
+        return [e['name'] for e in self.list()]
+
+    def image_path(self, name: str) -> Optional[str]:
+        self._load()
+        entry = self._entries.get(name)
+        return os.path.join(self.root, entry['file']) if entry else None
+
+    def register(self, name: str, bgr, ignore=None) -> Dict[str, Any]:
+        """
+        Add or replace a reference screen.
+
+        Raises:
+            ValueError: invalid name or image
+        """
+        name = (name or '').strip()
+        if not _NAME_RE.match(name):
+            raise ValueError("Screen name may only contain letters, digits, space, '-', '_' and '.'")
+        if bgr is None or getattr(bgr, 'size', 0) == 0:
+            raise ValueError("Empty image")
+        ignore = [[int(v) for v in r] for r in (ignore or [])]
+        frame = Frame(bgr)
+        entry = {
+            "name": name,
+            "file": name + '.png',
+            "width": frame.width,
+            "height": frame.height,
+            "ignore": ignore,
+            "hash": format(frame.phash(ignore), '016x'),
+        }
+        self._load()
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            if not cv2.imwrite(os.path.join(self.root, entry['file']), bgr):
+                raise ValueError("Could not write screen image")
+            self._entries[name] = entry
+            self._rebuild()
+            self._save()
+        return dict(entry)
+
+    def remove(self, name: str) -> bool:
+        self._load()
+        with self._lock:
+            entry = self._entries.pop(name, None)
+            if entry is None:
+                return False
+            try:
+                os.remove(os.path.join(self.root, entry['file']))
+            except OSError:
+                pass
+            self._rebuild()
+            self._save()
+        return True
+
+    def classify(self, frame: Frame, names: Optional[List[str]] = None,
+                 max_distance: int = DEFAULT_MAX_DISTANCE) -> Optional[Dict[str, Any]]:
+        """
+        Nearest reference screen for a frame.
+
+        Args:
+            names: restrict to these screens (None = whole catalog)
+
+        Returns:
+            {'name': best name or None if beyond max_distance, 'distance', 'best',
+             'runner_up', 'runner_up_distance'}, or None if no candidates
+        """
+        self._load()
+        allowed = set(names) if names else None
+        ranked = []
+        for (ignore, width, height), (group_names, hashes) in self._groups.items():
+            if allowed is not None:
+                mask = np.array([n in allowed for n in group_names], dtype=bool)
+                if not mask.any():
+                    continue
+            else:
+                mask = None
+            # Regions are stored in reference coordinates; scale them to this frame
+            sx, sy = frame.width / width, frame.height / height
+            scaled = tuple((int(x * sx), int(y * sy), int(w * sx), int(h * sy)) for x, y, w, h in ignore)
+            distances = _hamming(hashes, frame.phash(scaled))
+            for i, distance in enumerate(distances):
+                if mask is None or mask[i]:
+                    ranked.append((int(distance), group_names[i]))
+        if not ranked:
+            return None
+        ranked.sort()
+        distance, best = ranked[0]
+        runner_up = ranked[1] if len(ranked) > 1 else (None, None)
+        return {
+            "name": best if distance <= max_distance else None,
+            "best": best,
+            "distance": distance,
+            "runner_up": runner_up[1],
+            "runner_up_distance": runner_up[0],
+        }
+
+
+# Global catalog
+screen_catalog = ScreenCatalog()
@@ -0,0 +1,134 @@
+"""
+In-memory screen capture for the editor preview and live view.
+Frames are grabbed into memory, shared between clients and encoded on demand
+(PNG / JPEG / WebP, optional downscale) without touching the disk.
+"""
+import threading
+import time
+from typing import Optional, Tuple
+
+FORMATS = {
+    'png': ('.png', 'image/png'),
+    'jpeg': ('.jpg', 'image/jpeg'),
+    'jpg': ('.jpg', 'image/jpeg'),
+    'webp': ('.webp', 'image/webp'),
+}
+
+# A live stream whose captures keep failing for this long is ended
+MAX_FAILURE_SECONDS = 5.0
+
+
+def encode_frame(frame, fmt: str = 'jpeg', quality: int = 80, scale: float = 1.0,
+                 crop: Optional[Tuple[int, int, int, int]] = None) -> Tuple[bytes, str]:
+    """
+    Encode a BGR frame to image bytes.
+
+    Args:
+        frame: BGR numpy array
+        fmt: 'png', 'jpeg' or 'webp'
+        quality: 1-100 for JPEG/WebP (ignored for PNG)
+        scale: Downscale factor applied after cropping (e.g. 0.5)
+        crop: Optional (x, y, w, h) region in original frame coordinates
+
+    Returns:
+        (encoded bytes, mimetype)
+    """
+    import cv2  # Deferred: keeps OpenCV out of server startup
+
+    ext, mimetype = FORMATS.get(fmt.lower(), FORMATS['jpeg'])
+
+    if crop:
+        x, y, w, h = (int(v) for v in crop)
+        frame = frame[max(0, y):y + h, max(0, x):x + w]
+    if scale and 0 < scale < 1:
+        frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    quality = max(1, min(100, int(quality)))
+    if ext == '.jpg':
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    elif ext == '.webp':
+        params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+    else:
+        params = [cv2.IMWRITE_PNG_COMPRESSION, 1]  # Favor speed over size
+
+    ok, buf = cv2.imencode(ext, frame, params)
+    if not ok:
+        raise ValueError(f"Failed to encode frame as {fmt}")
+    return buf.tobytes(), mimetype
+
+
+class ScreenStream:
+    """
+    Latest-frame cache shared by the preview endpoint and all live-view clients.
+    A new capture is only taken when the cached frame is older than max_age,
+    so N viewers at the same rate cost one capture per frame, not N.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.frame = None
+        self.seq = 0
+        self.captured_at = 0.0
+        # Encoded copy of the current frame: {(fmt, quality, scale): bytes}
+        self._encoded = {}
+
+    def grab(self, bot, max_age: float = 0.0):
+        """Return (seq, frame), capturing a new frame if the cached one is too old."""
+        with self._lock:
+            if self.frame is not None and time.monotonic() - self.captured_at <= max_age:
+                return self.seq, self.frame
+            frame = bot.capture_frame()
+            if frame is None:
+                raise RuntimeError("Failed to capture frame")
+            self.frame = frame
+            self.seq += 1
+            self.captured_at = time.monotonic()
+            self._encoded = {}
+            return self.seq, self.frame
+
+    def encoded(self, bot, fmt: str = 'jpeg', quality: int = 80, scale: float = 1.0, max_age: float = 0.0):
+        """Return (seq, bytes, mimetype) for the latest frame, encoding each variant once per frame."""
+        seq, frame = self.grab(bot, max_age)
+        key = (fmt, int(quality), float(scale))
+        with self._lock:
+            cached = self._encoded.get(key) if seq == self.seq else None
+        if cached is None:
+            cached = encode_frame(frame, fmt, quality, scale)
+            with self._lock:
+                if seq == self.seq:
+                    self._encoded[key] = cached
+        return (seq,) + cached
+
+    def mjpeg(self, bot, fps: float = 5.0, quality: int = 70, scale: float = 1.0):
+        """
+        Generator yielding multipart/x-mixed-replace JPEG parts at up to 'fps' frames per second.
+        Runs until the client disconnects (the server closes the generator), or ends
+        once capturing has failed for MAX_FAILURE_SECONDS: without frames nothing is
+        written, so a disconnected client would otherwise never be noticed.
+        """
+        period = 1.0 / max(0.1, fps)
+        last_seq = None
+        failing_since = None
+        while True:
+            started = time.monotonic()
+            try:
+                seq, data, mimetype = self.encoded(bot, 'jpeg', quality, scale, max_age=period)
+                failing_since = None
+            except Exception:
+                if failing_since is None:
+                    failing_since = started
+                elif started - failing_since >= MAX_FAILURE_SECONDS:
+                    return
+                time.sleep(period)
+                continue
+            if seq != last_seq:
+                last_seq = seq
+                yield (b"--frame\r\nContent-Type: " + mimetype.encode() +
+                       b"\r\nContent-Length: " + str(len(data)).encode() + b"\r\n\r\n" + data + b"\r\n")
+            remaining = period - (time.monotonic() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+
+
+# Global stream shared by all preview clients
+screen_stream = ScreenStream()
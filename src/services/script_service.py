@@ -3,6 +3,18 @@ import json
 from typing import List, Dict, Any, Optional
 from shared import log_message
 
+# Node types with two outputs: slot 0 -> next_found (success), slot 1 -> next_not_found (failure/timeout)
+BRANCH_NODE_TYPES = ('find_image', 'check_pixel', 'find_multi_images', 'find_all', 'wait_change', 'wait_stable')
+
+
+def router_screens(properties: Dict[str, Any]) -> List[str]:
+    """Screens of a screen_router node in output order (slot 0 is 'Unknown', slot i + 1 -> next_screen_i)."""
+    value = properties.get('screens', '')
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [v.strip() for v in (value or '').replace('\n', ',').split(',') if v.strip()]
+
+
 class ScriptService:
     SCRIPTS_DIR = 'scripts'
 
@@ -19,38 +31,16 @@ class ScriptService:
         Returns:
             List of normalized nodes, or (nodes, path) tuple if return_path=True
         """
-        script_folder = None
-        script_file = None
-        
-        # Check new folder format first
-        folder_path = os.path.join(ScriptService.SCRIPTS_DIR, script_name)
-        folder_script = os.path.join(folder_path, 'script.json')
-        
-        if os.path.exists(folder_script):
-            script_file = folder_script
-            script_folder = folder_path
-        else:
-            # Fallback to legacy .json format
-            legacy_path = os.path.join(ScriptService.SCRIPTS_DIR, f"{script_name}.json")
-            if os.path.exists(legacy_path):
-                script_file = legacy_path
-                script_folder = None  # Legacy scripts have no local folder
+        script_file, script_folder = ScriptService.locate(script_name)
         
         if not script_file:
             log_message(f"Error: Script '{script_name}' not found.")
             return ([], None) if return_path else []
 
         try:
-            with open(script_file, 'r', encoding='utf-8') as f:
-                script_data = json.load(f)
-
-            # Handle Double-JSON encoding (fix from previous sessions)
-            if isinstance(script_data, str):
-                try:
-                    script_data = json.loads(script_data)
-                except Exception as e:
-                    log_message(f"Error parsing script JSON string: {e}")
-                    return ([], None) if return_path else []
+            script_data = ScriptService.load_raw(script_file)
+            if script_data is None:
+                return ([], None) if return_path else []
 
             nodes = ScriptService.normalize(script_data)
             return (nodes, script_folder) if return_path else nodes
@@ -58,6 +48,42 @@ class ScriptService:
             log_message(f"Error loading script {script_name}: {e}")
             return ([], None) if return_path else []
 
+    @staticmethod
+    def locate(script_name: str):
+        """
+        Find a script on disk.
+        
+        Returns:
+            (script_file, script_folder) - script_folder is None for legacy .json scripts,
+            both are None if the script does not exist.
+        """
+        # Check new folder format first
+        folder_path = os.path.join(ScriptService.SCRIPTS_DIR, script_name)
+        folder_script = os.path.join(folder_path, 'script.json')
+        if os.path.exists(folder_script):
+            return folder_script, folder_path
+        
+        # Fallback to legacy .json format
+        legacy_path = os.path.join(ScriptService.SCRIPTS_DIR, f"{script_name}.json")
+        if os.path.exists(legacy_path):
+            return legacy_path, None  # Legacy scripts have no local folder
+        return None, None
+
+    @staticmethod
+    def load_raw(script_file: str) -> Any:
+        """Read a script file, undoing double-JSON encoding. Returns None on parse errors."""
+        with open(script_file, 'r', encoding='utf-8') as f:
+            script_data = json.load(f)
+
+        # Handle Double-JSON encoding (fix from previous sessions)
+        if isinstance(script_data, str):
+            try:
+                script_data = json.loads(script_data)
+            except Exception as e:
+                log_message(f"Error parsing script JSON string: {e}")
+                return None
+        return script_data
+
     @staticmethod
     def normalize(data: Any) -> List[Dict[str, Any]]:
         """
@@ -121,7 +147,12 @@ class ScriptService:
             if node_type == 'loop':
                 new_node['next_body'] = conns.get(str(0)) or conns.get(0)
                 new_node['next_exit'] = conns.get(str(1)) or conns.get(1)
-            elif node_type in ['find_image', 'check_pixel', 'find_multi_images']:
+            elif node_type == 'screen_router':
+                screens = router_screens(new_node['properties'])
+                new_node['next_unknown'] = conns.get(0) or conns.get(str(0))
+                for i in range(len(screens)):
+                    new_node[f'next_screen_{i}'] = conns.get(i + 1) or conns.get(str(i + 1))
+            elif node_type in BRANCH_NODE_TYPES:
                 # Support both int and string keys for robustness
                 # Try slot 0 (Found) and slot 1 (Not Found)
                 new_node['next_found'] = conns.get(0) or conns.get(str(0))
@@ -0,0 +1,78 @@
+"""
+Startup and import-cost report.
+Heavy libraries (OpenCV, NumPy, ADB, discord.py) and node modules are imported
+on first use; this module records how long each of those imports took, when it
+happened relative to process start, and the timing of the startup phases.
+"""
+import importlib
+import sys
+import threading
+import time
+from typing import Dict, Any, List
+
+# Modules whose presence in sys.modules is worth reporting (resident memory)
+HEAVY_MODULES = ('cv2', 'numpy', 'ppadb', 'adbutils', 'discord', 'aiohttp', 'flask')
+
+
+def _max_rss_kb():
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss // 1024 if sys.platform == 'darwin' else rss  # macOS reports bytes
+    except Exception:
+        return None  # Not available on Windows
+
+
+class StartupReport:
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self.phases: List[Dict[str, Any]] = []
+        self.imports: Dict[str, Dict[str, Any]] = {}
+        self._phase_start = self.t0
+
+    def phase(self, name: str):
+        """Mark the end of a startup phase (duration since the previous mark)."""
+        now = time.perf_counter()
+        with self._lock:
+            self.phases.append({
+                "phase": name,
+                "ms": round((now - self._phase_start) * 1000, 2),
+                "at_ms": round((now - self.t0) * 1000, 2),
+            })
+            self._phase_start = now
+
+    def timed_import(self, name: str, reason: str = None):
+        """Import a module, recording the cost of the first import."""
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.imports.setdefault(name, {
+                "module": name,
+                "ms": round(elapsed * 1000, 2),
+                "at_ms": round((started - self.t0) * 1000, 2),
+                "thread": threading.current_thread().name,
+                "reason": reason,
+            })
+        return module
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            imports = sorted(self.imports.values(), key=lambda i: i["at_ms"])
+            phases = list(self.phases)
+        return {
+            "uptime_s": round(time.perf_counter() - self.t0, 3),
+            "phases": phases,
+            "lazy_imports": imports,
+            "heavy_modules_loaded": [m for m in HEAVY_MODULES if m in sys.modules],
+            "modules_loaded": len(sys.modules),
+            "max_rss_kb": _max_rss_kb(),
+        }
+
+
+# Global report, created when the server process starts
+startup = StartupReport()
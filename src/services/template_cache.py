@@ -0,0 +1,178 @@
+"""
+Template image and feature cache.
+Grayscale templates are kept in memory, and SIFT keypoints/descriptors are
+persisted under .cache/features/<sha256>.npz keyed by template content, so
+feature extraction happens once per template across runs, scripts and hosts
+(bundles ship the .npz files).
+"""
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from services.template_store import template_store
+from services.frame import sift_detector
+
+FEATURE_DIR = os.path.join('.cache', 'features')
+FEATURE_VERSION = 1
+MAX_ENTRIES = 256
+
+
+class TemplateData:
+    """A loaded template: grayscale pixels plus (lazily) SIFT features and rescaled variants."""
+    __slots__ = ('path', 'digest', 'gray', 'keypoints', 'descriptors', 'variants')
+
+    def __init__(self, path: str, digest: str, gray):
+        self.path = path
+        self.digest = digest
+        self.gray = gray
+        self.keypoints = None
+        self.descriptors = None
+        self.variants = {}  # {scale: resized gray}
+
+    @property
+    def has_features(self) -> bool:
+        return self.keypoints is not None
+
+    def scaled(self, scale: float):
+        """Grayscale template resized by 'scale' (e.g. to the device resolution), computed once."""
+        scale = round(float(scale), 4)
+        if scale == 1.0:
+            return self.gray
+        variant = self.variants.get(scale)
+        if variant is None:
+            interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+            variant = self.variants[scale] = cv2.resize(self.gray, None, fx=scale, fy=scale,
+                                                        interpolation=interpolation)
+        return variant
+
+
+def _pack_features(keypoints, descriptors) -> bytes:
+    kp = np.array([(k.pt[0], k.pt[1], k.size, k.angle, k.response, k.octave, k.class_id) for k in keypoints],
+                  dtype=np.float32).reshape(-1, 7)
+    des = descriptors if descriptors is not None else np.zeros((0, 128), dtype=np.float32)
+    buf = io.BytesIO()
+    np.savez(buf, version=np.array([FEATURE_VERSION]), keypoints=kp, descriptors=des)
+    return buf.getvalue()
+
+
+def _unpack_features(data: bytes):
+    with np.load(io.BytesIO(data)) as npz:
+        if int(npz['version'][0]) != FEATURE_VERSION:
+            raise ValueError("Feature file version mismatch")
+        kp = npz['keypoints']
+        des = npz['descriptors']
+    keypoints = [cv2.KeyPoint(float(x), float(y), float(size), float(angle), float(resp), int(octave), int(cid))
+                 for x, y, size, angle, resp, octave, cid in kp]
+    return keypoints, (des if len(des) else None)
+
+
+class TemplateCache:
+    def __init__(self, feature_dir: str = FEATURE_DIR, max_entries: int = MAX_ENTRIES):
+        self.feature_dir = feature_dir
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # {abs path: (size, mtime_ns, TemplateData)} in LRU order
+        self._entries: "OrderedDict[str, Tuple[int, int, TemplateData]]" = OrderedDict()
+
+    def feature_path(self, digest: str) -> str:
+        return os.path.join(self.feature_dir, digest[:2], digest + '.npz')
+
+    def get(self, path: str, features: bool = False) -> Optional[TemplateData]:
+        """
+        Load a template (memoized by path + mtime). With features=True, SIFT
+        keypoints/descriptors are loaded from disk or computed and persisted.
+        Returns None if the image cannot be read.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = os.path.abspath(path)
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+                self._entries.move_to_end(key)
+                data = cached[2]
+            else:
+                data = None
+
+        if data is None:
+            gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if gray is None:
+                return None
+            data = TemplateData(path, template_store.hash_file(path), gray)
+            with self._lock:
+                self._entries[key] = (st.st_size, st.st_mtime_ns, data)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        if features and not data.has_features:
+            self._load_features(data)
+        return data
+
+    def _load_features(self, data: TemplateData):
+        fpath = self.feature_path(data.digest)
+        if os.path.exists(fpath):
+            try:
+                with open(fpath, 'rb') as f:
+                    keypoints, descriptors = _unpack_features(f.read())
+                # Descriptors first: has_features checks keypoints
+                data.descriptors = descriptors
+                data.keypoints = keypoints
+                return
+            except Exception:
+                pass  # Stale/corrupt file: recompute below
+
+        keypoints, descriptors = sift_detector().detectAndCompute(data.gray, None)
+        data.descriptors = descriptors
+        data.keypoints = list(keypoints)
+        try:
+            self.import_features(data.digest, _pack_features(data.keypoints, data.descriptors))
+        except Exception:
+            pass
+
+    def features_bytes(self, path: str) -> Optional[bytes]:
+        """Serialized features for a template (computing them if needed), for bundling."""
+        data = self.get(path, features=True)
+        if data is None:
+            return None
+        fpath = self.feature_path(data.digest)
+        if os.path.exists(fpath):
+            with open(fpath, 'rb') as f:
+                return f.read()
+        return _pack_features(data.keypoints, data.descriptors)
+
+    @staticmethod
+    def check_features(blob: bytes):
+        """
+        Check that serialized features (e.g. from a bundle) can be loaded.
+
+        Raises:
+            ValueError: unreadable file, other version or malformed arrays
+        """
+        try:
+            keypoints, descriptors = _unpack_features(blob)
+        except Exception as e:
+            raise ValueError(f"Invalid feature file: {e}")
+        if descriptors is not None and (descriptors.ndim != 2 or len(descriptors) != len(keypoints)):
+            raise ValueError("Invalid feature file: descriptors do not match keypoints")
+
+    def import_features(self, digest: str, blob: bytes):
+        """Install precomputed features (e.g. from a bundle) for a template hash."""
+        fpath = self.feature_path(digest)
+        os.makedirs(os.path.dirname(fpath), exist_ok=True)
+        tmp = fpath + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(blob)
+        os.replace(tmp, fpath)
+
+
+# Global cache
+template_cache = TemplateCache()
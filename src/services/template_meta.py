@@ -0,0 +1,111 @@
+"""
+Capture resolution of templates.
+Templates are cropped from screenshots taken at some emulator resolution; on a
+device with another resolution they must be rescaled before matching. The
+capture resolution (width, height, optional density) is recorded per template
+content hash in store/template_meta.json. Templates without an entry use the
+'template_resolution' setting; if neither is known, matching falls back to the
+multi-scale search.
+"""
+import json
+import os
+import re
+import threading
+from typing import Dict, Any, Iterable, Optional
+
+from settings import settings_store
+from services.template_store import STORE_DIR
+
+META_PATH = os.path.join(STORE_DIR, 'template_meta.json')
+
+_RESOLUTION_RE = re.compile(r'^\s*(\d+)\s*[xX*]\s*(\d+)\s*(?:@\s*(\d+))?\s*$')
+
+
+def parse_resolution(value) -> Optional[Dict[str, Any]]:
+    """
+    "1280x720" / "1280x720@240" / {"width", "height", "density"} -> dict, or None if empty.
+
+    Raises:
+        ValueError: malformed value
+    """
+    if not value:
+        return None
+    if isinstance(value, dict):
+        width, height, density = value.get('width'), value.get('height'), value.get('density')
+    else:
+        match = _RESOLUTION_RE.match(str(value))
+        if not match:
+            raise ValueError(f"Invalid resolution '{value}' (expected WxH or WxH@DPI)")
+        width, height, density = match.groups()
+    width, height = int(width), int(height)
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Invalid resolution '{value}'")
+    return {"width": width, "height": height, "density": int(density) if density else None}
+
+
+def scale_between(source: Dict[str, Any], target: Dict[str, Any]) -> float:
+    """
+    Factor that maps template pixels captured at 'source' to 'target'.
+    Games lay out relative to the screen, so the short-side ratio is used (it is
+    independent of orientation); at equal pixel size a density change scales
+    native Android UI, so the density ratio applies.
+    """
+    ratio = min(target['width'], target['height']) / min(source['width'], source['height'])
+    if abs(ratio - 1.0) < 1e-3 and source.get('density') and target.get('density'):
+        ratio = target['density'] / source['density']
+    return round(ratio, 4)
+
+
+class TemplateMeta:
+    def __init__(self, path: str = META_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data: Optional[Dict[str, Dict[str, Any]]] = None
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    data = {}
+                    if os.path.exists(self.path):
+                        with open(self.path, 'r', encoding='utf-8') as f:
+                            data = json.load(f)
+                    self._data = data
+        return self._data
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Recorded capture resolution of a template, or None."""
+        entry = self._load().get(digest)
+        return dict(entry) if entry else None
+
+    def set(self, digests: Iterable[str], resolution: Optional[Dict[str, Any]]):
+        """Record (or with None, forget) the capture resolution of templates."""
+        self._load()
+        with self._lock:
+            for digest in digests:
+                if resolution:
+                    self._data[digest] = {k: v for k, v in resolution.items() if v is not None}
+                else:
+                    self._data.pop(digest, None)
+            self._save()
+
+    def resolution_for(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Recorded resolution, else the 'template_resolution' setting, else None."""
+        entry = self.get(digest)
+        if entry:
+            return entry
+        try:
+            return parse_resolution(settings_store.get('template_resolution'))
+        except ValueError:
+            return None
+
+
+# Global metadata
+template_meta = TemplateMeta()
@@ -0,0 +1,338 @@
+"""
+Content-addressed template store.
+Template images are stored once under store/blobs/ by SHA-256 of their content.
+Each script folder keeps a manifest.json mapping its template paths to blob
+hashes, plus a per-script images/ view made of copies of the blobs (not
+hardlinks: editing a view in place must never change a shared blob). Views
+whose content no longer matches the manifest are restored on the next sync.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+from shared import log_message
+from services.image_library import IMAGE_EXTENSIONS
+
+STORE_DIR = 'store'
+BLOB_DIR = os.path.join(STORE_DIR, 'blobs')
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def relative_image_path(img_path: str) -> str:
+    # 'images/sub/file.png' -> 'sub/file.png'
+    return img_path[7:] if img_path.startswith('images/') else img_path
+
+
+def check_relative_path(rel: str) -> str:
+    """
+    Normalize a template path taken from untrusted input (bundle manifests).
+
+    Raises:
+        ValueError: absolute paths, drive letters or '..' segments
+    """
+    if not isinstance(rel, str) or not rel or '\x00' in rel:
+        raise ValueError(f"Invalid template path {rel!r}")
+    posix = rel.replace('\\', '/')
+    if posix.startswith('/') or re.match(r'^[A-Za-z]:', posix) or '..' in posix.split('/'):
+        raise ValueError(f"Unsafe template path {rel!r}")
+    normalized = os.path.normpath(posix)
+    if normalized in ('.', '') or os.path.isabs(normalized):
+        raise ValueError(f"Unsafe template path {rel!r}")
+    return normalized.replace(os.sep, '/')
+
+
+def check_image_entry(rel: str, entry: Dict[str, Any], digests: Optional[set] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Validate one manifest image entry: safe path, known image extension, well-formed
+    hash (and, if given, one of 'digests'). Returns (normalized path, entry).
+
+    Raises:
+        ValueError: invalid entry
+    """
+    rel = check_relative_path(rel)
+    if not isinstance(entry, dict):
+        raise ValueError(f"Invalid entry for {rel!r}")
+    digest = entry.get("hash")
+    if not isinstance(digest, str) or not _DIGEST_RE.match(digest):
+        raise ValueError(f"Invalid hash for {rel!r}")
+    if digests is not None and digest not in digests:
+        raise ValueError(f"Template {rel!r} refers to a blob that is not in the bundle")
+    ext = entry.get("ext", os.path.splitext(rel)[1])
+    if not isinstance(ext, str) or ext.lower() not in IMAGE_EXTENSIONS:
+        raise ValueError(f"Unsupported image type {ext!r} for {rel!r}")
+    return rel, {**entry, "ext": ext.lower()}
+
+
+def check_blob_key(key: str) -> Tuple[str, str]:
+    """'<sha256><ext>' -> (digest, ext), rejecting anything else."""
+    digest, ext = os.path.splitext(key) if isinstance(key, str) else ('', '')
+    if not _DIGEST_RE.match(digest) or ext.lower() not in IMAGE_EXTENSIONS:
+        raise ValueError(f"Invalid blob name {key!r}")
+    return digest, ext.lower()
+
+
+def _same_file(a: str, b: str) -> bool:
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+
+class TemplateStore:
+    def __init__(self, blob_dir: str = BLOB_DIR):
+        self.blob_dir = blob_dir
+        # Reentrant: bundle import holds it across several puts and installs (see transaction)
+        self._lock = threading.RLock()
+        # {abs path: (size, mtime_ns, sha256)} - avoids rehashing unchanged files
+        self._hash_cache: Dict[str, Tuple[int, int, str]] = {}
+        # {manifest path: (mtime_ns, manifest dict)}
+        self._manifest_cache: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+
+    # --- Blobs ---
+
+    def hash_file(self, path: str) -> str:
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        cached = self._hash_cache.get(key)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self._hash_cache[key] = (st.st_size, st.st_mtime_ns, digest)
+        return digest
+
+    def blob_path(self, digest: str, ext: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], digest + ext.lower())
+
+    def put(self, path: str) -> Tuple[str, str, bool]:
+        """
+        Add a file to the store. Returns (digest, blob path, created).
+        Nothing is copied when a blob with the same content already exists.
+        """
+        digest = self.hash_file(path)
+        blob = self.blob_path(digest, os.path.splitext(path)[1])
+        with self._lock:
+            if os.path.exists(blob):
+                return digest, blob, False
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            tmp = blob + '.tmp'
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, blob)
+        return digest, blob, True
+
+    def put_bytes(self, data: bytes, ext: str) -> Tuple[str, str, bool]:
+        """Add in-memory content (e.g. from a bundle) to the store."""
+        digest = hashlib.sha256(data).hexdigest()
+        blob = self.blob_path(digest, ext)
+        with self._lock:
+            if os.path.exists(blob):
+                return digest, blob, False
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            tmp = blob + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, blob)
+        return digest, blob, True
+
+    def transaction(self):
+        """
+        Store lock as a context manager: hold it across puts and installs so a concurrent
+        gc() cannot collect blobs that no manifest references yet.
+        """
+        return self._lock
+
+    @staticmethod
+    def _link(blob: str, dst: str):
+        """Materialize a blob at dst as an independent copy (replacing legacy hardlinked views)."""
+        dst_dir = os.path.dirname(dst)
+        if dst_dir:
+            os.makedirs(dst_dir, exist_ok=True)
+        tmp = dst + '.tmp'
+        shutil.copyfile(blob, tmp)
+        os.replace(tmp, dst)  # Replaces the directory entry, never writes through a hardlink
+
+    def _view_current(self, view: str, blob: str, digest: str) -> bool:
+        """True if a view exists as a separate file holding the blob's content."""
+        if not os.path.exists(view) or _same_file(view, blob):
+            return False
+        return self.hash_file(view) == digest
+
+    # --- Manifests ---
+
+    def load_manifest(self, script_folder: str) -> Dict[str, Any]:
+        """Return {'version': 1, 'images': {rel_path: {'hash', 'ext', 'size'}}} (cached by mtime)."""
+        path = os.path.join(script_folder, MANIFEST_NAME)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return {"version": MANIFEST_VERSION, "images": {}}
+        cached = self._manifest_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except Exception as e:
+            log_message(f"Invalid manifest {path}: {e}")
+            manifest = {"version": MANIFEST_VERSION, "images": {}}
+        manifest.setdefault("images", {})
+        self._manifest_cache[path] = (mtime, manifest)
+        return manifest
+
+    def save_manifest(self, script_folder: str, manifest: Dict[str, Any]):
+        path = os.path.join(script_folder, MANIFEST_NAME)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp, path)
+        self._manifest_cache.pop(path, None)
+
+    def sync_script_images(self, image_paths: Iterable[str], script_folder: str,
+                           images_root: str = 'images') -> Dict[str, int]:
+        """
+        Point a script's manifest at the current content of its templates.
+        Only templates whose content changed are stored/linked again.
+
+        Args:
+            image_paths: Template paths referenced by the script (e.g. 'images/ok.png')
+            script_folder: Script folder (e.g. 'scripts/MY_SCRIPT')
+            images_root: Global images folder
+
+        Returns:
+            Counts: {'stored', 'linked', 'unchanged', 'missing', 'removed'}
+        """
+        counts = {"stored": 0, "linked": 0, "unchanged": 0, "missing": 0, "removed": 0}
+        with self._lock:
+            old_images = self.load_manifest(script_folder).get("images", {})
+            new_images = {}
+            view_root = os.path.join(script_folder, 'images')
+
+            for img_path in image_paths:
+                rel = relative_image_path(img_path)
+                src = os.path.join(images_root, rel)
+                view = os.path.join(view_root, rel)
+                old = old_images.get(rel)
+
+                if not os.path.exists(src):
+                    if old:
+                        # Keep the script's snapshot of a template deleted from the global folder
+                        new_images[rel] = old
+                        counts["unchanged"] += 1
+                    else:
+                        log_message(f"Image not found in global folder: {src}")
+                        counts["missing"] += 1
+                    continue
+
+                digest, blob, created = self.put(src)
+                counts["stored"] += int(created)
+                ext = os.path.splitext(src)[1].lower()
+                new_images[rel] = {"hash": digest, "ext": ext, "size": os.path.getsize(blob)}
+
+                if old and old.get("hash") == digest and self._view_current(view, blob, digest):
+                    counts["unchanged"] += 1
+                    continue
+                self._link(blob, view)
+                counts["linked"] += 1
+
+            # Drop views of templates the script no longer references
+            for rel, old in old_images.items():
+                if rel in new_images:
+                    continue
+                view = os.path.join(view_root, rel)
+                blob = self.blob_path(old.get("hash", ""), old.get("ext", ""))
+                if os.path.exists(view) and (_same_file(view, blob) or self.hash_file(view) == old.get("hash")):
+                    os.remove(view)
+                    counts["removed"] += 1
+
+            if new_images != old_images or not os.path.exists(os.path.join(script_folder, MANIFEST_NAME)):
+                self.save_manifest(script_folder, {"version": MANIFEST_VERSION, "images": new_images})
+        return counts
+
+    @staticmethod
+    def check_images(script_folder: str, images: Dict[str, Dict[str, Any]],
+                     digests: Optional[set] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Validate manifest entries from untrusted input; every view must stay inside
+        <script_folder>/images. Returns the normalized entries.
+
+        Raises:
+            ValueError: any invalid entry (nothing has been written)
+        """
+        if not isinstance(images, dict):
+            raise ValueError("Invalid template list")
+        view_root = os.path.abspath(os.path.join(script_folder, 'images'))
+        checked = {}
+        for rel, entry in images.items():
+            rel, entry = check_image_entry(rel, entry, digests)
+            view = os.path.abspath(os.path.join(view_root, rel))
+            if os.path.commonpath([view_root, view]) != view_root or view == view_root:
+                raise ValueError(f"Template path {rel!r} escapes the script folder")
+            checked[rel] = entry
+        return checked
+
+    def install_images(self, script_folder: str, images: Dict[str, Dict[str, Any]]):
+        """Write a manifest for blobs already in the store and link the per-script views (bundle import)."""
+        images = self.check_images(script_folder, images)
+        with self._lock:
+            view_root = os.path.join(script_folder, 'images')
+            for rel, entry in images.items():
+                blob = self.blob_path(entry["hash"], entry["ext"])
+                self._link(blob, os.path.join(view_root, rel))
+            self.save_manifest(script_folder, {"version": MANIFEST_VERSION, "images": images})
+
+    def resolve(self, script_folder: str, relative_path: str) -> Optional[str]:
+        """Blob path for a script's template, or None if the manifest does not list it."""
+        entry = self.load_manifest(script_folder).get("images", {}).get(relative_path)
+        if not entry:
+            return None
+        blob = self.blob_path(entry["hash"], entry.get("ext", os.path.splitext(relative_path)[1]))
+        return blob if os.path.exists(blob) else None
+
+    # --- Garbage collection ---
+
+    def referenced_hashes(self, scripts_dir: str = 'scripts') -> set:
+        refs = set()
+        if not os.path.isdir(scripts_dir):
+            return refs
+        for entry in os.listdir(scripts_dir):
+            folder = os.path.join(scripts_dir, entry)
+            if os.path.isdir(folder):
+                for item in self.load_manifest(folder).get("images", {}).values():
+                    refs.add(item.get("hash"))
+        return refs
+
+    def gc(self, scripts_dir: str = 'scripts', dry_run: bool = False) -> Dict[str, Any]:
+        """Delete blobs that no script manifest references."""
+        with self._lock:
+            refs = self.referenced_hashes(scripts_dir)
+            removed, freed, kept = 0, 0, 0
+            if os.path.isdir(self.blob_dir):
+                for shard in os.listdir(self.blob_dir):
+                    shard_dir = os.path.join(self.blob_dir, shard)
+                    if not os.path.isdir(shard_dir):
+                        continue
+                    for name in os.listdir(shard_dir):
+                        digest = os.path.splitext(name)[0]
+                        if digest in refs:
+                            kept += 1
+                            continue
+                        path = os.path.join(shard_dir, name)
+                        freed += os.path.getsize(path)
+                        removed += 1
+                        if not dry_run:
+                            os.remove(path)
+            return {"removed": removed, "kept": kept, "freed_bytes": freed, "dry_run": dry_run}
+
+
+# Global store
+template_store = TemplateStore()
@@ -0,0 +1,140 @@
+"""
+Opt-in execution trace recorder.
+Keeps node, sub-script, loop, capture and match events in a bounded ring buffer
+and exports them as Chrome trace-event JSON (chrome://tracing / Perfetto).
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List
+
+DEFAULT_CAPACITY = 50000
+
+
+class _NullSpan:
+    """Returned when tracing is disabled so instrumented code pays almost nothing."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('recorder', 'name', 'cat', 'args', 'start')
+
+    def __init__(self, recorder, name, cat, args):
+        self.recorder = recorder
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args['error'] = str(exc)
+        self.recorder._append(('X', self.name, self.cat, self.start, end - self.start, threading.get_ident(), self.args))
+        return False
+
+    def set(self, **args):
+        """Attach extra args discovered while the span is open (e.g. the next node id)."""
+        self.args.update(args)
+
+
+class TraceRecorder:
+    """
+    Ring-buffer trace recorder. Disabled by default.
+    Timestamps come from time.perf_counter() (monotonic).
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.enabled = False
+        self._events = deque(maxlen=capacity)
+        self._thread_names: Dict[int, str] = {}
+        self._origin = time.perf_counter()
+        self._started_at = None
+
+    def start(self, capacity: int = None):
+        """Clear the buffer and begin recording."""
+        if capacity and capacity != self._events.maxlen:
+            self._events = deque(maxlen=int(capacity))
+        else:
+            self._events.clear()
+        self._thread_names.clear()
+        self._origin = time.perf_counter()
+        self._started_at = time.time()
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    def clear(self):
+        self._events.clear()
+        self._thread_names.clear()
+
+    def span(self, name: str, cat: str, **args):
+        """Context manager recording a complete ('X') event around the block."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, cat, args)
+
+    def instant(self, name: str, cat: str, **args):
+        """Record a point-in-time ('i') event."""
+        if not self.enabled:
+            return
+        self._append(('i', name, cat, time.perf_counter(), 0.0, threading.get_ident(), args))
+
+    def _append(self, event):
+        tid = event[5]
+        if tid not in self._thread_names:
+            self._thread_names[tid] = threading.current_thread().name
+        # deque.append is atomic; the oldest events fall off when full
+        self._events.append(event)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "events": len(self._events),
+            "capacity": self._events.maxlen,
+            "started_at": self._started_at,
+        }
+
+    def export(self) -> Dict[str, Any]:
+        """Build a Chrome trace-event JSON object from the buffered events."""
+        pid = os.getpid()
+        events: List[Dict[str, Any]] = []
+        for tid, tname in list(self._thread_names.items()):
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": tname}})
+
+        for ph, name, cat, start, dur, tid, args in list(self._events):
+            evt = {
+                "name": name,
+                "cat": cat,
+                "ph": ph,
+                "ts": round((start - self._origin) * 1e6, 1),
+                "pid": pid,
+                "tid": tid,
+                "args": {k: (v if isinstance(v, (int, float, str, bool)) or v is None else str(v)) for k, v in args.items()},
+            }
+            if ph == 'X':
+                evt["dur"] = round(dur * 1e6, 1)
+            else:
+                evt["s"] = "t"  # Thread-scoped instant
+            events.append(evt)
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+# Global recorder
+tracer = TraceRecorder()
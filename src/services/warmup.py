@@ -0,0 +1,177 @@
+"""
+Pre-run preparation.
+Before the start node runs, walk the graph and every sub-script it calls,
+resolve and preload all templates (pixels and SIFT features) into the
+template cache, open the device connection and rescale templates to the
+device resolution, so the first iteration costs the same as the rest and
+missing templates are reported up front.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+import shared
+from shared import log_message, log_warn
+from services.script_service import ScriptService
+from services.image_utils import resolve_template_path
+
+MAX_DEPTH = 10  # Same limit as GraphExecutor recursion
+PRELOAD_WORKERS = 4
+
+
+def _node_templates(node: Dict[str, Any]) -> List[str]:
+    props = node.get('properties', {})
+    node_type = node.get('type', '').replace('bot/', '')
+    if node_type in ('find_image', 'find_all'):
+        template = props.get('template', '')
+        return [template] if template else []
+    if node_type == 'find_multi_images':
+        templates = props.get('templates', '')
+        return [t.strip() for t in templates.replace('\n', ',').split(',') if t.strip()]
+    return []
+
+
+def collect_templates(actions: List[Dict[str, Any]], script_folder: Optional[str] = None,
+                      script_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Walk a normalized graph and the sub-scripts it calls.
+
+    Returns:
+        {'templates': {(template, script_folder): {'uses_sift', 'refs': [(script, node_id)]}},
+         'scripts': [names visited], 'missing_scripts': [{'script', 'node', 'name'}]}
+    """
+    templates: Dict[Tuple[str, Optional[str]], Dict[str, Any]] = {}
+    visited, missing_scripts = [], []
+    pending = [(actions, script_folder, script_name, 0)]
+
+    while pending:
+        nodes, folder, name, depth = pending.pop(0)
+        for node in nodes:
+            node_type = node.get('type', '').replace('bot/', '')
+            props = node.get('properties', {})
+
+            for template in _node_templates(node):
+                entry = templates.setdefault((template, folder), {"uses_sift": False, "refs": []})
+                entry["refs"].append((name, node.get('id')))
+                if node_type in ('find_image', 'find_multi_images') and props.get('algorithm', 'auto') in ('auto', 'sift'):
+                    entry["uses_sift"] = True
+
+            if node_type == 'script':
+                sub_name = (props.get('scriptName') or '').strip()
+                if not sub_name or sub_name in visited or depth >= MAX_DEPTH:
+                    continue
+                sub_actions, sub_folder = ScriptService.load_and_normalize(sub_name, return_path=True)
+                if not sub_actions:
+                    missing_scripts.append({"script": name, "node": node.get('id'), "name": sub_name})
+                    continue
+                visited.append(sub_name)
+                pending.append((sub_actions, sub_folder, sub_name, depth + 1))
+
+    return {"templates": templates, "scripts": visited, "missing_scripts": missing_scripts}
+
+
+def _preload(template: str, folder: Optional[str], uses_sift: bool):
+    from services.template_cache import template_cache
+
+    path = resolve_template_path(template, folder)
+    if not os.path.isfile(path):
+        return template, folder, None, False
+    data = template_cache.get(path, features=uses_sift)
+    return template, folder, path, data is not None
+
+
+def prepare_run(actions: List[Dict[str, Any]], connect: bool = True,
+                script_folder: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Preload everything a run needs and report problems.
+    執行前預先載入模板與特徵、連接設備，並回報缺少的資源。
+
+    Args:
+        actions: Normalized nodes of the top-level graph
+        connect: Also open the device connection (sets shared.bot)
+        script_folder: Folder of the top-level script, if any (local templates)
+
+    Returns:
+        Report dict with counts, missing templates/scripts, device and timings
+    """
+    started = time.perf_counter()
+    graph = collect_templates(actions, script_folder)
+    templates = graph["templates"]
+    walked = time.perf_counter()
+
+    missing, unreadable, loaded, loaded_paths = [], [], 0, []
+    if templates:
+        with ThreadPoolExecutor(max_workers=min(PRELOAD_WORKERS, len(templates)),
+                                thread_name_prefix="warmup") as pool:
+            jobs = [pool.submit(_preload, t, f, info["uses_sift"]) for (t, f), info in templates.items()]
+            for job in jobs:
+                try:
+                    template, folder, path, ok = job.result()
+                except Exception as e:
+                    log_warn(f"Template preload failed: {e}")
+                    continue
+                refs = [{"script": s, "node": n} for s, n in templates[(template, folder)]["refs"]]
+                if path is None:
+                    missing.append({"template": template, "used_by": refs})
+                elif not ok:
+                    unreadable.append({"template": template, "path": path, "used_by": refs})
+                else:
+                    loaded += 1
+                    loaded_paths.append(path)
+    preloaded = time.perf_counter()
+
+    device = None
+    if connect:
+        from engine import get_bot
+        try:
+            shared.bot = get_bot(shared.bot if shared.bot and shared.bot.device else None)
+            if shared.bot.device:
+                device = shared.bot.device.serial
+                # Open the shell transport and take one frame so the first node pays neither
+                shared.bot.ping()
+                shared.bot.capture_frame()
+        except Exception as e:
+            log_warn(f"Device warm-up failed: {e}")
+    connected = time.perf_counter()
+
+    # Templates with a known capture resolution are rescaled to the device once, here
+    variants = 0
+    if device and shared.bot.display:
+        from services.template_cache import template_cache
+        for path in loaded_paths:
+            data = template_cache.get(path)
+            scale = shared.bot.template_scale(data) if data is not None else None
+            if scale is not None:
+                data.scaled(scale)
+                variants += 1
+    scaled = time.perf_counter()
+
+    report = {
+        "templates": len(templates),
+        "templates_loaded": loaded,
+        "missing_templates": missing,
+        "unreadable_templates": unreadable,
+        "scripts": graph["scripts"],
+        "missing_scripts": graph["missing_scripts"],
+        "device": device,
+        "display": shared.bot.display if device else None,
+        "scaled_templates": variants,
+        "ms": {
+            "walk": round((walked - started) * 1000, 1),
+            "templates": round((preloaded - walked) * 1000, 1),
+            "device": round((connected - preloaded) * 1000, 1),
+            "scale": round((scaled - connected) * 1000, 1),
+            "total": round((scaled - started) * 1000, 1),
+        },
+    }
+
+    for item in missing:
+        log_warn(f"Missing template: {item['template']} (used by {len(item['used_by'])} node(s))")
+    for item in unreadable:
+        log_warn(f"Unreadable template: {item['path']}")
+    for item in graph["missing_scripts"]:
+        log_warn(f"Missing sub-script: {item['name']} (Script node {item['node']})")
+    log_message(f"Prepared run: {loaded}/{len(templates)} templates, "
+                f"{len(graph['scripts'])} sub-scripts in {report['ms']['total']:.0f}ms.")
+    return report
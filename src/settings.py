@@ -1,22 +1,122 @@
 import json
 import os
+import threading
 
 SETTINGS_FILE = 'settings.json'
 
+
+class Settings:
+    """
+    Process-wide settings, read from settings.json once and kept in memory.
+    Updates are written atomically (temp file + rename) and reported to
+    subscribers of the keys whose values actually changed.
+    """
+
+    def __init__(self, path=SETTINGS_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._data = None
+        # [(frozenset of keys or None for any key, callback(changed: dict))]
+        self._subscribers = []
+
+    def _read_file(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading settings: {e}")
+            return {}
+
+    def _ensure_loaded(self):
+        if self._data is None:
+            self._data = self._read_file()
+
+    def get(self, key, default=None):
+        with self._lock:
+            self._ensure_loaded()
+            return self._data.get(key, default)
+
+    def snapshot(self):
+        """Shallow copy of all settings (safe to modify)."""
+        with self._lock:
+            self._ensure_loaded()
+            return dict(self._data)
+
+    def reload(self):
+        """Re-read settings.json (e.g. after an external edit) and notify subscribers."""
+        with self._lock:
+            old = self._data or {}
+            self._data = self._read_file()
+            changed = self._diff(old, self._data)
+        self._notify(changed)
+        return changed
+
+    @staticmethod
+    def _diff(old, new):
+        changed = {k: new.get(k) for k in new if old.get(k) != new.get(k)}
+        changed.update({k: None for k in old if k not in new})
+        return changed
+
+    def _write(self, data):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp, self.path)
+
+    def update(self, values, replace=False):
+        """
+        Merge values into the settings (or replace them all) and persist.
+        Returns the {key: new value} dict of keys that changed.
+
+        Raises:
+            OSError: the settings file could not be written (memory is left unchanged)
+        """
+        with self._lock:
+            self._ensure_loaded()
+            new = dict(values) if replace else {**self._data, **values}
+            changed = self._diff(self._data, new)
+            if changed or not os.path.exists(self.path):
+                self._write(new)
+            self._data = new
+        self._notify(changed)
+        return changed
+
+    def subscribe(self, keys, callback):
+        """
+        Call callback(changed) after an update that changes any of 'keys'
+        (None = any key). 'changed' only holds the subscribed keys.
+        """
+        self._subscribers.append((frozenset(keys) if keys is not None else None, callback))
+        return callback
+
+    def unsubscribe(self, callback):
+        self._subscribers = [s for s in self._subscribers if s[1] is not callback]
+
+    def _notify(self, changed):
+        if not changed:
+            return
+        for keys, callback in list(self._subscribers):
+            relevant = changed if keys is None else {k: v for k, v in changed.items() if k in keys}
+            if not relevant:
+                continue
+            try:
+                callback(relevant)
+            except Exception as e:
+                print(f"Settings subscriber error: {e}")
+
+
+# Global settings store
+settings_store = Settings()
+
+
 def load_settings():
-    if not os.path.exists(SETTINGS_FILE):
-        return {}
-    try:
-        with open(SETTINGS_FILE, 'r') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error loading settings: {e}")
-        return {}
+    return settings_store.snapshot()
 
 def save_settings(data):
     try:
-        with open(SETTINGS_FILE, 'w') as f:
-            json.dump(data, f, indent=4)
+        settings_store.update(data, replace=True)
         return True
     except Exception as e:
         print(f"Error saving settings: {e}")
@@ -1,14 +1,39 @@
 import threading
-from collections import deque
-import sys
+from collections import deque, OrderedDict
+from itertools import islice
+import atexit
 import datetime
+import time
+from services.log_writer import AsyncLogWriter
 
-# Global log buffer
-log_buffer = deque(maxlen=100)
+# Global log buffer (records carry a monotonically increasing 'seq' cursor)
+log_buffer = deque(maxlen=1000)
 log_lock = threading.Lock()
+log_cond = threading.Condition(log_lock)  # Notified on every new record (SSE stream)
+log_seq = 0
+
+# Log levels
+DEBUG, INFO, WARN, ERROR = 10, 20, 30, 40
+LEVEL_NAMES = {DEBUG: "debug", INFO: "info", WARN: "warn", ERROR: "error"}
+LEVELS = {name: level for level, name in LEVEL_NAMES.items()}
+log_level = INFO
+
+# Per-thread structured fields (script / node / device) attached to every record
+_log_fields = threading.local()
+# Sampled logging state: {key: [last_emit_monotonic, suppressed_count]} in LRU order,
+# guarded by log_lock and capped (keys often embed node ids)
+_sample_state = OrderedDict()
+MAX_SAMPLE_KEYS = 4096
+
+# Background writer for stdout + server.log (rotated and gzipped by size)
+LOG_FILE = "server.log"
+log_writer = AsyncLogWriter(LOG_FILE)
+atexit.register(log_writer.close)
 
 # Global bot instance
 bot = None
+# Report of the last pre-run preparation (services.warmup.prepare_run)
+last_prepare = None
 # Global execution control
 is_running = False
 current_thread = None
@@ -27,20 +52,126 @@ wait_events = {}
 command_hooks = {}
 
 
-def log_message(message):
-    """Log message to global buffer and stdout"""
-    # Print to real stdout for server logs
-    sys.__stdout__.write(f"{message}\n")
-    sys.__stdout__.flush()
+def set_log_level(level):
+    """Set the minimum level from a name ('debug', 'info', 'warn', 'error') or number."""
+    global log_level
+    if isinstance(level, str):
+        level = LEVELS.get(level.strip().lower(), INFO)
+    log_level = int(level)
+
+
+def set_log_fields(**fields):
+    """Set structured fields for records logged from the current thread (None removes a field)."""
+    current = getattr(_log_fields, "fields", None) or {}
+    current = {**current, **fields}
+    _log_fields.fields = {k: v for k, v in current.items() if v is not None}
+
+
+def clear_log_fields():
+    _log_fields.fields = {}
+
+
+def _emit(level, message, fields):
+    global log_seq
+    # Use UTC timestamp for consistency, client converts to local
+    ts = datetime.datetime.utcnow().isoformat() + 'Z'
+    record = {"seq": 0, "timestamp": ts, "level": LEVEL_NAMES.get(level, str(level)), "message": message}
+    thread_fields = getattr(_log_fields, "fields", None)
+    if thread_fields:
+        record.update(thread_fields)
+    if fields:
+        record.update(fields)
+    
+    with log_lock:
+        log_seq += 1
+        record["seq"] = log_seq
+        log_buffer.append(record)
+        log_cond.notify_all()
     
+    log_writer.write(ts, message, record["level"])
+
+
+def log(level, message, *args, **fields):
+    """
+    Leveled, structured log call. Formatting ('%' with args) only happens
+    when the level is enabled, so disabled debug calls cost one comparison.
+    Extra keyword fields (node, script, device, ...) are stored on the record.
+    """
+    if level < log_level:
+        return
+    if args:
+        message = message % args
+    _emit(level, message, fields)
+
+
+def log_debug(message, *args, **fields):
+    if DEBUG >= log_level:
+        log(DEBUG, message, *args, **fields)
+
+
+def log_warn(message, *args, **fields):
+    log(WARN, message, *args, **fields)
+
+
+def log_error(message, *args, **fields):
+    log(ERROR, message, *args, **fields)
+
+
+def log_sampled(key, interval, message, *args, level=INFO, **fields):
+    """
+    Rate-limited log: emit at most once per 'interval' seconds for a given key.
+    The next emitted record reports how many similar records were suppressed.
+    """
+    if level < log_level:
+        return
+    now = time.monotonic()
+    with log_lock:
+        state = _sample_state.get(key)
+        if state is not None and now - state[0] < interval:
+            state[1] += 1
+            _sample_state.move_to_end(key)
+            return
+        suppressed = state[1] if state is not None else 0
+        _sample_state[key] = [now, 0]
+        _sample_state.move_to_end(key)
+        while len(_sample_state) > MAX_SAMPLE_KEYS:
+            _sample_state.popitem(last=False)
+    if args:
+        message = message % args
+    if suppressed:
+        message = f"{message} ({suppressed} similar suppressed)"
+    _emit(level, message, fields)
+
+
+def log_message(message):
+    """Log an info message (buffer for the UI; stdout and server.log are written asynchronously)"""
+    if INFO >= log_level:
+        _emit(INFO, message, None)
+
+
+def _records_after(seq):
+    """Records with seq > given cursor. Caller must hold log_lock."""
+    if not log_buffer or seq >= log_buffer[-1]["seq"]:
+        return []
+    first = log_buffer[0]["seq"]
+    if seq < first:
+        return list(log_buffer)
+    return list(islice(log_buffer, seq - first + 1, None))
+
+
+def get_logs_since(seq=0):
+    """
+    Return (records, last_seq, missed) for records newer than the cursor.
+    'missed' is True when older records already fell out of the buffer.
+    """
     with log_lock:
-        # Use UTC timestamp for consistency, client converts to local
-        ts = datetime.datetime.utcnow().isoformat() + 'Z'
-        log_buffer.append({"timestamp": ts, "message": message})
-        
-        # Write to file
-        try:
-            with open("server.log", "a", encoding="utf-8") as f:
-                f.write(f"[{ts}] {message}\n")
-        except Exception:
-            pass
+        records = _records_after(seq)
+        missed = bool(seq and log_buffer and seq < log_buffer[0]["seq"] - 1)
+        return records, log_seq, missed
+
+
+def wait_for_logs(seq, timeout=15.0):
+    """Block until records newer than the cursor exist (or timeout). Returns the new records."""
+    with log_cond:
+        log_cond.wait_for(lambda: log_seq > seq, timeout=timeout)
+        return _records_after(seq)
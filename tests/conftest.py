@@ -0,0 +1,32 @@
+"""
+Shared test setup: modules are imported from src/ the way run.py runs them, and
+every test that touches the filesystem gets a fresh working directory (the store,
+scripts, settings and caches all use paths relative to it).
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import shared  # noqa: E402
+
+
+@pytest.fixture(scope='session', autouse=True)
+def _quiet_log_writer(tmp_path_factory):
+    # Keep server.log out of the repository and test output
+    shared.log_writer.echo = False
+    shared.log_writer.path = str(tmp_path_factory.mktemp('logs') / 'server.log')
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in an empty directory with in-memory settings and metadata reset."""
+    from settings import settings_store
+    from services.template_meta import template_meta
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings_store, '_data', None)
+    monkeypatch.setattr(template_meta, '_data', None)
+    return tmp_path
@@ -0,0 +1,148 @@
+import hashlib
+import io
+import json
+import os
+import zipfile
+
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+
+from services import bundle  # noqa: E402
+from services.template_meta import template_meta  # noqa: E402
+from services.template_store import template_store  # noqa: E402
+
+
+def _png(seed):
+    rng = np.random.default_rng(seed)
+    image = cv2.GaussianBlur(rng.integers(0, 256, (64, 64, 3), dtype=np.uint8), (3, 3), 0)
+    return cv2.imencode('.png', image)[1].tobytes()
+
+
+def _write_script(name, nodes):
+    folder = os.path.join('scripts', name)
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, 'script.json'), 'w', encoding='utf-8') as f:
+        json.dump(nodes, f)
+
+
+def _write_image(rel, data):
+    path = os.path.join('images', rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _zip(manifest, files):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as zf:
+        zf.writestr('bundle.json', json.dumps(manifest))
+        for name, data in files.items():
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+def _single_template_bundle(rel='ok.png', blob_entry=None, template=None, files=None, script=True):
+    data = _png(1)
+    digest = hashlib.sha256(data).hexdigest()
+    manifest = {
+        "format": bundle.BUNDLE_FORMAT,
+        "version": bundle.BUNDLE_VERSION,
+        "name": "main",
+        "scripts": {"main": {"templates": {rel: template or {"hash": digest, "ext": ".png"}}}},
+        "blobs": {digest + '.png': {"features": False} if blob_entry is None else blob_entry},
+    }
+    contents = {f"blobs/{digest}.png": data}
+    if script:
+        contents["scripts/main/script.json"] = b'[]'
+    contents.update(files or {})
+    return _zip(manifest, contents)
+
+
+def _nothing_written():
+    return not os.path.exists('store') and not os.path.exists('scripts')
+
+
+def test_round_trip(workdir):
+    ok, other = _png(1), _png(2)
+    _write_image('ok.png', ok)
+    _write_image('icons/other.png', other)
+    _write_script('sub', [{"id": 1, "type": "find_multi_images",
+                           "properties": {"templates": "images/icons/other.png, images/ok.png"}}])
+    _write_script('main', [{"id": 1, "type": "find_image", "properties": {"template": "images/ok.png"}},
+                           {"id": 2, "type": "script", "properties": {"scriptName": "sub"}}])
+    ok_digest = hashlib.sha256(ok).hexdigest()
+    template_meta.set([ok_digest], {"width": 1280, "height": 720, "density": 240})
+
+    data = bundle.export_bundle('main')
+
+    target = workdir / 'other_host'
+    target.mkdir()
+    os.chdir(target)
+    template_meta._data = None
+    result = bundle.import_bundle(data)
+
+    assert sorted(result["scripts"]) == ['main', 'sub']
+    assert result["templates_stored"] == 2
+    for script, rel, content in (('main', 'ok.png', ok), ('sub', 'icons/other.png', other)):
+        blob = template_store.resolve(os.path.join('scripts', script), rel)
+        with open(blob, 'rb') as f:
+            assert f.read() == content
+        assert os.path.exists(os.path.join('scripts', script, 'images', rel))
+    assert template_meta.get(ok_digest) == {"width": 1280, "height": 720, "density": 240}
+    assert os.path.exists(os.path.join('.cache', 'features', ok_digest[:2], ok_digest + '.npz'))
+
+    with pytest.raises(ValueError, match='already exist'):
+        bundle.import_bundle(data)
+    assert bundle.import_bundle(data, overwrite=True)["overwritten"] == ['main', 'sub']
+
+
+@pytest.mark.parametrize('rel', ['../../evil.png', '/abs/evil.png', 'C:/evil.png', 'a/../../evil.png'])
+def test_rejects_unsafe_template_paths(workdir, rel):
+    with pytest.raises(ValueError):
+        bundle.import_bundle(_single_template_bundle(rel=rel))
+    assert _nothing_written()
+
+
+@pytest.mark.parametrize('kwargs', [
+    {"template": {"hash": 'b' * 64, "ext": '.png'}},                    # Hash not among the bundle's blobs
+    {"template": {"hash": hashlib.sha256(b'').hexdigest(), "ext": '.exe'}},
+    {"blob_entry": "not a dict"},
+    {"blob_entry": {"resolution": {"width": 0, "height": 720}}},
+    {"blob_entry": {"resolution": "wide"}},
+    {"blob_entry": {"resolution": [1280, 720]}},
+    {"blob_entry": {"features": True}},                                 # features/<hash>.npz missing
+    {"script": False},                                                  # scripts/main/script.json missing
+    {"files": {"scripts/main/script.json": b'{not json'}},
+])
+def test_rejects_invalid_bundles_before_writing(workdir, kwargs):
+    with pytest.raises(ValueError):
+        bundle.import_bundle(_single_template_bundle(**kwargs))
+    assert _nothing_written()
+
+
+def test_rejects_corrupt_features(workdir):
+    digest = hashlib.sha256(_png(1)).hexdigest()
+    data = _single_template_bundle(blob_entry={"features": True},
+                                   files={f"features/{digest}.npz": b'garbage'})
+    with pytest.raises(ValueError):
+        bundle.import_bundle(data)
+    assert _nothing_written()
+
+
+def test_rejects_corrupt_blob(workdir):
+    data = _png(1)
+    digest = hashlib.sha256(data).hexdigest()
+    manifest = {"format": bundle.BUNDLE_FORMAT, "version": bundle.BUNDLE_VERSION, "scripts": {},
+                "blobs": {digest + '.png': {}}}
+    with pytest.raises(ValueError, match='Corrupt'):
+        bundle.import_bundle(_zip(manifest, {f"blobs/{digest}.png": data + b'x'}))
+    assert _nothing_written()
+
+
+def test_rejects_non_bundles(workdir):
+    with pytest.raises(ValueError):
+        bundle.import_bundle(b'not a zip')
+    with pytest.raises(ValueError):
+        bundle.import_bundle(_zip({"format": "other"}, {}))
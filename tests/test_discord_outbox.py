@@ -0,0 +1,161 @@
+import asyncio
+import sys
+import threading
+import types
+
+import pytest
+
+import shared
+from services import discord_outbox as outbox_module
+from services.discord_outbox import DiscordOutbox, RateLimited, _Outgoing, split_message, MAX_MESSAGE_LENGTH
+from services.metrics import metrics
+
+
+class FakeHTTPException(Exception):
+    def __init__(self, status, retry_after=0.0):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class FakeFile:
+    def __init__(self, fp, filename):
+        self.data = fp.read()
+        self.filename = filename
+
+
+class FakeUser:
+    def __init__(self, fail_with=None):
+        self.sent = []
+        self.attempts = 0
+        self.fail_with = fail_with
+
+    async def send(self, content=None, file=None):
+        self.attempts += 1
+        if self.fail_with is not None:
+            raise self.fail_with
+        self.sent.append((content, file.filename if file else None))
+
+
+class FakeClient:
+    def __init__(self, user):
+        self.user = user
+
+    async def wait_until_ready(self):
+        pass
+
+    def get_user(self, user_id):
+        return self.user
+
+
+@pytest.fixture
+def discord_env(workdir, monkeypatch):
+    """A running bot loop with a fake client and a fake discord module (no network)."""
+    fake = types.SimpleNamespace(HTTPException=FakeHTTPException, NotFound=type('NotFound', (Exception,), {}),
+                                 File=FakeFile)
+    monkeypatch.setitem(sys.modules, 'discord', fake)
+    from settings import settings_store
+    monkeypatch.setattr(settings_store, '_data', {'user_id': '42'})
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    def start(user):
+        monkeypatch.setattr(shared, 'discord_client', FakeClient(user))
+        monkeypatch.setattr(shared, 'discord_loop', loop)
+        return DiscordOutbox(coalesce_delay=0.05)
+
+    yield start
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(2)
+    loop.close()
+
+
+def _items(*contents):
+    return [_Outgoing(c, None) for c in contents]
+
+
+def test_split_message_prefers_line_breaks():
+    lines = ['x' * 999] * 5
+    chunks = split_message('\n'.join(lines))
+    assert all(len(c) <= MAX_MESSAGE_LENGTH for c in chunks)
+    assert '\n'.join(chunks) == '\n'.join(lines)
+    assert len(chunks) == 3
+
+
+def test_split_message_hard_splits_long_lines():
+    chunks = split_message('a' * 4500)
+    assert [len(c) for c in chunks] == [2000, 2000, 500]
+    assert split_message('') == ['']
+
+
+def test_take_batch_coalesces_text_up_to_limit():
+    outbox = DiscordOutbox()
+    outbox._pending.extend(_items('a', 'b', 'x' * (MAX_MESSAGE_LENGTH - 1), 'c'))
+
+    assert [i.content for i in outbox._take_batch()] == ['a', 'b']
+    assert [len(i.content) for i in outbox._take_batch()] == [MAX_MESSAGE_LENGTH - 1]
+    assert [i.content for i in outbox._take_batch()] == ['c']
+    assert outbox._take_batch() is None
+
+
+def test_take_batch_sends_files_alone():
+    outbox = DiscordOutbox()
+    outbox._pending.extend(_items('a'))
+    outbox._pending.append(_Outgoing('shot', (b'data', 'screenshot.png')))
+    outbox._pending.extend(_items('b'))
+
+    assert [i.content for i in outbox._take_batch()] == ['a']
+    assert [i.file for i in outbox._take_batch()] == [(b'data', 'screenshot.png')]
+    assert [i.content for i in outbox._take_batch()] == ['b']
+
+
+def test_burst_is_delivered_as_one_dm(discord_env):
+    user = FakeUser()
+    outbox = discord_env(user)
+
+    futures = [outbox.send(text) for text in ('one', 'two', 'three')]
+
+    assert all(f.result(timeout=5) for f in futures)
+    assert user.sent == [('one\ntwo\nthree', None)]
+
+
+def test_long_text_is_split_not_truncated(discord_env):
+    user = FakeUser()
+    outbox = discord_env(user)
+
+    outbox.send('y' * 4500).result(timeout=5)
+
+    assert ''.join(content for content, _ in user.sent) == 'y' * 4500
+    assert all(len(content) <= MAX_MESSAGE_LENGTH for content, _ in user.sent)
+
+
+def test_file_goes_with_the_last_part(discord_env):
+    user = FakeUser()
+    outbox = discord_env(user)
+
+    outbox.send('z' * 2500, file=(b'png', 'screenshot.png')).result(timeout=5)
+
+    assert [f for _, f in user.sent] == [None, 'screenshot.png']
+
+
+def test_rate_limited_batch_is_dropped_after_one_retry(discord_env, monkeypatch):
+    monkeypatch.setattr(outbox_module, 'RATE_LIMIT_RETRIES', 1)
+    user = FakeUser(fail_with=FakeHTTPException(429, retry_after=0.01))
+    outbox = discord_env(user)
+    dropped = metrics.get_counter("discord_messages_dropped")
+
+    futures = [outbox.send('a'), outbox.send('b')]
+
+    for future in futures:
+        with pytest.raises(RateLimited):
+            future.result(timeout=5)
+    assert user.attempts == 2
+    assert metrics.get_counter("discord_messages_dropped") == dropped + 2
+
+
+def test_send_without_running_bot_fails_fast(monkeypatch):
+    monkeypatch.setattr(shared, 'discord_client', None)
+    with pytest.raises(RuntimeError):
+        DiscordOutbox().send('hello').result(timeout=1)
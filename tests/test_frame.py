@@ -0,0 +1,60 @@
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+
+from services.frame import Frame  # noqa: E402
+from services.match_memo import MatchMemo  # noqa: E402
+
+
+@pytest.fixture
+def screen():
+    rng = np.random.default_rng(0)
+    return cv2.GaussianBlur(rng.integers(0, 256, (360, 640, 3), dtype=np.uint8), (5, 5), 0)
+
+
+def test_equal_pixels_give_equal_fingerprints(screen):
+    assert Frame(screen).fingerprint == Frame(screen.copy()).fingerprint
+
+
+def test_small_ui_change_changes_fingerprint(screen):
+    # Mirroring one 4x4 block keeps its mean, so the 4x downsampled image is unchanged
+    changed = screen.copy()
+    changed[100:104, 200:204] = np.flip(changed[100:104, 200:204], axis=1).copy()
+    assert (Frame(changed).small_gray == Frame(screen).small_gray).all()
+
+    assert Frame(changed).fingerprint != Frame(screen).fingerprint
+
+
+def test_roi_fingerprint_covers_only_the_region(screen):
+    changed = screen.copy()
+    changed[0, 0] ^= 1
+
+    assert Frame(changed).roi(100, 100, 50, 50).fingerprint == Frame(screen).roi(100, 100, 50, 50).fingerprint
+    assert Frame(changed).roi(0, 0, 50, 50).fingerprint != Frame(screen).roi(0, 0, 50, 50).fingerprint
+
+
+def test_derived_images_are_computed_once(screen):
+    frame = Frame(screen)
+    assert frame.gray is frame.gray
+    assert frame.small_gray.shape == (90, 160)
+    assert frame.roi(10, 20, 30, 40) is frame.roi(10, 20, 30, 40)
+    assert frame.roi(10, 20, 30, 40).to_screen((1, 2)) == (11, 22)
+
+
+def test_diff_is_zero_for_equal_frames(screen):
+    assert Frame(screen).diff(Frame(screen.copy())) == 0.0
+    assert Frame(np.zeros_like(screen)).diff(Frame(np.full_like(screen, 255))) == pytest.approx(100.0)
+    assert Frame(screen).diff(Frame(screen[:100])) == 100.0
+
+
+def test_match_memo_keeps_misses_and_evicts_oldest():
+    memo = MatchMemo(max_entries=2)
+    memo.put('a', None)
+    memo.put('b', (1, 2))
+    memo.put('c', (3, 4))
+
+    assert memo.get('a') == (False, None)
+    assert memo.get('b') == (True, (1, 2))
+    memo.enabled = False
+    assert memo.get('c') == (False, None)
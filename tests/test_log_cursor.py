@@ -0,0 +1,41 @@
+import shared
+
+
+def _seq():
+    return shared.get_logs_since(0)[1]
+
+
+def test_returns_only_records_after_cursor():
+    cursor = _seq()
+    shared.log_message("first")
+    shared.log_message("second")
+
+    records, last, missed = shared.get_logs_since(cursor)
+
+    assert [r["message"] for r in records] == ["first", "second"]
+    assert last == records[-1]["seq"] == cursor + 2
+    assert not missed
+    assert shared.get_logs_since(last)[0] == []
+
+
+def test_cursor_older_than_buffer_reports_missed():
+    cursor = _seq()
+    for i in range(shared.log_buffer.maxlen + 5):
+        shared.log_message(f"line {i}")
+
+    records, last, missed = shared.get_logs_since(cursor)
+
+    assert missed
+    assert len(records) == shared.log_buffer.maxlen
+    assert records[0]["seq"] == last - shared.log_buffer.maxlen + 1
+
+
+def test_levels_and_fields_are_recorded():
+    cursor = _seq()
+    shared.log_warn("careful %s", "now", node="n1")
+
+    (record,), _, _ = shared.get_logs_since(cursor)
+
+    assert record["level"] == "warn"
+    assert record["message"] == "careful now"
+    assert record["node"] == "n1"
@@ -0,0 +1,49 @@
+import pytest
+
+from services.template_meta import TemplateMeta, parse_resolution, scale_between
+
+
+@pytest.mark.parametrize('value, expected', [
+    ("1280x720", {"width": 1280, "height": 720, "density": None}),
+    (" 1920 X 1080 @ 320 ", {"width": 1920, "height": 1080, "density": 320}),
+    ("720*1280", {"width": 720, "height": 1280, "density": None}),
+    ({"width": "1600", "height": 900, "density": 240}, {"width": 1600, "height": 900, "density": 240}),
+    ("", None),
+    (None, None),
+])
+def test_parse_resolution(value, expected):
+    assert parse_resolution(value) == expected
+
+
+@pytest.mark.parametrize('value', ["wide", "1280x", "0x720", {"width": 0, "height": 720}, {"width": -5, "height": 5}])
+def test_parse_resolution_rejects_malformed(value):
+    with pytest.raises(ValueError):
+        parse_resolution(value)
+
+
+def test_scale_between_uses_short_side():
+    hd = {"width": 1280, "height": 720}
+    assert scale_between(hd, {"width": 1920, "height": 1080}) == 1.5
+    assert scale_between(hd, {"width": 1080, "height": 1920}) == 1.5  # Orientation does not matter
+    assert scale_between({"width": 1920, "height": 1080}, hd) == pytest.approx(0.6667)
+
+
+def test_scale_between_uses_density_at_equal_size():
+    assert scale_between({"width": 1280, "height": 720, "density": 160},
+                         {"width": 1280, "height": 720, "density": 240}) == 1.5
+    assert scale_between({"width": 1280, "height": 720, "density": 160}, {"width": 1280, "height": 720}) == 1.0
+
+
+def test_meta_records_and_falls_back_to_setting(workdir):
+    from settings import settings_store
+    meta = TemplateMeta(str(workdir / 'meta.json'))
+    digest = 'a' * 64
+
+    assert meta.resolution_for(digest) is None
+    settings_store._data = {'template_resolution': '1280x720'}
+    assert meta.resolution_for(digest) == {"width": 1280, "height": 720, "density": None}
+
+    meta.set([digest], {"width": 1920, "height": 1080, "density": None})
+    assert TemplateMeta(meta.path).get(digest) == {"width": 1920, "height": 1080}
+    meta.set([digest], None)
+    assert meta.get(digest) is None
@@ -0,0 +1,122 @@
+import hashlib
+import os
+
+import pytest
+
+from services.template_store import TemplateStore, check_relative_path, check_image_entry
+
+PNG_A = b'\x89PNG fake image A'
+PNG_B = b'\x89PNG fake image B'
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.fixture
+def store(workdir):
+    return TemplateStore(os.path.join('store', 'blobs'))
+
+
+def test_put_bytes_deduplicates(store):
+    digest, blob, created = store.put_bytes(PNG_A, '.PNG')
+    again = store.put_bytes(PNG_A, '.png')
+
+    assert digest == hashlib.sha256(PNG_A).hexdigest()
+    assert created and again == (digest, blob, False)
+    assert blob.endswith(digest + '.png') and _read(blob) == PNG_A
+
+
+def test_sync_creates_views_as_copies(store):
+    _write('images/ok.png', PNG_A)
+
+    counts = store.sync_script_images(['images/ok.png'], 'scripts/s1')
+
+    view = os.path.join('scripts', 's1', 'images', 'ok.png')
+    blob = store.resolve('scripts/s1', 'ok.png')
+    assert counts["stored"] == 1 and counts["linked"] == 1
+    assert _read(view) == PNG_A
+    assert not os.path.samefile(view, blob)
+
+    # Editing the view must not touch the shared blob, and the next sync restores it
+    _write(view, PNG_B)
+    assert _read(blob) == PNG_A
+    counts = store.sync_script_images(['images/ok.png'], 'scripts/s1')
+    assert counts["linked"] == 1 and _read(view) == PNG_A
+
+
+def test_sync_unchanged_and_removed(store):
+    _write('images/a.png', PNG_A)
+    _write('images/b.png', PNG_B)
+    store.sync_script_images(['images/a.png', 'images/b.png'], 'scripts/s1')
+
+    counts = store.sync_script_images(['images/a.png'], 'scripts/s1')
+
+    assert counts["unchanged"] == 1 and counts["removed"] == 1
+    assert not os.path.exists(os.path.join('scripts', 's1', 'images', 'b.png'))
+    assert list(store.load_manifest('scripts/s1')["images"]) == ['a.png']
+
+
+def test_sync_keeps_edited_view_of_dropped_template(store):
+    _write('images/b.png', PNG_B)
+    store.sync_script_images(['images/b.png'], 'scripts/s1')
+    view = os.path.join('scripts', 's1', 'images', 'b.png')
+    _write(view, b'edited by hand')
+
+    counts = store.sync_script_images([], 'scripts/s1')
+
+    assert counts["removed"] == 0 and os.path.exists(view)
+
+
+def test_gc_removes_only_unreferenced_blobs(store):
+    _write('images/a.png', PNG_A)
+    store.sync_script_images(['images/a.png'], 'scripts/s1')
+    _, orphan, _ = store.put_bytes(PNG_B, '.png')
+    kept = store.resolve('scripts/s1', 'a.png')
+
+    dry = store.gc('scripts', dry_run=True)
+    assert dry == {"removed": 1, "kept": 1, "freed_bytes": len(PNG_B), "dry_run": True}
+    assert os.path.exists(orphan)
+
+    result = store.gc('scripts')
+    assert result["removed"] == 1 and result["kept"] == 1
+    assert not os.path.exists(orphan) and os.path.exists(kept)
+
+
+@pytest.mark.parametrize('rel', ['../x.png', 'a/../../x.png', '/etc/x.png', 'C:/x.png', 'a\\..\\..\\x.png', '', '.'])
+def test_unsafe_relative_paths_are_rejected(rel):
+    with pytest.raises(ValueError):
+        check_relative_path(rel)
+
+
+def test_relative_path_is_normalized():
+    assert check_relative_path('sub/./ok.png') == 'sub/ok.png'
+    assert check_relative_path('sub\\ok.png') == 'sub/ok.png'
+
+
+def test_image_entry_checks_hash_extension_and_known_digests():
+    digest = 'a' * 64
+    assert check_image_entry('ok.PNG', {"hash": digest})[1]["ext"] == '.png'
+    with pytest.raises(ValueError):
+        check_image_entry('ok.png', {"hash": 'not-a-hash'})
+    with pytest.raises(ValueError):
+        check_image_entry('ok.exe', {"hash": digest})
+    with pytest.raises(ValueError):
+        check_image_entry('ok.png', {"hash": digest}, digests={'b' * 64})
+
+
+def test_install_images_rejects_escaping_paths(store):
+    digest, _, _ = store.put_bytes(PNG_A, '.png')
+
+    with pytest.raises(ValueError):
+        store.install_images('scripts/s1', {'../../evil.png': {"hash": digest, "ext": '.png'}})
+
+    assert not os.path.exists('evil.png')
+    assert not os.path.exists(os.path.join('scripts', 's1', 'manifest.json'))
@@ -0,0 +1,54 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+pytest.importorskip('ppadb')
+
+from bluestacks_bot import BlueStacksBot  # noqa: E402
+from services.frame import Frame  # noqa: E402
+
+
+def _frame(value, at):
+    return Frame(np.full((40, 40, 3), value, dtype=np.uint8), captured_at=at)
+
+
+def _bot(frames):
+    """Bot without a device connection whose captures replay 'frames' (None = failed capture)."""
+    bot = BlueStacksBot.__new__(BlueStacksBot)
+    bot.device = object()
+    queue = list(frames)
+    bot._region_frame = lambda roi=None: queue.pop(0) if len(queue) > 1 else queue[0]
+    return bot
+
+
+def test_change_detected_against_first_frame():
+    bot = _bot([_frame(100, 0.0), _frame(100, 0.1), _frame(200, 0.2)])
+    assert bot.wait_for_change(threshold=2.0, timeout=2.0, interval=0)
+
+
+def test_change_waits_when_first_capture_fails():
+    bot = _bot([None, None, _frame(100, 0.1), _frame(100, 0.2), _frame(200, 0.3)])
+    assert bot.wait_for_change(threshold=2.0, timeout=2.0, interval=0)
+
+
+def test_change_times_out_on_static_screen():
+    bot = _bot([_frame(100, 0.0)])
+    assert not bot.wait_for_change(threshold=2.0, timeout=0.05, interval=0)
+
+
+def test_stable_after_stable_ms_without_change():
+    bot = _bot([_frame(100, 0.0), _frame(100, 0.2), _frame(100, 0.4)])
+    assert bot.wait_for_stable(threshold=0.5, stable_ms=300, timeout=2.0, interval=0)
+
+
+def test_slow_fade_is_not_stable():
+    # Every step is below the threshold, but the screen keeps drifting from the window start
+    frames = iter([_frame(100 + i, i * 0.1) for i in range(60)])
+    bot = _bot([])
+    bot._region_frame = lambda roi=None: next(frames, None)
+    assert not bot.wait_for_stable(threshold=0.5, stable_ms=300, timeout=0.2, interval=0)
+
+
+def test_stop_request_ends_wait():
+    bot = _bot([_frame(100, 0.0)])
+    assert not bot.wait_for_change(timeout=5.0, interval=0, should_continue=lambda: False)